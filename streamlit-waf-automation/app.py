@@ -21,6 +21,8 @@ if not st.session_state.get("_nav_by_user"):
             st.session_state.waf_page = "recommendations"
         elif _qp == "progress":
             st.session_state.waf_page = "progress"
+        elif _qp == "performance":
+            st.session_state.waf_page = "performance"
     except Exception:
         pass
 
@@ -224,7 +226,7 @@ _run_info = _load_run_info()
 _catalog = _run_info.get("catalog") or os.environ.get("WAF_CATALOG", "useast1")
 _schema = "waf_cache"
 
-# Main content: Dashboard vs Recommendations vs Progress page
+# Main content: Dashboard vs Recommendations vs Progress vs Performance page
 if st.session_state.waf_page == "progress":
     st.title("WAF Assessment Progress")
     st.markdown("Total score over time (average across pillars per run).")
@@ -246,22 +248,45 @@ if st.session_state.waf_page == "progress":
         else:
             try:
                 from databricks.sdk.service.sql import StatementState
-                _stmt = (
-                    f"SELECT r.run_id, r.triggered_at, ROUND(avg_score.overall_score, 2) AS overall_score "
-                    f"FROM `{_catalog}`.`{_schema}`.`_run_log` r "
-                    f"INNER JOIN ("
-                    f"  SELECT _run_id, AVG(completion_percent) AS overall_score "
-                    f"  FROM `{_catalog}`.`{_schema}`.waf_total_percentage_across_pillars_hist "
-                    f"  GROUP BY _run_id"
-                    f") avg_score ON avg_score._run_id = r.run_id "
-                    f"WHERE r.status IN ('success', 'partial') "
-                    f"ORDER BY r.run_id"
-                )
-                _r = _wc.statement_execution.execute_statement(
-                    statement=_stmt,
-                    warehouse_id=WAREHOUSE_ID,
-                    wait_timeout="20s",
-                )
+                def _progress_statement(with_fingerprints):
+                    # Unchanged runs reuse an older run's rows via _fingerprints
+                    _fp_join, _data_run = (
+                        (f"LEFT JOIN `{_catalog}`.`{_schema}`.`_fingerprints` fp "
+                         f"  ON fp.run_id = r.run_id AND fp.table_name = 'waf_total_percentage_across_pillars' ",
+                         "COALESCE(fp.data_run_id, r.run_id)")
+                        if with_fingerprints else ("", "r.run_id")
+                    )
+                    return (
+                        f"SELECT r.run_id, r.triggered_at, ROUND(avg_score.overall_score, 2) AS overall_score "
+                        f"FROM `{_catalog}`.`{_schema}`.`_run_log` r "
+                        f"{_fp_join}"
+                        f"INNER JOIN ("
+                        f"  SELECT _run_id, AVG(completion_percent) AS overall_score "
+                        f"  FROM `{_catalog}`.`{_schema}`.waf_total_percentage_across_pillars_hist "
+                        f"  GROUP BY _run_id"
+                        f") avg_score ON avg_score._run_id = {_data_run} "
+                        f"WHERE r.status IN ('success', 'partial') "
+                        f"ORDER BY r.run_id"
+                    )
+
+                def _run_progress(with_fingerprints):
+                    return _wc.statement_execution.execute_statement(
+                        statement=_progress_statement(with_fingerprints),
+                        warehouse_id=WAREHOUSE_ID,
+                        wait_timeout="20s",
+                    )
+
+                # Catalogs not yet reloaded with fingerprinting have no _fingerprints table
+                try:
+                    _r = _run_progress(True)
+                    _err = _r.status.error if _r.status and _r.status.state == StatementState.FAILED else None
+                    _missing = _err is not None and "TABLE_OR_VIEW_NOT_FOUND" in str(_err.message or "")
+                except Exception as _exc:
+                    if "TABLE_OR_VIEW_NOT_FOUND" not in str(_exc):
+                        raise
+                    _missing = True
+                if _missing:
+                    _r = _run_progress(False)
                 if _r.status and _r.status.state == StatementState.SUCCEEDED and _r.result and _r.result.data_array:
                     rows = _r.result.data_array
                     cols = None
@@ -300,6 +325,83 @@ if st.session_state.waf_page == "progress":
                 st.error(f"Failed to load progress: {e}")
     st.stop()
 
+if st.session_state.waf_page == "performance":
+    st.title("⏱️ Reload Performance")
+    st.markdown("Slowest datasets of a reload run, compared with the median of their previous runs.")
+    st.markdown("---")
+    if st.button("← Back to Dashboard", type="secondary", key="back_performance"):
+        st.session_state.waf_page = "dashboard"
+        st.session_state._nav_by_user = True
+        try:
+            st.query_params.clear()
+        except Exception:
+            pass
+        st.rerun()
+    if not WAREHOUSE_ID:
+        st.warning("No warehouse configured (WAF_WAREHOUSE_ID). Run install and set app env vars.")
+    else:
+        _wc = _get_ws_client()
+        if not _wc:
+            st.error("Databricks SDK could not initialise.")
+        else:
+            try:
+                import pandas as pd
+                from databricks.sdk.service.sql import StatementState
+                from reload_log import REGRESSION_RATIO, TRAILING_RUNS, report_statement
+                _f1, _f2 = st.columns(2)
+                with _f1:
+                    _perf_run = st.text_input("Run ID (blank = latest logged run)", value="")
+                with _f2:
+                    _trailing = st.number_input("Trailing runs for the median", min_value=1,
+                                                max_value=50, value=TRAILING_RUNS)
+                _stmt = report_statement(
+                    _catalog,
+                    run_id=int(_perf_run) if _perf_run.strip().isdigit() else None,
+                    trailing_runs=int(_trailing),
+                )
+                _r = _wc.statement_execution.execute_statement(
+                    statement=_stmt,
+                    warehouse_id=WAREHOUSE_ID,
+                    wait_timeout="30s",
+                )
+                if _r.status and _r.status.state == StatementState.SUCCEEDED and _r.result and _r.result.data_array:
+                    cols = [c.name for c in _r.manifest.schema.columns]
+                    _perf_df = pd.DataFrame(_r.result.data_array, columns=cols)
+                    for _c in ("duration_seconds", "trailing_median_seconds", "slowdown"):
+                        _perf_df[_c] = pd.to_numeric(_perf_df[_c], errors="coerce")
+                    _perf_df["regressed"] = _perf_df["regressed"].astype(str).str.lower() == "true"
+                    _ok = _perf_df[_perf_df["status"] == "success"]
+                    _m1, _m2, _m3, _m4 = st.columns(4)
+                    with _m1:
+                        st.metric("Datasets", len(_perf_df))
+                    with _m2:
+                        st.metric("Total query time", f"{_ok['duration_seconds'].sum():.0f}s")
+                    with _m3:
+                        st.metric("Regressions", int(_perf_df["regressed"].sum()))
+                    with _m4:
+                        st.metric("Failed / skipped", int((_perf_df["status"] != "success").sum()))
+                    _regressed = _perf_df[_perf_df["regressed"]]
+                    if not _regressed.empty:
+                        st.warning(
+                            f"{len(_regressed)} dataset(s) took more than {REGRESSION_RATIO}× their "
+                            f"trailing median: " + ", ".join(_regressed["table_name"].tolist())
+                        )
+                    st.subheader("Slowest datasets")
+                    st.bar_chart(_ok.head(15).set_index("table_name")[["duration_seconds", "trailing_median_seconds"]])
+                    st.dataframe(
+                        _perf_df[["display_name", "table_name", "status", "duration_seconds",
+                                  "trailing_median_seconds", "slowdown", "regressed",
+                                  "rows_written", "bytes_written", "statement_id", "error"]],
+                        use_container_width=True,
+                        hide_index=True,
+                    )
+                    st.caption("Timings come from waf_cache._dataset_log, written by every reload.")
+                else:
+                    st.info("No dataset timings yet. Run Reload Data to populate _dataset_log.")
+            except Exception as e:
+                st.error(f"Failed to load reload performance: {e}")
+    st.stop()
+
 if st.session_state.waf_page == "recommendations":
     st.title("📋 WAF Recommendations (Not Met)")
     st.markdown("Controls that did not meet threshold and their recommended actions.")
@@ -533,7 +635,7 @@ with col2:
 st.markdown("---")
 
 # View Recommendations + View Progress (open in new tab)
-_rec_col1, _rec_col2, _rec_col3, _rec_col4 = st.columns([1, 2, 2, 1])
+_rec_col1, _rec_col2, _rec_col3, _rec_col4, _rec_col5 = st.columns([1, 2, 2, 2, 1])
 _link_style = (
     'display:inline-block;width:100%;padding:0.5rem 1rem;border-radius:0.5rem;'
     'background-color:#f0f2f6;color:#31333f;text-align:center;text-decoration:none;'
@@ -551,6 +653,12 @@ with _rec_col3:
         '📈 View Progress</a>',
         unsafe_allow_html=True,
     )
+with _rec_col4:
+    st.markdown(
+        f'<a href="?page=performance" target="_blank" rel="noopener noreferrer" style="{_link_style}">'
+        '⏱️ Reload Performance</a>',
+        unsafe_allow_html=True,
+    )
 
 st.markdown("---")
 
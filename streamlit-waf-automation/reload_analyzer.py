@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Static SQL analyzer for the dataset registry (dashboard_queries.yaml).
+
+Parses every dataset in the compiled plan (reload_registry.py) with sqlglot,
+fully offline, and reports:
+
+  unbounded-scan       error    A large, date-partitioned system table read
+                                with no predicate on its date/time columns in
+                                the (sub)query that reads it or one wrapping it.
+  window-full-history  warning  A window function over a system table's whole
+                                history (an unbounded history table, or a
+                                change_time snapshot table such as
+                                system.compute.clusters).
+  select-star-system   warning  SELECT * straight from a system table.
+  repeated-cte         warning  The same CTE body over system tables in more
+                                than one dataset (candidate for a _stage_* or
+                                _rollup_* table).
+  parse-error          warning  SQL sqlglot could not parse.
+
+Findings already accepted are listed in reload_analyzer_baseline.json, so the
+analyzer can gate new WAF controls without failing on existing ones:
+
+    python reload_analyzer.py                    # new errors fail (exit 1)
+    python reload_analyzer.py --strict           # new warnings fail too
+    python reload_analyzer.py --all              # list baselined findings too
+    python reload_analyzer.py --update-baseline  # accept the current findings
+
+sqlglot is only needed here (pip install sqlglot), not by the reload paths.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import defaultdict
+
+try:
+    import yaml
+except ImportError:
+    print("ERROR: pyyaml not installed.")
+    sys.exit(1)
+
+try:
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.optimizer.scope import traverse_scope
+except ImportError:
+    print("ERROR: sqlglot not installed (pip install sqlglot).")
+    sys.exit(1)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from reload_registry import compile_registry  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(SCRIPT_DIR, 'reload_analyzer_baseline.json')
+
+ERROR = 'error'
+WARNING = 'warning'
+
+# Large system tables and the date/time columns that bound a scan of them
+DATE_COLUMNS = {
+    'system.access.audit': ('event_date', 'event_time'),
+    'system.access.column_lineage': ('event_date', 'event_time'),
+    'system.access.table_lineage': ('event_date', 'event_time'),
+    'system.billing.usage': ('usage_date', 'usage_start_time', 'usage_end_time'),
+    'system.compute.node_timeline': ('start_time', 'end_time'),
+    'system.compute.warehouse_events': ('event_time',),
+    'system.lakeflow.job_run_timeline': ('period_start_time', 'period_end_time'),
+    'system.lakeflow.job_task_run_timeline': ('period_start_time', 'period_end_time'),
+    'system.query.history': ('start_time', 'end_time'),
+    'system.serving.endpoint_usage': ('request_time',),
+}
+
+# Slowly changing snapshot tables: one row per change, keyed by change_time
+SNAPSHOT_TABLES = (
+    'system.compute.clusters',
+    'system.compute.warehouses',
+    'system.lakeflow.jobs',
+    'system.lakeflow.job_tasks',
+    'system.serving.served_entities',
+)
+
+_PARAMS = {
+    ':catalog': '`main`',
+    ':date_range_start': "'2000-01-01'",
+    ':date_range_end': "'2000-01-31'",
+    ':rollback_days': '30',
+}
+
+
+def _bind(sql):
+    """Replace the reload's parameters with literals so the SQL parses."""
+    for name in sorted(_PARAMS, key=len, reverse=True):
+        sql = sql.replace(name, _PARAMS[name])
+    return sql.rstrip().rstrip(';')
+
+
+def _table_name(table):
+    return '.'.join(p for p in (table.catalog, table.db, table.name) if p).lower()
+
+
+def _finding(ds, rule, severity, detail, message):
+    return {
+        'dataset': ds['name'],
+        'table_name': ds['table_name'],
+        'rule': rule,
+        'severity': severity,
+        'detail': detail,
+        'message': message,
+        'key': f"{rule}:{ds['name']}:{detail}",
+    }
+
+
+def _predicate_columns(select):
+    """Column names used in a SELECT's WHERE / JOIN ON / HAVING / QUALIFY, outside window specs."""
+    nodes = [select.args.get(k) for k in ('where', 'having', 'qualify')]
+    nodes += [j.args.get('on') for j in select.args.get('joins') or []]
+    cols = set()
+    for node in nodes:
+        if node is None:
+            continue
+        for col in node.find_all(exp.Column):
+            if not col.find_ancestor(exp.Window):
+                cols.add(col.name.lower())
+    return cols
+
+
+def _consumers(scopes):
+    """id(scope) -> scopes that read it as a derived table or CTE."""
+    consumers = defaultdict(list)
+    for scope in scopes:
+        for source in scope.sources.values():
+            if not isinstance(source, exp.Table):
+                consumers[id(source)].append(scope)
+    return consumers
+
+
+def _bounded(scope, columns, consumers, seen=None):
+    """True if `columns` are filtered in this scope or in any scope that reads it."""
+    seen = seen or set()
+    if id(scope) in seen:
+        return False
+    seen.add(id(scope))
+    if isinstance(scope.expression, exp.Select) and _predicate_columns(scope.expression) & set(columns):
+        return True
+    return any(_bounded(parent, columns, consumers, seen) for parent in consumers.get(id(scope), []))
+
+
+def _has_window(select):
+    return any(True for _ in select.find_all(exp.Window)
+               if _.find_ancestor(exp.Select) is select)
+
+
+def _has_star(select):
+    return any(isinstance(e, exp.Star) or (isinstance(e, exp.Column) and isinstance(e.this, exp.Star))
+               for e in select.expressions)
+
+
+def analyze_dataset(ds):
+    """
+    Findings for one plan dataset, plus its CTE fingerprints.
+
+    Returns:
+        (findings, ctes) where ctes is a list of (cte_hash, cte_name)
+        for CTEs that read system tables.
+    """
+    findings, ctes = [], []
+    try:
+        tree = sqlglot.parse_one(_bind(ds['sql']), read='databricks')
+    except Exception as exc:
+        first = str(exc).splitlines()[0][:160] if str(exc) else type(exc).__name__
+        return [_finding(ds, 'parse-error', WARNING, 'sql', f"could not parse: {first}")], []
+
+    scopes = list(traverse_scope(tree))
+    consumers = _consumers(scopes)
+    reported = set()
+    for scope in scopes:
+        select = scope.expression
+        if not isinstance(select, exp.Select):
+            continue
+        system = [_table_name(t) for t in scope.sources.values()
+                  if isinstance(t, exp.Table) and _table_name(t).startswith('system.')]
+        for name in system:
+            columns = DATE_COLUMNS.get(name)
+            unbounded = columns is not None and not _bounded(scope, columns, consumers)
+            if unbounded and ('unbounded-scan', name) not in reported:
+                reported.add(('unbounded-scan', name))
+                findings.append(_finding(
+                    ds, 'unbounded-scan', ERROR, name,
+                    f"{name} read without a predicate on {' / '.join(columns)}"))
+            if _has_window(select) and (unbounded or name in SNAPSHOT_TABLES) \
+                    and ('window-full-history', name) not in reported:
+                reported.add(('window-full-history', name))
+                findings.append(_finding(
+                    ds, 'window-full-history', WARNING, name,
+                    f"window function over the full history of {name}"))
+            if _has_star(select) and ('select-star-system', name) not in reported:
+                reported.add(('select-star-system', name))
+                findings.append(_finding(
+                    ds, 'select-star-system', WARNING, name, f"SELECT * from {name}"))
+
+    for cte in tree.find_all(exp.CTE):
+        if any(_table_name(t).startswith('system.') for t in cte.this.find_all(exp.Table)):
+            body = cte.this.sql(dialect='databricks', normalize=True)
+            ctes.append((hashlib.sha256(body.encode('utf-8')).hexdigest()[:12], cte.alias_or_name))
+    return findings, ctes
+
+
+def analyze(plan):
+    """All findings for a compiled plan, sorted by dataset then rule."""
+    findings = []
+    cte_users = defaultdict(list)
+    for ds in plan['datasets']:
+        ds_findings, ctes = analyze_dataset(ds)
+        findings += ds_findings
+        for cte_hash, cte_name in ctes:
+            cte_users[cte_hash].append((ds, cte_name))
+
+    for cte_hash, users in cte_users.items():
+        datasets = {ds['name'] for ds, _ in users}
+        if len(datasets) < 2:
+            continue
+        for ds, cte_name in users:
+            others = sorted(d['table_name'] for d, _ in users if d['name'] != ds['name'])
+            findings.append(_finding(
+                ds, 'repeated-cte', WARNING, cte_name,
+                f"CTE {cte_name} also appears in {', '.join(others)}"))
+    return sorted(findings, key=lambda f: (f['dataset'], f['rule'], f['detail']))
+
+
+def load_baseline(path):
+    """Accepted finding keys ([] if the file does not exist)."""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return set(json.load(f).get('accepted', []))
+
+
+def write_baseline(path, findings):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'accepted': sorted({x['key'] for x in findings})}, f, indent=2)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Static analysis of dashboard_queries.yaml SQL')
+    parser.add_argument('--yaml', default=os.path.join(SCRIPT_DIR, 'dashboard_queries.yaml'))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='Accepted findings (default reload_analyzer_baseline.json)')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Accept every current finding and rewrite the baseline')
+    parser.add_argument('--strict', action='store_true', help='Fail on new warnings as well as errors')
+    parser.add_argument('--all', action='store_true', help='Also list baselined findings')
+    parser.add_argument('--json', action='store_true', help='Print findings as JSON')
+    args = parser.parse_args()
+
+    with open(args.yaml, encoding='utf-8') as f:
+        plan = compile_registry(yaml.safe_load(f))
+    if plan['errors']:
+        print("ERROR: dashboard_queries.yaml does not compile; run reload_registry.py")
+        sys.exit(1)
+
+    findings = analyze(plan)
+    if args.update_baseline:
+        write_baseline(args.baseline, findings)
+        print(f"Baseline updated: {len(findings)} finding(s) accepted in {args.baseline}")
+        return
+
+    accepted = load_baseline(args.baseline)
+    for x in findings:
+        x['baselined'] = x['key'] in accepted
+    new = [x for x in findings if not x['baselined']]
+    shown = findings if args.all else new
+
+    if args.json:
+        print(json.dumps(shown, indent=2))
+    else:
+        for x in shown:
+            mark = '✗' if x['severity'] == ERROR else '⚠'
+            tag = ' (baselined)' if x['baselined'] else ''
+            print(f"{mark} {x['dataset']} ({x['table_name']}) [{x['rule']}] {x['message']}{tag}")
+        print(f"\n{len(plan['datasets'])} dataset(s) analyzed: {len(findings)} finding(s), "
+              f"{len(new)} new ({sum(1 for x in new if x['severity'] == ERROR)} error(s))")
+
+    failing = [x for x in new if x['severity'] == ERROR or args.strict]
+    sys.exit(1 if failing else 0)
+
+
+if __name__ == '__main__':
+    main()
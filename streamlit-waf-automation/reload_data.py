@@ -1,32 +1,69 @@
 #!/usr/bin/env python3
 """
 Reload WAF dashboard data:
-  1. Read dashboard_queries.yaml (single source of truth)
+  1. Read dashboard_queries.yaml (single source of truth) and compile it into
+     an execution plan, stopping on conflicts (reload_registry.py)
   2. For each active dataset, run the SQL on a Databricks warehouse
-  3. APPEND results into {catalog}.waf_cache.{table_name}_hist  (history kept)
-  4. CREATE OR REPLACE VIEW {catalog}.waf_cache.{table_name}     (latest run only)
+     (in dependency order — see reload_scheduler.py)
+  3. APPEND results into {catalog}.waf_cache.{table_name}_hist  (history kept,
+     clustered by _run_id)
+  4. CREATE OR REPLACE VIEW {catalog}.waf_cache.{table_name}     (latest run only,
+     via the single-row _latest_run pointer moved when a run finishes)
+  Datasets marked `is_view: true` are created directly as views.
+  Before step 2, the daily waf_cache._rollup_* aggregates of billing and
+  compute usage are brought up to date (reload_rollups.py), and heavily
+  shared system tables are staged once into waf_cache._stage_* tables that
+  dataset SQL reads instead (reload_staging.py).
 
 The dashboard reads from the views — always sees the latest successful run.
-Historical data accumulates in the _hist tables.
+A dataset whose result is unchanged from its previous run keeps no new rows;
+its view reads the earlier run's rows instead (reload_fingerprint.py).
+Historical data accumulates in the _hist tables; after each run, old runs are
+pruned and the waf_cache tables compacted and vacuumed (reload_maintenance.py).
 
 Credentials come exclusively from environment variables (injected by Databricks Apps):
     DATABRICKS_HOST   – workspace URL
     DATABRICKS_TOKEN  – OAuth token
     WAF_CATALOG       – Unity Catalog name (set in app.yaml by install.ipynb)
     WAF_YAML_PATH     – optional override path to dashboard_queries.yaml
+    WAF_RELOAD_WORKERS – optional max datasets in flight at once (default 8)
+    WAF_RELOAD_TIMEOUT – optional per-dataset timeout in seconds (default 900)
+    WAF_RELOAD_STAGING – optional, "false" disables shared-scan staging
+    WAF_RELOAD_FINGERPRINT – optional, "false" always appends every dataset's rows
+    WAF_KEEP_RUNS      – optional newest runs kept in _hist tables (default 30, 0 keeps all)
+    WAF_KEEP_DAILY_DAYS – optional days for which one run per day is also kept (default 90)
+    WAF_MAINTENANCE_EVERY – optional, run maintenance every N runs (default 1, 0 disables)
+
+Per-dataset timings land in waf_cache._dataset_log; `--report` prints the
+slowest datasets of the latest run and flags regressions (reload_log.py).
+`--resume RUN_ID` (or `--only-failed` for the most recent run) re-runs just
+the datasets that did not succeed in that run, into the same run_id.
+`--profile [DIR]` samples every thread for the whole run and stores collapsed
+stacks plus per-dataset timings (waf_core/profiling.py, needs the repo checkout):
+    WAF_PROFILE_DIR    – optional default directory for --profile (default waf_profiles)
+
+`--backend local --snapshot-dir DIR` runs everything offline on DuckDB over
+Parquet snapshots of the system tables instead of a warehouse, with no
+credentials needed (reload_local.py):
+    WAF_RELOAD_BACKEND – optional, "local" selects the offline backend
+    WAF_SNAPSHOT_DIR   – snapshot directory for the local backend
+    WAF_LOCAL_DB       – optional DuckDB file for waf_cache (default <snapshot dir>/<catalog>.duckdb)
 """
 import argparse
+import importlib.util
 import json
 import os
+import queue
 import sys
+import threading
 import time
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, timedelta
 
 try:
     import requests
 except ImportError:
-    print("ERROR: requests not installed.")
-    sys.exit(1)
+    requests = None  # only needed with --backend databricks (checked in main)
 
 try:
     import yaml
@@ -37,13 +74,26 @@ except ImportError:
 try:
     from databricks import sql as dbsql
 except ImportError:
-    print("ERROR: databricks-sql-connector not installed.")
-    sys.exit(1)
+    dbsql = None  # only needed with --backend databricks (checked in main)
 
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+if requests is not None:
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import reload_fingerprint  # noqa: E402
+import reload_log  # noqa: E402
+from reload_maintenance import (  # noqa: E402
+    clustered_ensure_statement, clustered_record_statement, clustered_tables_statement,
+    format_stats, list_tables_statement, log_statements, maintain_table,
+    plan_retention, runs_statement, table_actions,
+)
+from reload_registry import compile_registry  # noqa: E402
+from reload_rollups import plan_rollups, refresh_rollup  # noqa: E402
+from reload_scheduler import SKIPPED, SUCCESS, critical_path, run_dag  # noqa: E402
+from reload_staging import plan_stages, rewrite_sql, stage_statement  # noqa: E402
 
 
 # ---------------------------------------------------------------------------
@@ -103,6 +153,10 @@ def substitute_date_params(sql):
     return sql
 
 
+def substitute_catalog_param(sql, catalog):
+    return sql.replace(':catalog', f"`{catalog}`")
+
+
 def strip_trailing_semicolon(sql):
     return sql.rstrip().rstrip(';').rstrip()
 
@@ -130,8 +184,10 @@ def migrate_old_plain_tables(cursor, catalog):
         f"SELECT table_name FROM `{catalog}`.information_schema.tables "
         f"WHERE table_schema = 'waf_cache' "
         f"  AND table_type = 'MANAGED' "
-        f"  AND table_name != '_run_log' "
+        f"  AND table_name NOT IN ('_run_log', '_latest_run', '_maintenance_log', '_dataset_log', '_fingerprints', '_clustered') "
         f"  AND table_name NOT LIKE '%\\_hist'"  # skip already-migrated hist tables
+        f"  AND table_name NOT LIKE '\\_stage\\_%'"  # shared-scan staging tables
+        f"  AND table_name NOT LIKE '\\_rollup\\_%'"  # incremental daily rollups
     )
     old_tables = [row[0] for row in cursor.fetchall()]
     if old_tables:
@@ -168,6 +224,34 @@ def ensure_run_log(cursor, catalog):
     )
 
 
+def ensure_latest_run(cursor, catalog):
+    """
+    Create the single-row _latest_run pointer that the latest-run views read.
+    Seeded from _run_log on first use so existing views keep their data.
+    """
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS `{catalog}`.`waf_cache`.`_latest_run` ("
+        f"  run_id INT,"
+        f"  finished_at TIMESTAMP"
+        f") USING DELTA"
+    )
+    cursor.execute(
+        f"INSERT INTO `{catalog}`.`waf_cache`.`_latest_run` "
+        f"SELECT run_id, finished_at FROM `{catalog}`.`waf_cache`.`_run_log` "
+        f"WHERE status IN ('success', 'partial') "
+        f"  AND NOT EXISTS (SELECT 1 FROM `{catalog}`.`waf_cache`.`_latest_run`) "
+        f"ORDER BY run_id DESC LIMIT 1"
+    )
+
+
+def set_latest_run(cursor, catalog, run_id, finished_at):
+    """Point every latest-run view at run_id (one atomic overwrite)."""
+    cursor.execute(
+        f"INSERT OVERWRITE `{catalog}`.`waf_cache`.`_latest_run` "
+        f"VALUES ({run_id}, TIMESTAMP('{finished_at}'))"
+    )
+
+
 def get_next_run_id(cursor, catalog):
     cursor.execute(
         f"SELECT COALESCE(MAX(run_id), 0) + 1 FROM `{catalog}`.`waf_cache`.`_run_log`"
@@ -194,6 +278,47 @@ def update_run_finished(cursor, catalog, run_id, finished_at, status, succeeded,
     )
 
 
+def find_resume_run(cursor, catalog, run_id=None):
+    """
+    (run_id, triggered_at, status) of the run to resume from _run_log: run_id,
+    or the most recent run when None. Raises ValueError if there is none.
+    """
+    where = f"WHERE run_id = {int(run_id)} " if run_id is not None else ""
+    rows = fetch_rows(
+        cursor,
+        f"SELECT run_id, triggered_at, status FROM `{catalog}`.`waf_cache`.`_run_log` "
+        f"{where}ORDER BY run_id DESC LIMIT 1"
+    )
+    if not rows:
+        raise ValueError(f"Run #{run_id} not found in _run_log" if run_id is not None
+                         else "No runs in _run_log to resume")
+    row = rows[0]
+    return int(row['run_id']), str(row['triggered_at'])[:19], row['status']
+
+
+def clear_run_rows(cursor, catalog, active, retry, run_id):
+    """
+    Delete run_id's rows from the _hist tables of datasets about to be re-run
+    (a statement cancelled on timeout may still have committed), along with
+    their _fingerprints rows for that run. Tables that another, already
+    successful dataset also writes are left alone.
+    """
+    retry_names = {ds.get('name') for ds in retry}
+    for table in sorted({ds['table_name'] for ds in retry if not ds.get('is_view')}):
+        if any(ds['table_name'] == table and ds.get('name') not in retry_names for ds in active):
+            continue
+        try:
+            cursor.execute(
+                f"DELETE FROM `{catalog}`.`waf_cache`.`{table}_hist` WHERE _run_id = {run_id}"
+            )
+            cursor.execute(
+                f"DELETE FROM `{catalog}`.`waf_cache`.`{reload_fingerprint.TABLE_NAME}` "
+                f"WHERE run_id = {run_id} AND table_name = '{table}'"
+            )
+        except Exception:
+            pass  # table not created yet
+
+
 # ---------------------------------------------------------------------------
 # Append data + create view
 # ---------------------------------------------------------------------------
@@ -201,7 +326,8 @@ def update_run_finished(cursor, catalog, run_id, finished_at, status, succeeded,
 def append_to_hist_table(cursor, catalog, table, sql, run_id, run_started_at):
     """
     Append this run's data into {table}_hist.
-    Creates the table on first run, then INSERTs on subsequent runs.
+    Creates the table (clustered by _run_id) on first run, then INSERTs on
+    subsequent runs.
     """
     hist = f"{table}_hist"
     wrapped = (
@@ -220,7 +346,7 @@ def append_to_hist_table(cursor, catalog, table, sql, run_id, run_started_at):
         if 'TABLE_OR_VIEW_NOT_FOUND' in err_str or 'Table or view not found' in err_str:
             # First run — create the table
             cursor.execute(
-                f"CREATE TABLE `{catalog}`.`waf_cache`.`{hist}` AS\n{wrapped}"
+                f"CREATE TABLE `{catalog}`.`waf_cache`.`{hist}` CLUSTER BY (_run_id) AS\n{wrapped}"
             )
         elif 'DELTA_INVALID_CHARACTERS_IN_COLUMN_NAMES' in err_str:
             # Sanitize column names and retry
@@ -242,27 +368,581 @@ def append_to_hist_table(cursor, catalog, table, sql, run_id, run_started_at):
                 )
             except Exception:
                 cursor.execute(
-                    f"CREATE TABLE `{catalog}`.`waf_cache`.`{hist}` AS\n{clean_wrapped}"
+                    f"CREATE TABLE `{catalog}`.`waf_cache`.`{hist}` CLUSTER BY (_run_id) AS\n{clean_wrapped}"
                 )
             cursor.execute(f"DROP VIEW IF EXISTS `{tmp}`")
         else:
             raise
 
 
+def ensure_hist_clustering(cursor, catalog, table, clustered):
+    """
+    Cluster an existing {table}_hist by _run_id (tables created before
+    clustering was introduced). New files are clustered from then on;
+    OPTIMIZE reclusters the old ones. Tables in `clustered` (loaded from
+    _clustered) are skipped; others are checked once, then recorded there.
+    """
+    if table in clustered:
+        return
+    hist = f"`{catalog}`.`waf_cache`.`{table}_hist`"
+    cursor.execute(f"DESCRIBE DETAIL {hist}")
+    cols = [desc[0] for desc in cursor.description]
+    row = cursor.fetchone()
+    clustering = row[cols.index('clusteringColumns')] if 'clusteringColumns' in cols else None
+    if list(clustering or []) != ['_run_id']:
+        cursor.execute(f"ALTER TABLE {hist} CLUSTER BY (_run_id)")
+    cursor.execute(clustered_record_statement(catalog, table))
+    clustered.add(table)
+
+
 def create_latest_view(cursor, catalog, table):
     """
     Create or replace a VIEW named {table} that always returns only the
     latest successful (or partial) run's data from {table}_hist.
+    The run comes from the single-row _latest_run pointer, or the older run
+    _fingerprints says holds its unchanged rows, so the filter is a constant
+    by the time the scan starts and prunes to that run's files.
     The dashboard reads from this view — no dashboard changes needed.
     """
     hist = f"{table}_hist"
     cursor.execute(
         f"CREATE OR REPLACE VIEW `{catalog}`.`waf_cache`.`{table}` AS\n"
         f"SELECT * FROM `{catalog}`.`waf_cache`.`{hist}`\n"
-        f"WHERE _run_id = (\n"
-        f"  SELECT MAX(run_id) FROM `{catalog}`.`waf_cache`.`_run_log`\n"
-        f"  WHERE status IN ('success', 'partial')\n"
-        f")"
+        f"WHERE _run_id = {reload_fingerprint.data_run_subquery(catalog, table)}"
+    )
+
+
+def reuse_if_unchanged(cursor, catalog, table, sql, run_id, previous):
+    """
+    Hash a dataset's result before writing anything. If it matches the
+    table's previous fingerprint, record that this run reuses the older rows.
+    Returns (reused_run_id or None, fingerprint or None); any error just
+    means the rows get appended as usual.
+    """
+    fingerprint = None
+    try:
+        fingerprint = fetch_rows(cursor, reload_fingerprint.fingerprint_sql(sql))[0]['fingerprint']
+        if fingerprint == previous['fingerprint']:
+            cursor.execute(reload_fingerprint.record_statement(
+                catalog, table, run_id, previous['data_run_id'], fingerprint))
+            return previous['data_run_id'], fingerprint
+    except Exception:
+        pass
+    return None, fingerprint
+
+
+def record_fingerprint(cursor, catalog, table, run_id, previous, fingerprint=None):
+    """
+    Record the fingerprint of the rows run_id just appended to {table}_hist
+    (hashing them unless `fingerprint` is already known). When they match
+    the previous run, record a reference instead and delete them again.
+    Returns the run_id whose rows the view serves for this run.
+    """
+    if fingerprint is None:
+        fingerprint = fetch_rows(
+            cursor, reload_fingerprint.hist_fingerprint_sql(catalog, table, run_id))[0]['fingerprint']
+    if previous and fingerprint == previous['fingerprint']:
+        cursor.execute(reload_fingerprint.record_statement(
+            catalog, table, run_id, previous['data_run_id'], fingerprint))
+        cursor.execute(reload_fingerprint.delete_run_rows_statement(catalog, table, run_id))
+        return previous['data_run_id']
+    cursor.execute(reload_fingerprint.record_statement(catalog, table, run_id, run_id, fingerprint))
+    return run_id
+
+
+# ---------------------------------------------------------------------------
+# Parallel execution
+# ---------------------------------------------------------------------------
+
+class ConnectionPool:
+    """
+    Fixed-size pool of databricks-sql-connector connections (or of local
+    backend connections, when `connect` is reload_local.connect).
+
+    Connections are opened lazily, so a small run never opens more sessions
+    than it has datasets. Each worker thread holds one connection at a time.
+    """
+
+    def __init__(self, size, connect=None, **connect_kwargs):
+        self.size = size
+        self._connect = connect or dbsql.connect
+        self._connect_kwargs = connect_kwargs
+        self._idle = queue.Queue()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = len(self._opened) < self.size
+                if can_open:
+                    conn = self._connect(**self._connect_kwargs)
+                    self._opened.append(conn)
+            if not can_open:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        for conn in self._opened:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._opened = []
+
+
+@contextmanager
+def cancel_after(cursor, timeout):
+    """
+    Cancel whatever `cursor` is running once `timeout` seconds have passed
+    (0/None disables). Yields an Event that is set if the timer fired.
+    """
+    timed_out = threading.Event()
+
+    def _cancel():
+        timed_out.set()
+        try:
+            cursor.cancel()
+        except Exception:
+            pass
+
+    timer = threading.Timer(timeout, _cancel) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+    try:
+        yield timed_out
+    finally:
+        if timer:
+            timer.cancel()
+
+
+def run_dataset(pool, catalog, ds, run_id, run_started_at, timeout,
+                fingerprint=False, previous=None, clustered=None):
+    """
+    Append one dataset into its _hist table on a pooled connection and create
+    its latest-run view, so dependents created later in the run can reference
+    it. The view serves this run's rows once the run is recorded as finished.
+    Datasets marked `is_view` are created as plain views instead.
+    With `fingerprint`, an unchanged result (vs `previous`, the table's last
+    _fingerprints row) keeps no new rows (see reload_fingerprint.py).
+    `clustered` is the set of tables whose _hist is known to be clustered.
+    A timer cancels the running statement once `timeout` seconds have passed.
+    Returns (ok, (elapsed_seconds, error_message, info)) where info holds the
+    _dataset_log fields: started_at, finished_at, rows_written,
+    bytes_written and statement_id, plus reused_run_id when older rows are reused.
+    """
+    t0 = time.time()
+    info = {'started_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}
+
+    def _finish():
+        info['finished_at'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        return info
+
+    with pool.connection() as conn:
+        with conn.cursor() as cursor, cancel_after(cursor, timeout) as timed_out:
+            try:
+                table = ds['table_name']
+                prepared_sql = strip_trailing_semicolon(
+                    substitute_catalog_param(substitute_date_params(ds['sql']), catalog)
+                )
+                warning = None
+                if ds.get('is_view'):
+                    cursor.execute(
+                        f"CREATE OR REPLACE VIEW `{catalog}`.`waf_cache`.`{table}` AS\n{prepared_sql}"
+                    )
+                    info['statement_id'] = getattr(cursor, 'query_id', None)
+                else:
+                    reused, known = None, None
+                    if fingerprint and reload_fingerprint.probe_first(previous):
+                        reused, known = reuse_if_unchanged(cursor, catalog, table, prepared_sql,
+                                                           run_id, previous)
+                    if reused is None:
+                        append_to_hist_table(cursor, catalog, table, prepared_sql,
+                                             run_id, run_started_at)
+                        info['statement_id'] = getattr(cursor, 'query_id', None)
+                        try:
+                            cursor.execute(reload_log.write_metrics_statement(catalog, f"{table}_hist"))
+                            cols = [desc[0] for desc in cursor.description]
+                            row = cursor.fetchone()
+                            info['rows_written'], info['bytes_written'] = reload_log.write_metrics(
+                                row[cols.index('operationMetrics')] if row else None
+                            )
+                        except Exception:
+                            pass  # metrics are best effort
+                        if fingerprint:
+                            try:
+                                served = record_fingerprint(cursor, catalog, table, run_id,
+                                                            previous, known)
+                                if served != run_id:
+                                    reused = served
+                            except Exception as exc:
+                                warning = f"could not fingerprint {table}: {exc}"
+                    if reused is not None:
+                        info['reused_run_id'] = reused
+                        info['rows_written'], info['bytes_written'] = 0, 0
+                    try:
+                        ensure_hist_clustering(cursor, catalog, table,
+                                               clustered if clustered is not None else set())
+                    except Exception as exc:
+                        warning = f"could not cluster {table}_hist by _run_id: {exc}"
+                    try:
+                        create_latest_view(cursor, catalog, table)
+                    except Exception as exc:
+                        warning = f"could not create view: {exc}"
+                if timed_out.is_set():
+                    raise TimeoutError(f"timed out after {timeout}s")
+                return True, (time.time() - t0, warning, _finish())
+            except Exception as exc:
+                if timed_out.is_set():
+                    return False, (time.time() - t0, f"timed out after {timeout}s (cancelled)", _finish())
+                return False, (time.time() - t0, str(exc), _finish())
+
+
+def run_rollups(pool, catalog, active, workers, timeout):
+    """
+    Bring the waf_cache._rollup_* tables this run's datasets read up to date
+    (see reload_rollups.py). Only the trailing days are recomputed; a failed
+    refresh leaves the previous contents in place.
+    """
+    rollups = plan_rollups([ds['sql'] for ds in active])
+    if not rollups:
+        return
+
+    print(f"Refreshing {len(rollups)} daily rollup table(s)...")
+
+    def _run(rollup):
+        t0 = time.time()
+        with pool.connection() as conn:
+            with conn.cursor() as cursor, cancel_after(cursor, timeout) as timed_out:
+                def _execute(sql):
+                    if timed_out.is_set():
+                        raise TimeoutError(f"timed out after {timeout}s")
+                    cursor.execute(sql)
+
+                def _fetch_value(sql):
+                    _execute(sql)
+                    row = cursor.fetchone()
+                    return row[0] if row else None
+
+                try:
+                    msg = refresh_rollup(rollup, catalog, _execute, _fetch_value)
+                    if timed_out.is_set():
+                        raise TimeoutError(f"timed out after {timeout}s")
+                    return True, (time.time() - t0, msg)
+                except Exception as exc:
+                    if timed_out.is_set():
+                        return False, f"timed out after {timeout}s (cancelled)"
+                    return False, str(exc)
+
+    def _on_done(i, status, detail):
+        name = rollups[i]['table_name']
+        if status == SUCCESS:
+            elapsed, msg = detail
+            print(f"  ✓ {name} ({elapsed:.1f}s, {msg})")
+        else:
+            print(f"  ⚠ {name} not refreshed, dependents read its previous contents: {detail}")
+
+    run_dag(rollups, _run, max_workers=workers, on_done=_on_done)
+    print()
+
+
+def run_staging(pool, catalog, active, workers, timeout):
+    """
+    Materialize the shared _stage_* tables this run's datasets can use (see
+    reload_staging.py), then rewrite dataset SQL to read from the stages that
+    were built. Datasets whose stage failed keep their original SQL.
+    Returns the dataset list with rewritten SQL.
+    """
+    prepared = [
+        strip_trailing_semicolon(substitute_catalog_param(substitute_date_params(ds['sql']), catalog))
+        for ds in active
+    ]
+    stages = plan_stages(prepared, catalog)
+    if not stages:
+        return active
+
+    print(f"Staging {len(stages)} shared table(s)...")
+
+    def _run(stage):
+        t0 = time.time()
+        with pool.connection() as conn:
+            with conn.cursor() as cursor, cancel_after(cursor, timeout) as timed_out:
+                try:
+                    cursor.execute(stage_statement(stage, catalog))
+                    return True, time.time() - t0
+                except Exception as exc:
+                    if timed_out.is_set():
+                        return False, f"timed out after {timeout}s (cancelled)"
+                    return False, str(exc)
+
+    def _on_done(i, status, detail):
+        name = stages[i]['table_name']
+        if status == SUCCESS:
+            print(f"  ✓ {name} ({detail:.1f}s)")
+        else:
+            print(f"  ⚠ {name} not staged, dependents read system tables: {detail}")
+
+    outcome = run_dag(stages, _run, max_workers=workers, on_done=_on_done)
+    built = {stages[i]['table_name'] for i, (st, _) in enumerate(outcome) if st == SUCCESS}
+
+    staged, rewritten = [], 0
+    for ds, sql in zip(active, prepared):
+        new_sql, used = rewrite_sql(sql, catalog, built)
+        if used:
+            rewritten += 1
+            ds = dict(ds, sql=new_sql)
+        staged.append(ds)
+    print(f"  {rewritten} dataset(s) read from staged tables\n")
+    return staged
+
+
+def fetch_rows(cursor, sql):
+    """Execute sql and return its result rows as dicts ([] for statements without results)."""
+    cursor.execute(sql)
+    if not cursor.description:
+        return []
+    cols = [desc[0] for desc in cursor.description]
+    return [dict(zip(cols, row)) for row in cursor.fetchall()]
+
+
+def run_maintenance(pool, catalog, run_id, workers, timeout, keep_runs, keep_daily_days):
+    """
+    Apply history retention, OPTIMIZE and VACUUM to every managed waf_cache
+    table (see reload_maintenance.py), print what was reclaimed and append it
+    to waf_cache._maintenance_log. Failures are reported, never raised.
+    """
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            tables = [r['table_name'] for r in fetch_rows(cursor, list_tables_statement(catalog))]
+            runs = [(r['run_id'], r['triggered_at']) for r in fetch_rows(cursor, runs_statement(catalog))]
+            pointer = fetch_rows(cursor, f"SELECT run_id FROM `{catalog}`.`waf_cache`.`_latest_run`")
+    pinned = pointer[0]['run_id'] if pointer else None
+    cutoff, keep_older = plan_retention(runs, keep_runs, keep_daily_days, pinned)
+    targets = [{'table_name': t} for t in sorted(tables) if table_actions(t)]
+    if cutoff is None:
+        print(f"\nMaintaining {len(targets)} waf_cache table(s) (retention: nothing to prune)...")
+    else:
+        print(f"\nMaintaining {len(targets)} waf_cache table(s) "
+              f"(retention: runs < {cutoff} except {len(keep_older)} daily run(s))...")
+
+    results = []
+
+    def _run(target):
+        t0 = time.time()
+        with pool.connection() as conn:
+            with conn.cursor() as cursor, cancel_after(cursor, timeout) as timed_out:
+                try:
+                    stats = maintain_table(catalog, target['table_name'],
+                                           lambda sql: fetch_rows(cursor, sql),
+                                           cutoff, keep_older)
+                    return True, (time.time() - t0, stats)
+                except Exception as exc:
+                    if timed_out.is_set():
+                        return False, (time.time() - t0, f"timed out after {timeout}s (cancelled)")
+                    return False, (time.time() - t0, str(exc))
+
+    def _on_done(i, status, detail):
+        name = targets[i]['table_name']
+        elapsed, info = detail
+        if status == SUCCESS:
+            results.append((name, info, elapsed, None))
+            if info['rows_deleted'] or info['files_after'] != info['files_before']:
+                print(f"  ✓ {name}: {format_stats(info)}")
+        else:
+            results.append((name, None, elapsed, info))
+            print(f"  ⚠ {name}: {info}")
+
+    run_dag(targets, _run, max_workers=workers, on_done=_on_done)
+
+    ok = [stats for _, stats, _, err in results if stats]
+    print(f"  {len(ok)}/{len(targets)} table(s) maintained: "
+          f"{sum(s['rows_deleted'] for s in ok)} row(s) deleted, files "
+          f"{sum(s['files_before'] for s in ok)} → {sum(s['files_after'] for s in ok)}, "
+          f"{sum(s['bytes_before'] - s['bytes_after'] for s in ok) / (1024 * 1024):.1f} MB reclaimed")
+    try:
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                for statement in log_statements(catalog, run_id, results):
+                    cursor.execute(statement)
+    except Exception as exc:
+        print(f"  ⚠ could not write _maintenance_log: {exc}")
+
+
+def run_datasets_parallel(pool, catalog, active, run_id, run_started_at, workers, timeout,
+                          fingerprint=True, profile=None):
+    """
+    Run every dataset through the dependency scheduler with at most `workers`
+    in flight. Progress lines are printed in YAML order as soon as each prefix
+    of the list has finished, so the log reads the same as a sequential run.
+    Recent median durations from _dataset_log weight the critical path, and
+    every dataset's outcome is appended to _dataset_log at the end.
+    With `fingerprint`, unchanged single-writer tables reuse their previous rows.
+    With `profile` (--profile), each dataset's timing is added to the profile.
+    Returns (successes, failures) in YAML order; skipped datasets count as failures.
+    """
+    results = {}
+    next_to_print = 0
+    total = len(active)
+
+    def _on_done(i, status, detail):
+        nonlocal next_to_print
+        if not isinstance(detail, tuple):  # skipped, or run_dataset itself raised
+            detail = (0.0, str(detail), {})
+        results[i] = (status, detail)
+        if profile is not None:
+            elapsed, _, info = detail
+            profile.add_statement(active[i]['table_name'], elapsed, status=status,
+                                  statement_id=info.get('statement_id'),
+                                  rows=info.get('rows_written'))
+        while next_to_print in results:
+            ds = active[next_to_print]
+            ds_status, (elapsed, msg, _) = results[next_to_print]
+            target = ds['table_name'] if ds.get('is_view') else f"{ds['table_name']}_hist"
+            print(f"[{next_to_print + 1:2d}/{total}] {ds['display_name']} → "
+                  f"{catalog}.waf_cache.{target}")
+            if ds_status == SUCCESS:
+                reused = results[next_to_print][1][2].get('reused_run_id')
+                print(f"       ✓ {elapsed:.1f}s"
+                      + (f" (unchanged, reusing run #{reused})" if reused is not None else ""))
+                if msg:
+                    print(f"       ⚠ {msg}")
+            elif ds_status == SKIPPED:
+                print(f"       ⏭ SKIPPED: {msg}")
+            else:
+                print(f"       ✗ FAILED ({elapsed:.1f}s): {msg}")
+            next_to_print += 1
+        sys.stdout.flush()
+
+    eligible = reload_fingerprint.fingerprinted_tables(active) if fingerprint else set()
+    previous = load_previous_fingerprints(pool, catalog, run_id) if eligible else {}
+    clustered = load_clustered_tables(pool, catalog)
+
+    def _run(ds):
+        table = ds['table_name']
+        return run_dataset(pool, catalog, ds, run_id, run_started_at, timeout,
+                           fingerprint=table in eligible, previous=previous.get(table),
+                           clustered=clustered)
+
+    weights = load_dataset_weights(pool, catalog)
+    outcome = run_dag(active, _run, max_workers=workers, on_done=_on_done, weights=weights)
+    write_dataset_log(pool, catalog, run_id, active, results)
+
+    successes = [active[i]['table_name'] for i in range(total) if outcome[i][0] == SUCCESS]
+    failures = [(active[i]['display_name'], results[i][1][1])
+                for i in range(total) if outcome[i][0] != SUCCESS]
+    return successes, failures
+
+
+def load_previous_fingerprints(pool, catalog, run_id):
+    """Each table's newest _fingerprints row before run_id ({} if unavailable)."""
+    try:
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                rows = fetch_rows(cursor, reload_fingerprint.previous_statement(catalog, run_id))
+        return {r['table_name']: r for r in rows}
+    except Exception:
+        return {}
+
+
+def load_clustered_tables(pool, catalog):
+    """Tables whose _hist is already clustered by _run_id (empty if unavailable)."""
+    try:
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                rows = fetch_rows(cursor, clustered_tables_statement(catalog))
+        return {r['table_name'] for r in rows}
+    except Exception:
+        return set()
+
+
+def load_profiling():
+    """waf_core/profiling.py loaded by path (this directory deploys without waf_core)."""
+    path = os.path.join(SCRIPT_DIR, '..', 'waf_core', 'profiling.py')
+    if not os.path.exists(path):
+        print(f"ERROR: --profile needs {os.path.normpath(path)} (run from the repository checkout).")
+        sys.exit(1)
+    spec = importlib.util.spec_from_file_location('waf_profiling', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_dataset_weights(pool, catalog):
+    """Median recent duration per table from _dataset_log ({} if there is no history yet)."""
+    try:
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                rows = fetch_rows(cursor, reload_log.weights_statement(catalog))
+        return {r['table_name']: float(r['median_seconds']) for r in rows
+                if r.get('median_seconds') is not None}
+    except Exception:
+        return {}
+
+
+def write_dataset_log(pool, catalog, run_id, active, results):
+    """Append one _dataset_log row per dataset; failures only print a warning."""
+    entries = []
+    for i, ds in enumerate(active):
+        status, (elapsed, msg, info) = results[i]
+        entries.append(reload_log.entry(
+            run_id, ds, status,
+            duration_seconds=elapsed if status != SKIPPED else None,
+            error=msg if status != SUCCESS else None,
+            **{k: info.get(k) for k in ('started_at', 'finished_at', 'rows_written',
+                                         'bytes_written', 'statement_id')}
+        ))
+    try:
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(reload_log.ensure_statement(catalog))
+                for statement in reload_log.insert_statements(catalog, entries):
+                    cursor.execute(statement)
+    except Exception as exc:
+        print(f"  ⚠ could not write _dataset_log: {exc}")
+
+
+def print_report(cursor, catalog, run_id=None, top=20):
+    """Print the slowest datasets of a run and their regressions vs the trailing median."""
+    rows = fetch_rows(cursor, reload_log.report_statement(catalog, run_id))
+    print(reload_log.format_report(rows, top))
+
+
+# ---------------------------------------------------------------------------
+# Backend
+# ---------------------------------------------------------------------------
+
+def open_backend(args, host, token, catalog):
+    """
+    (connect, connect_kwargs) for the selected backend: databricks-sql-connector
+    on a discovered SQL warehouse, or DuckDB over Parquet snapshots (reload_local.py).
+    """
+    if args.backend == 'local':
+        try:
+            import reload_local
+        except ImportError as exc:
+            print(f"ERROR: {exc}")
+            sys.exit(1)
+        tables = reload_local.snapshot_tables(args.snapshot_dir)
+        if not tables:
+            print(f"ERROR: no system/<schema>/<table> Parquet snapshots under {args.snapshot_dir}")
+            sys.exit(1)
+        print(f"  {len(tables)} system table snapshot(s) in {args.snapshot_dir}")
+        return reload_local.connect, dict(snapshot_dir=args.snapshot_dir, catalog=catalog,
+                                          database=args.local_db)
+
+    print("Discovering SQL warehouse...")
+    warehouse_id = get_warehouse_id(host, token)
+    return dbsql.connect, dict(
+        server_hostname=host.replace('https://', '').replace('http://', ''),
+        http_path=f"/sql/1.0/warehouses/{warehouse_id}",
+        access_token=token,
     )
 
 
@@ -274,6 +954,47 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--yaml', help='Path to dashboard_queries.yaml')
     parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('WAF_RELOAD_WORKERS', '8')),
+                        help='Max datasets executing at once (default 8)')
+    parser.add_argument('--timeout', type=float,
+                        default=float(os.environ.get('WAF_RELOAD_TIMEOUT', '900')),
+                        help='Per-dataset timeout in seconds, 0 to disable (default 900)')
+    parser.add_argument('--no-staging', action='store_true',
+                        default=os.environ.get('WAF_RELOAD_STAGING', 'true').lower() == 'false',
+                        help='Skip the shared-scan staging phase; datasets read system tables directly')
+    parser.add_argument('--no-fingerprint', action='store_true',
+                        default=os.environ.get('WAF_RELOAD_FINGERPRINT', 'true').lower() == 'false',
+                        help='Always append every dataset, even when its result is unchanged')
+    parser.add_argument('--keep-runs', type=int,
+                        default=int(os.environ.get('WAF_KEEP_RUNS', '30')),
+                        help='Newest runs kept in _hist tables, 0 keeps everything (default 30)')
+    parser.add_argument('--keep-daily-days', type=int,
+                        default=int(os.environ.get('WAF_KEEP_DAILY_DAYS', '90')),
+                        help='Beyond --keep-runs, keep the last run of each day for this many days (default 90)')
+    parser.add_argument('--maintenance-every', type=int,
+                        default=int(os.environ.get('WAF_MAINTENANCE_EVERY', '1')),
+                        help='Run retention/OPTIMIZE/VACUUM every N runs, 0 to disable (default 1)')
+    parser.add_argument('--report', action='store_true',
+                        help='Print the slowest datasets and regressions from _dataset_log, then exit')
+    parser.add_argument('--report-run', type=int, help='Run to report on (default: latest logged run)')
+    parser.add_argument('--top', type=int, default=20, help='Datasets listed by --report (default 20)')
+    parser.add_argument('--resume', type=int, metavar='RUN_ID',
+                        help='Re-run only the datasets that did not succeed in RUN_ID, into the same run')
+    parser.add_argument('--only-failed', action='store_true',
+                        help='Same as --resume with the most recent run')
+    parser.add_argument('--backend', choices=['databricks', 'local'],
+                        default=os.environ.get('WAF_RELOAD_BACKEND', 'databricks'),
+                        help='databricks (SQL warehouse, default) or local (DuckDB over Parquet snapshots)')
+    parser.add_argument('--snapshot-dir', default=os.environ.get('WAF_SNAPSHOT_DIR'),
+                        help='system/<schema>/<table> Parquet snapshots for --backend local')
+    parser.add_argument('--local-db', default=os.environ.get('WAF_LOCAL_DB'),
+                        help='DuckDB file holding waf_cache for --backend local '
+                             '(default <snapshot dir>/<catalog>.duckdb, :memory: for a throwaway run)')
+    parser.add_argument('--profile', nargs='?', metavar='DIR',
+                        const=os.environ.get('WAF_PROFILE_DIR', 'waf_profiles'),
+                        help='Sample the run and store a collapsed-stack profile with per-dataset '
+                             'timings in DIR (default WAF_PROFILE_DIR or waf_profiles)')
     args = parser.parse_args()
 
     # Credentials from Databricks Apps environment only
@@ -281,7 +1002,17 @@ def main():
     token = os.environ.get('DATABRICKS_TOKEN', '')
     catalog = os.environ.get('WAF_CATALOG', 'main')
 
-    if not host or not token:
+    if args.backend == 'local':
+        if not args.snapshot_dir:
+            print("ERROR: --backend local needs --snapshot-dir (or WAF_SNAPSHOT_DIR).")
+            sys.exit(1)
+    elif requests is None:
+        print("ERROR: requests not installed.")
+        sys.exit(1)
+    elif dbsql is None:
+        print("ERROR: databricks-sql-connector not installed.")
+        sys.exit(1)
+    elif not host or not token:
         missing = []
         if not host:
             missing.append('DATABRICKS_HOST')
@@ -292,42 +1023,78 @@ def main():
         print("If running locally, set them manually before calling this script.")
         sys.exit(1)
 
-    print(f"Workspace: {host}")
+    print(f"Workspace: {host}" if args.backend == 'databricks'
+          else f"Backend:   local (DuckDB over {args.snapshot_dir})")
     print(f"Catalog:   {catalog}")
 
+    if args.report:
+        connect, connect_kwargs = open_backend(args, host, token, catalog)
+        conn = connect(**connect_kwargs)
+        try:
+            with conn.cursor() as cursor:
+                print()
+                print_report(cursor, catalog, args.report_run, args.top)
+        finally:
+            conn.close()
+        return
+
     yaml_path = find_yaml(args.yaml)
     print(f"YAML:      {yaml_path}")
     with open(yaml_path, encoding='utf-8') as f:
         data = yaml.safe_load(f)
 
     datasets = data['datasets']
-    active = [d for d in datasets if not d.get('is_coming_soon')]
-    print(f"\nDatasets: {len(datasets)} total, {len(active)} active, "
-          f"{len(datasets) - len(active)} coming-soon (skipped)\n")
+    plan = compile_registry(data)
+    active = plan['datasets']
+    print(f"\nDatasets: {len(datasets)} total, {len(active)} to run, "
+          f"{len(plan['skipped'])} coming-soon/retired (skipped), "
+          f"{len(datasets) - len(active) - len(plan['skipped'])} merged as duplicates\n")
+    if plan['warnings']:
+        print(f"  ⚠ {len(plan['warnings'])} registry warning(s); run reload_registry.py for details\n")
+    if plan['errors']:
+        print(f"ERROR: {len(plan['errors'])} problem(s) in {yaml_path}:")
+        for error in plan['errors']:
+            print(f"  ✗ {error}")
+        sys.exit(1)
 
     if args.dry_run:
         for ds in active:
-            print(f"-- {ds['display_name']} → {catalog}.waf_cache.{ds['table_name']}_hist")
-            print(substitute_date_params(ds['sql'])[:200])
+            target = ds['table_name'] if ds.get('is_view') else f"{ds['table_name']}_hist"
+            deps = f"  (after: {', '.join(ds['depends_on'])})" if ds.get('depends_on') else ""
+            print(f"-- {ds['display_name']} → {catalog}.waf_cache.{target}{deps}")
+            print(substitute_catalog_param(substitute_date_params(ds['sql']), catalog)[:200])
             print()
+        print(f"Critical path: {' → '.join(critical_path(active))}")
+        prepared = [substitute_catalog_param(substitute_date_params(ds['sql']), catalog)
+                    for ds in active]
+        stages = plan_stages(prepared, catalog)
+        rewritten = sum(1 for sql in prepared if rewrite_sql(sql, catalog)[1])
+        print(f"Staging:       {', '.join(st['table_name'] for st in stages) or 'none'} "
+              f"({rewritten} dataset(s) rewritten)")
+        rollups = plan_rollups([ds['sql'] for ds in active])
+        print(f"Rollups:       {', '.join(r['table_name'] for r in rollups) or 'none'}")
         return
 
-    print("Discovering SQL warehouse...")
-    warehouse_id = get_warehouse_id(host, token)
-    hostname = host.replace('https://', '').replace('http://', '')
-    http_path = f"/sql/1.0/warehouses/{warehouse_id}"
+    connect, connect_kwargs = open_backend(args, host, token, catalog)
+
+    profiling_stack = ExitStack()
+    profile = None
+    if args.profile:
+        profile = profiling_stack.enter_context(load_profiling().profiled(
+            'reload', meta={'catalog': catalog, 'backend': args.backend, 'workers': args.workers},
+            all_threads=True, directory=args.profile))
 
     run_started_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    resuming = args.resume is not None or args.only_failed
+    already_succeeded = 0
     successes, failures = [], []
     run_id = None
     run_finished_at = run_started_at
     final_status = 'failed'
 
-    db_conn = dbsql.connect(
-        server_hostname=hostname,
-        http_path=http_path,
-        access_token=token,
-    )
+    db_conn = connect(**connect_kwargs)
+    workers = max(1, min(args.workers, len(active)))
+    pool = ConnectionPool(workers, connect, **connect_kwargs)
 
     try:
         with db_conn.cursor() as cursor:
@@ -335,57 +1102,91 @@ def main():
             cursor.execute(f"CREATE SCHEMA IF NOT EXISTS `{catalog}`.`waf_cache`")
 
             ensure_run_log(cursor, catalog)
+            ensure_latest_run(cursor, catalog)
+            cursor.execute(reload_fingerprint.ensure_statement(catalog))
+            cursor.execute(clustered_ensure_statement(catalog))
             migrate_old_plain_tables(cursor, catalog)
 
-            run_id = get_next_run_id(cursor, catalog)
-            print(f"\nRun #:   {run_id}")
-            print(f"Started: {run_started_at} UTC\n")
-
-            insert_run_started(cursor, catalog, run_id, run_started_at)
-
-            # --- Append data into _hist tables ---
-            for i, ds in enumerate(active, 1):
-                name = ds['display_name']
-                table = ds['table_name']
-                t0 = time.time()
-                print(f"[{i:2d}/{len(active)}] {name} → {catalog}.waf_cache.{table}_hist")
+            if resuming:
                 try:
-                    prepared_sql = strip_trailing_semicolon(substitute_date_params(ds['sql']))
-                    append_to_hist_table(cursor, catalog, table, prepared_sql,
-                                         run_id, run_started_at)
-                    elapsed = time.time() - t0
-                    print(f"       ✓ {elapsed:.1f}s")
-                    successes.append(table)
+                    run_id, run_started_at, prior_status = find_resume_run(cursor, catalog, args.resume)
+                    state = fetch_rows(cursor, reload_log.run_state_statement(catalog, run_id))
                 except Exception as exc:
-                    elapsed = time.time() - t0
-                    print(f"       ✗ FAILED ({elapsed:.1f}s): {exc}")
-                    failures.append((name, str(exc)))
+                    print(f"ERROR: cannot resume: {exc}")
+                    sys.exit(1)
+                if not state:
+                    print(f"ERROR: run #{run_id} has no _dataset_log entries; run a full reload instead.")
+                    sys.exit(1)
+                retry, already_succeeded = reload_log.plan_resume(active, state)
+                print(f"\nResuming run #{run_id} (status={prior_status}, started {run_started_at} UTC): "
+                      f"{already_succeeded} dataset(s) already succeeded, {len(retry)} to re-run\n")
+                if not retry:
+                    print("Nothing to re-run.")
+                    return
+                clear_run_rows(cursor, catalog, active, retry, run_id)
+                active = retry
+            else:
+                run_id = get_next_run_id(cursor, catalog)
+                print(f"\nRun #:   {run_id}")
+                print(f"Started: {run_started_at} UTC\n")
+
+                insert_run_started(cursor, catalog, run_id, run_started_at)
+
+            # --- Incremental daily rollups of billing / compute usage ---
+            run_rollups(pool, catalog, active, workers, args.timeout)
+
+            # --- Shared-scan staging of common system-table inputs ---
+            if not args.no_staging:
+                active = run_staging(pool, catalog, active, workers, args.timeout)
+
+            # --- Append data into _hist tables ---
+            print(f"Running {len(active)} datasets ({workers} in parallel, "
+                  f"timeout {args.timeout:.0f}s each)...\n")
+            successes, failures = run_datasets_parallel(
+                pool, catalog, active, run_id, run_started_at, workers, args.timeout,
+                fingerprint=not args.no_fingerprint, profile=profile,
+            )
 
             run_finished_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            final_status = 'success' if not failures else 'partial' if successes else 'failed'
+            succeeded = already_succeeded + len(successes)
+            final_status = 'success' if not failures else 'partial' if succeeded else 'failed'
             update_run_finished(cursor, catalog, run_id, run_finished_at,
-                                final_status, len(successes), len(failures))
-
-            # --- Refresh views for succeeded tables ---
-            if successes:
-                print(f"\nRefreshing views for {len(successes)} table(s)...")
-                for table in successes:
-                    try:
-                        create_latest_view(cursor, catalog, table)
-                    except Exception as exc:
-                        print(f"  ⚠ Could not create view for {table}: {exc}")
+                                final_status, succeeded, len(failures))
+            if final_status != 'failed':
+                # A resumed run never takes the pointer back from a newer run
+                pointer = fetch_rows(cursor, f"SELECT run_id FROM `{catalog}`.`waf_cache`.`_latest_run`")
+                if not resuming or not pointer or (pointer[0]['run_id'] or 0) <= run_id:
+                    set_latest_run(cursor, catalog, run_id, run_finished_at)
 
             print(f"\nRun log updated: status={final_status}")
+            try:
+                print()
+                print_report(cursor, catalog, run_id, top=5)
+            except Exception as exc:
+                print(f"  ⚠ could not build the duration report: {exc}")
+
+            # --- History retention + OPTIMIZE / VACUUM ---
+            if not resuming and args.maintenance_every > 0 and run_id % args.maintenance_every == 0:
+                try:
+                    run_maintenance(pool, catalog, run_id, workers, args.timeout,
+                                    args.keep_runs, args.keep_daily_days)
+                except Exception as exc:
+                    print(f"  ⚠ maintenance skipped: {exc}")
 
     finally:
+        pool.close()
         db_conn.close()
+        if profile is not None:
+            profile.meta.update(run_id=run_id, status=final_status)
+            profiling_stack.close()
+            print(f"\nProfile: {os.path.join(args.profile, profile.id)}.collapsed (+ .json)")
 
     run_info = {
         "run_id": run_id,
         "triggered_at": run_started_at,
         "finished_at": run_finished_at,
         "status": final_status,
-        "tables_succeeded": len(successes),
+        "tables_succeeded": already_succeeded + len(successes),
         "tables_failed": len(failures),
         "catalog": catalog,
     }
@@ -396,7 +1197,8 @@ def main():
         print(f"Warning: could not write run_info.json: {e}")
 
     print(f"\n{'='*60}")
-    print(f"DONE: {len(successes)} succeeded, {len(failures)} failed  |  Run #{run_id}")
+    print(f"DONE: {already_succeeded + len(successes)} succeeded, {len(failures)} failed  |  Run #{run_id}"
+          + (f" (resumed: {len(successes)} re-run succeeded)" if resuming else ""))
     if failures:
         print("\nFailed datasets:")
         for name, err in failures:
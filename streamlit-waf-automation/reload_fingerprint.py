@@ -0,0 +1,123 @@
+"""
+Result fingerprints for WAF reload runs.
+
+Many datasets (volume and function counts, catalog metadata) return the same
+rows run after run, yet each run appended a full copy to their _hist table.
+Each successful dataset now gets a content hash of its result, recorded in
+{catalog}.waf_cache._fingerprints as (table_name, run_id, data_run_id,
+fingerprint). When a result is unchanged from the table's previous run, no
+rows are kept for the new run; data_run_id points at the run whose rows hold
+the data, and the latest-run views resolve it:
+
+    WHERE _run_id = <data_run_id of (table, _latest_run)>, else _latest_run
+
+A run with no _fingerprints row for a table reads its own rows, so tables
+written before fingerprinting (or when recording failed) are unaffected.
+
+Fingerprinting adapts per table, so results are never computed twice in the
+common case:
+
+  * Last run was a reference (stable table): hash the query result first and
+    skip the write when it matches. Only a change costs a second execution.
+  * Otherwise: append as usual, then hash this run's rows in _hist. If they
+    match the previous run, record a reference and delete them again.
+
+The hash is order-independent (row count, XOR and sum of per-row xxhash64 of
+the row as JSON), so it covers column names and values but not row order.
+Tables written by more than one dataset are never fingerprinted.
+
+Shared by reload_data.py (SQL connector), the waf_reload notebook (Spark) and
+reload_maintenance.py, whose retention keeps every run still referenced.
+"""
+TABLE_NAME = '_fingerprints'
+
+
+def _table(catalog):
+    return f"`{catalog}`.`waf_cache`.`{TABLE_NAME}`"
+
+
+def ensure_statement(catalog):
+    """CREATE TABLE IF NOT EXISTS for _fingerprints."""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {_table(catalog)} ("
+        f"  table_name STRING,"
+        f"  run_id INT,"
+        f"  data_run_id INT,"
+        f"  fingerprint STRING,"
+        f"  recorded_at TIMESTAMP"
+        f") USING DELTA"
+    )
+
+
+def fingerprint_sql(sql):
+    """Query returning a single `fingerprint` value for the rows of `sql`."""
+    return (
+        "SELECT concat_ws(':', CAST(COUNT(*) AS STRING), "
+        "CAST(COALESCE(bit_xor(_h), 0) AS STRING), "
+        "CAST(COALESCE(SUM(pmod(_h, 1000003)), 0) AS STRING)) AS fingerprint\n"
+        f"FROM (SELECT xxhash64(to_json(struct(*))) AS _h FROM (\n{sql}\n) AS _q) AS _f"
+    )
+
+
+def hist_fingerprint_sql(catalog, table, run_id):
+    """fingerprint_sql over the rows run_id appended to {table}_hist."""
+    return fingerprint_sql(
+        f"SELECT * EXCEPT (_run_id, _run_started_at) "
+        f"FROM `{catalog}`.`waf_cache`.`{table}_hist` WHERE _run_id = {int(run_id)}"
+    )
+
+
+def previous_statement(catalog, run_id):
+    """Query returning each table's newest _fingerprints row before run_id."""
+    return (
+        f"SELECT table_name, run_id, data_run_id, fingerprint FROM {_table(catalog)} "
+        f"WHERE run_id < {int(run_id)} "
+        f"QUALIFY ROW_NUMBER() OVER (PARTITION BY table_name ORDER BY run_id DESC) = 1"
+    )
+
+
+def fingerprinted_tables(datasets):
+    """Table names eligible for fingerprinting: non-view tables with a single writer."""
+    writers = {}
+    for ds in datasets:
+        writers[ds['table_name']] = writers.get(ds['table_name'], 0) + 1
+    return {ds['table_name'] for ds in datasets
+            if not ds.get('is_view') and writers[ds['table_name']] == 1}
+
+
+def probe_first(previous):
+    """True when the table's previous run reused older rows, so hashing first is likely to pay off."""
+    return bool(previous) and previous['data_run_id'] != previous['run_id']
+
+
+def record_statement(catalog, table, run_id, data_run_id, fingerprint):
+    """INSERT recording which run holds `table`'s rows for run_id."""
+    fp = 'NULL' if fingerprint is None else "'" + str(fingerprint).replace("'", "") + "'"
+    return (
+        f"INSERT INTO {_table(catalog)} VALUES "
+        f"('{table}', {int(run_id)}, {int(data_run_id)}, {fp}, current_timestamp())"
+    )
+
+
+def delete_run_rows_statement(catalog, table, run_id):
+    """DELETE of run_id's rows from {table}_hist (after they were found unchanged)."""
+    return f"DELETE FROM `{catalog}`.`waf_cache`.`{table}_hist` WHERE _run_id = {int(run_id)}"
+
+
+def data_run_subquery(catalog, table):
+    """Scalar subquery: the run whose {table}_hist rows the latest run serves."""
+    return (
+        f"(SELECT COALESCE(MAX(f.data_run_id), MAX(l.run_id)) "
+        f"FROM `{catalog}`.`waf_cache`.`_latest_run` l "
+        f"LEFT JOIN {_table(catalog)} f ON f.run_id = l.run_id AND f.table_name = '{table}')"
+    )
+
+
+def referenced_runs_subquery(catalog, table, cutoff, keep_older):
+    """Subquery of older runs of {table}_hist still referenced by runs that survive retention."""
+    keep = f" OR run_id IN ({', '.join(str(r) for r in sorted(keep_older))})" if keep_older else ""
+    return (
+        f"(SELECT data_run_id FROM {_table(catalog)} "
+        f"WHERE table_name = '{table}' AND data_run_id <> run_id "
+        f"AND (run_id >= {int(cutoff)}{keep}))"
+    )
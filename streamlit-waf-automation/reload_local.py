@@ -0,0 +1,442 @@
+"""
+Offline execution backend: DuckDB over Parquet snapshots of system tables.
+
+Runs the WAF SQL on a laptop or in CI, with no workspace and no warehouse,
+against a directory of Parquet snapshots:
+
+    <snapshot_dir>/system/billing/usage.parquet
+    <snapshot_dir>/system/compute/clusters/*.parquet
+    <snapshot_dir>/system/information_schema/tables.parquet
+    ...
+
+Each file (or directory of files) is served under its original name
+(system.billing.usage), and the waf_cache tables a reload writes live in a
+DuckDB database file, <snapshot_dir>/<catalog>.duckdb by default.
+
+Statements are written for Databricks, so each one goes through a dialect
+shim before DuckDB sees it:
+
+  * sqlglot transpiles Databricks SQL to DuckDB; a few Databricks functions
+    DuckDB lacks (xxhash64, pmod) are registered as macros.
+  * Catalogs are mapped onto DuckDB names (`system` and `main` are reserved
+    there), and {catalog}.information_schema onto DuckDB's own.
+  * Delta-only statements: OPTIMIZE, VACUUM and ALTER TABLE ... CLUSTER BY
+    are no-ops; DESCRIBE DETAIL and DESCRIBE HISTORY are answered from what
+    this process wrote; INSERT OVERWRITE and INSERT ... REPLACE WHERE become
+    a DELETE followed by an INSERT.
+
+connect() returns a DB-API style connection shaped like
+databricks-sql-connector's (cursor(), execute(), description, fetchall(),
+query_id, cancel()), so reload_data.py runs unchanged on top of it. Used by
+reload_data.py (--backend local), the waf_reload notebook (backend widget)
+and waf_core.backends.DuckDBBackend. WAF_LOCAL_LATENCY adds a fixed delay
+(seconds) to every statement, so benchmarks can model warehouse round-trips.
+
+Needs duckdb and sqlglot (pip install duckdb sqlglot).
+"""
+import glob
+import os
+import re
+import threading
+import time
+import uuid
+
+try:
+    import duckdb
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import ErrorLevel
+except ImportError as _exc:
+    raise ImportError("The local backend needs duckdb and sqlglot (pip install duckdb sqlglot)") from _exc
+
+SNAPSHOT_CATALOG = 'system_snapshot'
+
+# Seconds added to every statement, to mimic warehouse round-trips in benchmarks (waf_bench)
+STATEMENT_LATENCY = float(os.environ.get('WAF_LOCAL_LATENCY', '0') or 0)
+
+# Names DuckDB reserves for its own catalogs / schemas
+_RESERVED_CATALOGS = {'system', 'temp', 'main', 'memory'}
+_RESERVED_SCHEMAS = {'information_schema', 'pg_catalog', 'main'}
+
+_MACROS = (
+    "CREATE OR REPLACE MACRO xxhash64(x) AS CAST(hash(x) >> 1 AS BIGINT)",
+    "CREATE OR REPLACE MACRO pmod(a, b) AS ((a % b) + b) % b",
+)
+
+_NOOP_RE = re.compile(r'^\s*(OPTIMIZE|VACUUM|ANALYZE)\b|^\s*ALTER\s+TABLE\s+.+\s+CLUSTER\s+BY\b',
+                      re.IGNORECASE | re.DOTALL)
+_DESCRIBE_RE = re.compile(r'^\s*DESCRIBE\s+(DETAIL|HISTORY)\s+(\S+)', re.IGNORECASE)
+_QUERY_RE = re.compile(r'^\s*(\(\s*)*(SELECT|WITH|VALUES|FROM|DESCRIBE|SHOW|PRAGMA)\b', re.IGNORECASE)
+
+_DATABASES = {}
+_DATABASES_LOCK = threading.Lock()
+
+
+class LocalSQLError(Exception):
+    """A statement failed on the local backend (message tagged like Databricks errors where it matters)."""
+
+
+def local_catalog(name):
+    """DuckDB catalog name for a Databricks catalog."""
+    name = name.lower()
+    if name == 'system':
+        return SNAPSHOT_CATALOG
+    return f"{name}_catalog" if name in _RESERVED_CATALOGS else name
+
+
+def _local_schema(name):
+    return f"{name}_snapshot" if name.lower() in _RESERVED_SCHEMAS else name
+
+
+def snapshot_tables(snapshot_dir):
+    """{'system.<schema>.<table>': parquet path or glob} for every snapshot under snapshot_dir."""
+    root = os.path.join(snapshot_dir, 'system')
+    tables = {}
+    if not os.path.isdir(root):
+        return tables
+    for schema in sorted(os.listdir(root)):
+        schema_dir = os.path.join(root, schema)
+        if not os.path.isdir(schema_dir):
+            continue
+        for entry in sorted(os.listdir(schema_dir)):
+            path = os.path.join(schema_dir, entry)
+            if entry.endswith('.parquet') and os.path.isfile(path):
+                tables[f"system.{schema}.{entry[:-len('.parquet')]}"] = path
+            elif os.path.isdir(path) and glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True):
+                tables[f"system.{schema}.{entry}"] = os.path.join(path, '**', '*.parquet')
+    return tables
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(text):
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+# ---------------------------------------------------------------------------
+# Dialect shim
+# ---------------------------------------------------------------------------
+
+def _map_tables(tree):
+    """Point catalog-qualified table names at their DuckDB catalogs."""
+    for table in list(tree.find_all(exp.Table)):
+        catalog, schema = table.catalog, table.db
+        if not catalog or not schema:
+            continue
+        if schema.lower() == 'information_schema' and catalog.lower() != 'system':
+            # DuckDB's information_schema spans every attached catalog
+            table.set('catalog', None)
+            table.set('db', exp.to_identifier('information_schema'))
+            for literal in tree.find_all(exp.Literal):
+                if literal.is_string and literal.this == 'MANAGED':
+                    literal.replace(exp.Literal.string('BASE TABLE'))
+            continue
+        table.set('catalog', exp.to_identifier(local_catalog(catalog), quoted=True))
+        if catalog.lower() == 'system':
+            table.set('db', exp.to_identifier(_local_schema(schema), quoted=True))
+    return tree
+
+
+def _struct_star(tree):
+    """struct(*) over a single aliased source becomes that source's row (DuckDB cannot pack *)."""
+    for struct in list(tree.find_all(exp.Struct)):
+        if len(struct.expressions) != 1 or not isinstance(struct.expressions[0], exp.Star):
+            continue
+        select = struct.find_ancestor(exp.Select)
+        source = select.args.get('from_') or select.args.get('from') if select else None
+        alias = source.this.alias_or_name if source is not None else None
+        if alias:
+            struct.replace(exp.column(alias))
+    return tree
+
+
+def _naive_timestamps(tree):
+    """Databricks TIMESTAMP values are UTC; keep them as plain DuckDB TIMESTAMPs."""
+    for data_type in list(tree.find_all(exp.DataType)):
+        if data_type.this == exp.DataType.Type.TIMESTAMPTZ:
+            data_type.replace(exp.DataType.build('TIMESTAMP'))
+    for now in list(tree.find_all(exp.CurrentTimestamp)):
+        now.replace(exp.cast(now.copy(), 'TIMESTAMP'))
+    return tree
+
+
+def translate(sql):
+    """DuckDB statements (in order) for one Databricks SQL statement."""
+    tree = sqlglot.parse_one(sql.strip().rstrip(';'), read='databricks')
+    tree = _naive_timestamps(_struct_star(_map_tables(tree)))
+    statements = []
+    if isinstance(tree, exp.Insert) and (tree.args.get('overwrite') or tree.args.get('where') is not None):
+        where = tree.args.get('where')
+        target = tree.this.this if isinstance(tree.this, exp.Schema) else tree.this
+        delete = exp.Delete(this=target.copy())
+        if where is not None:
+            delete.set('where', exp.Where(this=where.copy()))
+        statements.append(delete)
+        tree.set('overwrite', False)
+        tree.set('where', None)
+    statements.append(tree)
+    return [s.sql(dialect='duckdb', unsupported_level=ErrorLevel.IGNORE) for s in statements]
+
+
+def _written_table(sql):
+    """DuckDB catalog.schema.table a CREATE ... AS / INSERT statement writes, else None."""
+    try:
+        tree = sqlglot.parse_one(sql, read='duckdb')
+    except Exception:
+        return None
+    if isinstance(tree, (exp.Insert, exp.Create)) and tree.this is not None:
+        target = tree.this.this if isinstance(tree.this, exp.Schema) else tree.this
+        if isinstance(target, exp.Table):
+            return '.'.join(p for p in (target.catalog, target.db, target.name) if p).lower()
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Database / connection / cursor
+# ---------------------------------------------------------------------------
+
+class LocalDatabase:
+    """One DuckDB instance: the snapshot catalog, the waf_cache catalog and write history."""
+
+    def __init__(self, snapshot_dir, catalog='main', database=None, read_only=False):
+        self.snapshot_dir = os.path.abspath(snapshot_dir)
+        self.catalog = catalog
+        self.database = database or os.path.join(self.snapshot_dir, f"{catalog}.duckdb")
+        self.tables = snapshot_tables(self.snapshot_dir)
+        self.history = {}  # catalog.schema.table -> (operation, rows) of the last write
+        self._root = duckdb.connect(':memory:')
+        self._lock = threading.Lock()
+        self._root.execute("SET TimeZone = 'UTC'")
+        for statement in _MACROS:
+            self._root.execute(statement)
+        self._root.execute(f"ATTACH ':memory:' AS {_quote(SNAPSHOT_CATALOG)}")
+        for name, path in self.tables.items():
+            _, schema, table = name.split('.')
+            target = f"{_quote(SNAPSHOT_CATALOG)}.{_quote(_local_schema(schema))}"
+            self._root.execute(f"CREATE SCHEMA IF NOT EXISTS {target}")
+            self._root.execute(
+                f"CREATE OR REPLACE VIEW {target}.{_quote(table)} AS "
+                f"SELECT * FROM read_parquet({_literal(path)}, union_by_name = true, hive_partitioning = true)"
+            )
+        mode = ' (READ_ONLY)' if read_only else ''
+        self._root.execute(f"ATTACH {_literal(self.database)} AS {_quote(local_catalog(catalog))}{mode}")
+
+    def connection(self):
+        """A new connection (its own DuckDB cursor) on this database."""
+        with self._lock:
+            return LocalConnection(self, self._root.cursor())
+
+    def close(self):
+        self._root.close()
+
+
+class LocalConnection:
+    """Connection shaped like databricks.sql's: cursor(), close(), is_closed."""
+
+    def __init__(self, database, duck):
+        self.database = database
+        self._duck = duck
+        self.is_closed = False
+
+    def cursor(self):
+        return LocalCursor(self.database, self._duck)
+
+    def close(self):
+        if not self.is_closed:
+            self._duck.close()
+            self.is_closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class LocalCursor:
+    """Cursor shaped like databricks.sql's: execute(), description, fetch*(), query_id, cancel()."""
+
+    def __init__(self, database, duck):
+        self._db = database
+        self._duck = duck
+        self.description = None
+        self.query_id = None
+        self.rowcount = -1
+        self._rows = []
+
+    def execute(self, operation, parameters=None):
+        if parameters:
+            for key, value in parameters.items():
+                operation = operation.replace(f":{key}", str(value))
+        self.query_id = uuid.uuid4().hex
+        self.description, self._rows, self.rowcount = None, [], -1
+        if STATEMENT_LATENCY > 0:
+            time.sleep(STATEMENT_LATENCY)
+
+        if _NOOP_RE.search(operation):
+            return self
+        match = _DESCRIBE_RE.search(operation)
+        if match:
+            self._describe(match.group(1).upper(), match.group(2).rstrip(';'))
+            return self
+
+        try:
+            statements = translate(operation)
+            for statement in statements:
+                self._duck.execute(statement)
+            is_query = bool(_QUERY_RE.search(statements[-1]))
+            rows = self._duck.fetchall() if self._duck.description else []
+        except duckdb.CatalogException as exc:
+            tag = '[TABLE_OR_VIEW_NOT_FOUND] ' if 'does not exist' in str(exc) else ''
+            raise LocalSQLError(f"{tag}{exc}") from exc
+        except duckdb.InterruptException as exc:
+            raise LocalSQLError(f"Query cancelled: {exc}") from exc
+        except (duckdb.Error, sqlglot.errors.SqlglotError) as exc:
+            raise LocalSQLError(str(exc)) from exc
+
+        if is_query:
+            self.description = self._duck.description
+            self._rows = rows
+            self.rowcount = len(rows)
+        else:
+            written = _written_table(statements[-1])
+            count = rows[0][0] if rows and rows[0] else None
+            if written:
+                self._db.history[written] = ('WRITE', count)
+            self.rowcount = count if count is not None else -1
+        return self
+
+    def _describe(self, kind, name):
+        """DESCRIBE DETAIL / HISTORY from DuckDB's catalog and this process's writes."""
+        parts = [p.strip('`"') for p in name.split('.')]
+        key = '.'.join([local_catalog(parts[0])] + parts[1:]).lower() if len(parts) == 3 else name.lower()
+        if kind == 'HISTORY':
+            self.description = [('version',), ('operation',), ('operationMetrics',)]
+            last = self._db.history.get(key)
+            self._rows = [(0, last[0], {'numOutputRows': str(last[1])})] if last and last[1] is not None else []
+            return
+        catalog, schema, table = key.split('.') if len(parts) == 3 else (None, None, key)
+        size = self._duck.execute(
+            "SELECT estimated_size FROM duckdb_tables() "
+            "WHERE database_name = ? AND schema_name = ? AND table_name = ?",
+            [catalog, schema, table],
+        ).fetchone()
+        if size is None:
+            raise LocalSQLError(f"[TABLE_OR_VIEW_NOT_FOUND] {name}")
+        self.description = [('format',), ('numFiles',), ('sizeInBytes',), ('clusteringColumns',)]
+        self._rows = [('duckdb', 1, int(size[0] or 0), ['_run_id'])]
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def cancel(self):
+        try:
+            self._duck.interrupt()
+        except Exception:
+            pass
+
+    def close(self):
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_database(snapshot_dir, catalog='main', database=None, read_only=False):
+    """The shared LocalDatabase for (snapshot_dir, database), opened on first use."""
+    key = (os.path.abspath(snapshot_dir), database, catalog)
+    with _DATABASES_LOCK:
+        if key not in _DATABASES:
+            _DATABASES[key] = LocalDatabase(snapshot_dir, catalog, database, read_only)
+        return _DATABASES[key]
+
+
+def connect(snapshot_dir, catalog='main', database=None, read_only=False, **_ignored):
+    """
+    Open a connection on the local backend (same signature shape as
+    databricks.sql.connect; server/credential keyword arguments are ignored).
+
+    Args:
+        snapshot_dir: Directory holding system/<schema>/<table> Parquet snapshots
+        catalog: Catalog the SQL writes waf_cache into (WAF_CATALOG)
+        database: DuckDB file for that catalog (default <snapshot_dir>/<catalog>.duckdb,
+            ':memory:' for a throwaway run)
+        read_only: Open the database file read-only (readers next to a running reload)
+    """
+    if not os.path.isdir(snapshot_dir):
+        raise FileNotFoundError(f"Snapshot directory not found: {snapshot_dir}")
+    return open_database(snapshot_dir, catalog, database, read_only).connection()
+
+
+def describe_snapshots(snapshot_dir):
+    """One line per snapshot table with its row count, for --backend local startup output."""
+    conn = connect(snapshot_dir, database=':memory:')
+    lines = []
+    with conn.cursor() as cursor:
+        for name in sorted(snapshot_tables(snapshot_dir)):
+            cursor.execute(f"SELECT COUNT(*) FROM {name}")
+            lines.append(f"{name}: {cursor.fetchone()[0]:,} rows")
+    return lines
+
+
+class LocalSpark:
+    """
+    The slice of the SparkSession API the waf_reload notebook uses
+    (spark.sql(...).collect(), rows by index/name/asDict()), on the local backend.
+    """
+
+    def __init__(self, snapshot_dir, catalog='main', database=None):
+        self._db = open_database(snapshot_dir, catalog, database)
+        self._local = threading.local()
+
+    def _cursor(self):
+        if not hasattr(self._local, 'conn'):
+            self._local.conn = self._db.connection()
+        return self._local.conn.cursor()
+
+    def sql(self, statement):
+        cursor = self._cursor().execute(statement)
+        columns = [d[0] for d in cursor.description or []]
+        return LocalResult(columns, cursor.fetchall())
+
+
+class LocalRow(tuple):
+    """Result row readable by index, by column name and with asDict()."""
+
+    def __new__(cls, columns, values):
+        row = super().__new__(cls, values)
+        row._columns = columns
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._columns.index(key))
+        return tuple.__getitem__(self, key)
+
+    def asDict(self):  # noqa: N802 - mirrors pyspark.sql.Row
+        return dict(zip(self._columns, self))
+
+
+class LocalResult:
+    """Result of LocalSpark.sql(): columns and collect()."""
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self._rows = [LocalRow(columns, r) for r in rows]
+
+    def collect(self):
+        return list(self._rows)
+
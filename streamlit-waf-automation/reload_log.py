@@ -0,0 +1,246 @@
+"""
+Per-dataset execution log for WAF reload runs.
+
+_run_log only records run-level counts. Both reload paths also write one
+row per dataset per run to {catalog}.waf_cache._dataset_log, with its
+timing, rows and bytes written, the warehouse statement id, and the error
+if it failed. That log feeds:
+
+  * the slowest-datasets / regression report (`reload_data.py --report`
+    and the app's Reload Performance page): each dataset's duration in a
+    run compared with the median of its previous successful runs;
+  * the scheduler: recent median durations become run_dag weights, so the
+    real critical path starts first;
+  * resume (`reload_data.py --resume RUN_ID` / `--only-failed`): datasets
+    without a successful entry in a run are re-run into that same run, and
+    their new entries are appended under the same run_id. A dataset's state
+    in a run is its successful entry if it has one, otherwise its latest.
+
+Shared by reload_data.py (SQL connector), the waf_reload notebook (Spark)
+and app.py.
+"""
+from reload_scheduler import dataset_dependencies
+
+TRAILING_RUNS = 10
+REGRESSION_RATIO = 1.5
+REGRESSION_MIN_SECONDS = 5.0
+
+_COLUMNS = [
+    ('run_id', 'INT'),
+    ('dataset_name', 'STRING'),
+    ('display_name', 'STRING'),
+    ('table_name', 'STRING'),
+    ('status', 'STRING'),
+    ('started_at', 'TIMESTAMP'),
+    ('finished_at', 'TIMESTAMP'),
+    ('duration_seconds', 'DOUBLE'),
+    ('rows_written', 'BIGINT'),
+    ('bytes_written', 'BIGINT'),
+    ('statement_id', 'STRING'),
+    ('error', 'STRING'),
+]
+
+
+def _log_table(catalog):
+    return f"`{catalog}`.`waf_cache`.`_dataset_log`"
+
+
+def ensure_statement(catalog):
+    """CREATE TABLE IF NOT EXISTS for _dataset_log."""
+    cols = ',\n'.join(f"  {name} {sql_type}" for name, sql_type in _COLUMNS)
+    return f"CREATE TABLE IF NOT EXISTS {_log_table(catalog)} (\n{cols}\n) USING DELTA"
+
+
+def _literal(value, sql_type):
+    if value is None:
+        return 'NULL'
+    if sql_type in ('INT', 'BIGINT'):
+        return str(int(value))
+    if sql_type == 'DOUBLE':
+        return f"{float(value):.3f}"
+    text = str(value)
+    if sql_type == 'STRING':
+        text = text[:2000]
+    text = text.replace('\\', '\\\\').replace("'", "\\'")
+    return f"TIMESTAMP('{text}')" if sql_type == 'TIMESTAMP' else f"'{text}'"
+
+
+def entry(run_id, ds, status, started_at=None, finished_at=None, duration_seconds=None,
+          rows_written=None, bytes_written=None, statement_id=None, error=None):
+    """One _dataset_log row for dataset `ds` (timestamps as 'YYYY-MM-DD HH:MM:SS' UTC)."""
+    return {
+        'run_id': run_id,
+        'dataset_name': ds.get('name'),
+        'display_name': ds.get('display_name'),
+        'table_name': ds['table_name'],
+        'status': status,
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'duration_seconds': duration_seconds,
+        'rows_written': rows_written,
+        'bytes_written': bytes_written,
+        'statement_id': statement_id,
+        'error': error,
+    }
+
+
+def insert_statements(catalog, entries, batch_size=200):
+    """INSERT statements appending `entries` (from entry()) to _dataset_log."""
+    statements = []
+    for start in range(0, len(entries), batch_size):
+        rows = [
+            '(' + ', '.join(_literal(e.get(name), sql_type) for name, sql_type in _COLUMNS) + ')'
+            for e in entries[start:start + batch_size]
+        ]
+        statements.append(f"INSERT INTO {_log_table(catalog)} VALUES\n" + ',\n'.join(rows))
+    return statements
+
+
+def write_metrics_statement(catalog, hist_table):
+    """DESCRIBE HISTORY of the latest commit to a _hist table (see write_metrics)."""
+    return f"DESCRIBE HISTORY `{catalog}`.`waf_cache`.`{hist_table}` LIMIT 1"
+
+
+def write_metrics(operation_metrics):
+    """(rows_written, bytes_written) from a commit's operationMetrics map."""
+    metrics = dict(operation_metrics or {})
+    rows = metrics.get('numOutputRows')
+    size = metrics.get('numOutputBytes')
+    return (int(rows) if rows is not None else None,
+            int(size) if size is not None else None)
+
+
+def _attempts(log, run_filter):
+    """Rows of the runs matching run_filter, one per dataset per run (see module docstring)."""
+    return (
+        f"SELECT * FROM {log} WHERE {run_filter} "
+        f"QUALIFY ROW_NUMBER() OVER (PARTITION BY run_id, dataset_name "
+        f"ORDER BY CASE WHEN status = 'success' THEN 0 ELSE 1 END, started_at DESC NULLS LAST) = 1"
+    )
+
+
+def weights_statement(catalog, runs=5):
+    """Query returning each table's median successful duration over the last `runs` runs."""
+    log = _log_table(catalog)
+    return (
+        f"SELECT table_name, percentile(duration_seconds, 0.5) AS median_seconds "
+        f"FROM {log} "
+        f"WHERE status = 'success' "
+        f"  AND run_id IN (SELECT DISTINCT run_id FROM {log} ORDER BY run_id DESC LIMIT {int(runs)}) "
+        f"GROUP BY table_name"
+    )
+
+
+def report_statement(catalog, run_id=None, trailing_runs=TRAILING_RUNS,
+                     ratio=REGRESSION_RATIO, min_seconds=REGRESSION_MIN_SECONDS):
+    """
+    Query ranking one run's datasets by duration against their trailing median.
+
+    Args:
+        catalog: Unity Catalog holding waf_cache
+        run_id: Run to report on (default: the newest run in _dataset_log)
+        trailing_runs: Earlier runs the median is taken over
+        ratio: Flag a dataset that took more than ratio x its median
+        min_seconds: ...and at least this many seconds longer than it
+
+    Columns: display_name, table_name, status, duration_seconds,
+    trailing_median_seconds, trailing_samples, slowdown, regressed,
+    rows_written, bytes_written, statement_id, error.
+    """
+    log = _log_table(catalog)
+    current = str(int(run_id)) if run_id is not None else f"(SELECT MAX(run_id) FROM {log})"
+    return f"""
+WITH cur AS (
+  {_attempts(log, f"run_id = {current}")}
+),
+prior_runs AS (
+  SELECT DISTINCT run_id FROM {log}
+  WHERE run_id < {current}
+  ORDER BY run_id DESC
+  LIMIT {int(trailing_runs)}
+),
+base AS (
+  SELECT l.dataset_name,
+         percentile(l.duration_seconds, 0.5) AS trailing_median_seconds,
+         COUNT(*) AS trailing_samples
+  FROM {log} l
+  JOIN prior_runs p ON l.run_id = p.run_id
+  WHERE l.status = 'success'
+  GROUP BY l.dataset_name
+)
+SELECT
+  c.display_name,
+  c.table_name,
+  c.status,
+  ROUND(c.duration_seconds, 1) AS duration_seconds,
+  ROUND(b.trailing_median_seconds, 1) AS trailing_median_seconds,
+  COALESCE(b.trailing_samples, 0) AS trailing_samples,
+  ROUND(try_divide(c.duration_seconds, b.trailing_median_seconds), 2) AS slowdown,
+  COALESCE(
+    c.status = 'success'
+    AND c.duration_seconds > {float(ratio)} * b.trailing_median_seconds
+    AND c.duration_seconds - b.trailing_median_seconds >= {float(min_seconds)},
+    false
+  ) AS regressed,
+  c.rows_written,
+  c.bytes_written,
+  c.statement_id,
+  c.error
+FROM cur c
+LEFT JOIN base b ON c.dataset_name = b.dataset_name
+ORDER BY c.duration_seconds DESC NULLS LAST
+""".strip()
+
+
+def run_state_statement(catalog, run_id):
+    """Query returning each dataset logged in run_id with its final status."""
+    return (
+        f"SELECT dataset_name, table_name, status "
+        f"FROM ({_attempts(_log_table(catalog), f'run_id = {int(run_id)}')})"
+    )
+
+
+def plan_resume(active, state_rows):
+    """
+    Datasets to re-run when resuming a run.
+
+    Args:
+        active: Active datasets from the YAML
+        state_rows: Rows (dicts) from run_state_statement
+
+    Returns:
+        (retry, succeeded): datasets logged in the run without a successful
+        entry, in YAML order, with `depends_on` trimmed to tables that are
+        re-run too (the others already hold this run's data); and the number
+        of datasets that already succeeded.
+    """
+    status = {r['dataset_name']: r['status'] for r in state_rows}
+    retry = [ds for ds in active if ds.get('name') in status and status[ds['name']] != 'success']
+    retry_tables = {ds['table_name'] for ds in retry}
+    retry = [dict(ds, depends_on=[t for t in dataset_dependencies(ds) if t in retry_tables])
+             for ds in retry]
+    succeeded = sum(1 for s in status.values() if s == 'success')
+    return retry, succeeded
+
+
+def format_report(rows, top=20):
+    """Plain-text report from report_statement rows (dicts)."""
+    if not rows:
+        return "No datasets logged yet — run a reload first."
+    regressed = [r for r in rows if r.get('regressed')]
+    failed = [r for r in rows if r.get('status') != 'success']
+    lines = [f"Slowest {min(top, len(rows))} of {len(rows)} dataset(s):"]
+    for r in rows[:top]:
+        median = r.get('trailing_median_seconds')
+        base = f"median {float(median):7.1f}s" if median is not None else "median      — "
+        flag = '  ▲ REGRESSED' if r.get('regressed') else ''
+        if r.get('status') != 'success':
+            flag = f"  ✗ {str(r.get('status')).upper()}"
+        lines.append(f"  {float(r.get('duration_seconds') or 0):7.1f}s  {base}  "
+                     f"{r.get('display_name') or r.get('table_name')}{flag}")
+    lines.append("")
+    lines.append(f"Regressions: {len(regressed)}" + (
+        "  (" + ', '.join(f"{r['table_name']} ×{float(r['slowdown']):.1f}" for r in regressed) + ")"
+        if regressed else ""))
+    lines.append(f"Failed/skipped: {len(failed)}")
+    return '\n'.join(lines)
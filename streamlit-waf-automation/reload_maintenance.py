@@ -0,0 +1,231 @@
+"""
+History retention and file maintenance for waf_cache.
+
+Every reload appends one small set of files to each of ~80 _hist tables
+and rewrites the _stage_* / _rollup_* tables, so without upkeep the
+history grows forever and reads get slower every run. After a run
+finishes, each managed table in waf_cache gets:
+
+  * _hist tables: retention, then OPTIMIZE (reclusters on _run_id), then
+    VACUUM. Retention keeps the newest `keep_runs` runs, plus the last
+    run of each day for `keep_daily_days` days (daily downsampling).
+    Older runs are deleted. The run the latest-run views point at is
+    never deleted, nor are rows a surviving run still reuses through
+    _fingerprints (reload_fingerprint.py).
+  * _fingerprints: the same retention on its run_id, then OPTIMIZE and VACUUM.
+  * _rollup_* and log tables (_run_log, _latest_run, _maintenance_log ...):
+    OPTIMIZE, then VACUUM.
+  * _stage_* tables (replaced each run): VACUUM only.
+
+_hist tables created before clustering on _run_id are reclustered once;
+_clustered remembers which tables are done, so later runs skip the check.
+
+VACUUM keeps the table's default retention, so readers of older snapshots
+are not broken. What was reclaimed (rows deleted, files and bytes before
+and after) is printed and appended to waf_cache._maintenance_log.
+
+Shared by reload_data.py (SQL connector) and the waf_reload notebook (Spark).
+"""
+from datetime import date, datetime, timedelta
+
+import reload_fingerprint
+
+CLUSTERED_TABLE = '_clustered'
+
+KEEP_RUNS = 30
+KEEP_DAILY_DAYS = 90
+
+RETAIN = 'retain'
+OPTIMIZE = 'optimize'
+VACUUM = 'vacuum'
+
+
+def _schema(catalog):
+    return f"`{catalog}`.`waf_cache`"
+
+
+def list_tables_statement(catalog):
+    """Query listing the managed tables in waf_cache."""
+    return (
+        f"SELECT table_name FROM `{catalog}`.information_schema.tables "
+        f"WHERE table_schema = 'waf_cache' AND table_type = 'MANAGED'"
+    )
+
+
+def table_actions(table_name):
+    """Maintenance steps for one waf_cache table, in order ([] = leave alone)."""
+    if table_name.endswith('_hist') or table_name == reload_fingerprint.TABLE_NAME:
+        return [RETAIN, OPTIMIZE, VACUUM]
+    if table_name.startswith('_stage_'):
+        return [VACUUM]
+    if table_name.startswith('_'):
+        return [OPTIMIZE, VACUUM]
+    return []
+
+
+def clustered_ensure_statement(catalog):
+    """CREATE TABLE IF NOT EXISTS for _clustered (one row per _hist table clustered by _run_id)."""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {_schema(catalog)}.`{CLUSTERED_TABLE}` ("
+        f"  table_name STRING,"
+        f"  clustered_at TIMESTAMP"
+        f") USING DELTA"
+    )
+
+
+def clustered_tables_statement(catalog):
+    """Query listing the tables already clustered by _run_id."""
+    return f"SELECT table_name FROM {_schema(catalog)}.`{CLUSTERED_TABLE}`"
+
+
+def clustered_record_statement(catalog, table):
+    """Remember that {table}_hist is clustered by _run_id."""
+    return (
+        f"INSERT INTO {_schema(catalog)}.`{CLUSTERED_TABLE}` "
+        f"VALUES ('{table}', current_timestamp())"
+    )
+
+
+def runs_statement(catalog):
+    """Query returning every logged run with its start time."""
+    return f"SELECT run_id, triggered_at FROM {_schema(catalog)}.`_run_log`"
+
+
+def plan_retention(runs, keep_runs=KEEP_RUNS, keep_daily_days=KEEP_DAILY_DAYS,
+                   pinned=None, today=None):
+    """
+    Decide which runs survive retention.
+
+    Args:
+        runs: (run_id, triggered_at) pairs from _run_log
+        keep_runs: Newest runs always kept (0 disables retention)
+        keep_daily_days: Days for which the last run of each day is also kept
+        pinned: run_id that must never be deleted (the _latest_run pointer)
+        today: Reference date (defaults to today, UTC)
+
+    Returns:
+        (cutoff, keep_older): rows with _run_id < cutoff are deleted unless
+        their run is in keep_older. cutoff is None when nothing is deleted.
+    """
+    if keep_runs <= 0:
+        return None, set()
+    ordered = sorted((r for r in runs if r[0] is not None), key=lambda r: r[0], reverse=True)
+    if len(ordered) <= keep_runs:
+        return None, set()
+
+    cutoff = ordered[keep_runs - 1][0]
+    today = today or datetime.utcnow().date()
+    oldest_day = today - timedelta(days=keep_daily_days)
+    last_of_day = {}
+    for run_id, triggered_at in ordered[keep_runs:]:
+        if triggered_at is None:
+            continue
+        day = triggered_at.date() if isinstance(triggered_at, datetime) else (
+            triggered_at if isinstance(triggered_at, date)
+            else datetime.strptime(str(triggered_at)[:10], '%Y-%m-%d').date())
+        if day >= oldest_day and run_id > last_of_day.get(day, -1):
+            last_of_day[day] = run_id
+    keep_older = set(last_of_day.values())
+    if pinned is not None and pinned < cutoff:
+        keep_older.add(pinned)
+    return cutoff, keep_older
+
+
+def retention_statement(catalog, table_name, cutoff, keep_older):
+    """DELETE that drops expired runs from one _hist table (or _fingerprints), or None."""
+    if cutoff is None:
+        return None
+    run_col = 'run_id' if table_name == reload_fingerprint.TABLE_NAME else '_run_id'
+    keep = f" AND {run_col} NOT IN ({', '.join(str(r) for r in sorted(keep_older))})" if keep_older else ""
+    if table_name.endswith('_hist'):
+        referenced = reload_fingerprint.referenced_runs_subquery(
+            catalog, table_name[:-len('_hist')], cutoff, keep_older)
+        keep += f" AND _run_id NOT IN {referenced}"
+    return f"DELETE FROM {_schema(catalog)}.`{table_name}` WHERE {run_col} < {cutoff}{keep}"
+
+
+def _detail(catalog, table_name, fetch_rows):
+    rows = fetch_rows(f"DESCRIBE DETAIL {_schema(catalog)}.`{table_name}`")
+    row = rows[0] if rows else {}
+    return int(row.get('numFiles') or 0), int(row.get('sizeInBytes') or 0)
+
+
+def maintain_table(catalog, table_name, fetch_rows, cutoff=None, keep_older=()):
+    """
+    Run the maintenance steps for one table.
+
+    Args:
+        catalog: Unity Catalog holding waf_cache
+        table_name: Table in waf_cache
+        fetch_rows: fetch_rows(sql) runs a statement and returns its rows as dicts
+        cutoff, keep_older: Retention plan from plan_retention
+
+    Returns:
+        Stats dict: table_name, rows_deleted, files_before, files_after,
+        bytes_before, bytes_after
+    """
+    schema = _schema(catalog)
+    actions = table_actions(table_name)
+    files_before, bytes_before = _detail(catalog, table_name, fetch_rows)
+    rows_deleted = 0
+
+    if RETAIN in actions:
+        statement = retention_statement(catalog, table_name, cutoff, keep_older)
+        if statement:
+            rows = fetch_rows(statement)
+            rows_deleted = int((rows[0].get('num_affected_rows') if rows else 0) or 0)
+    if OPTIMIZE in actions:
+        fetch_rows(f"OPTIMIZE {schema}.`{table_name}`")
+    if VACUUM in actions:
+        fetch_rows(f"VACUUM {schema}.`{table_name}`")
+
+    files_after, bytes_after = _detail(catalog, table_name, fetch_rows)
+    return {
+        'table_name': table_name,
+        'rows_deleted': rows_deleted,
+        'files_before': files_before,
+        'files_after': files_after,
+        'bytes_before': bytes_before,
+        'bytes_after': bytes_after,
+    }
+
+
+def format_stats(stats):
+    """One-line summary of maintain_table's result."""
+    mb = (stats['bytes_before'] - stats['bytes_after']) / (1024 * 1024)
+    return (f"{stats['rows_deleted']} row(s) deleted, files "
+            f"{stats['files_before']} → {stats['files_after']}, {mb:.1f} MB reclaimed")
+
+
+def log_statements(catalog, run_id, results):
+    """
+    Statements that create waf_cache._maintenance_log and append one row per
+    table maintained. `results` holds (table_name, stats_or_None, seconds, error).
+    """
+    table = f"{_schema(catalog)}.`_maintenance_log`"
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {table} ("
+        f"  run_id INT,"
+        f"  table_name STRING,"
+        f"  rows_deleted BIGINT,"
+        f"  files_before BIGINT,"
+        f"  files_after BIGINT,"
+        f"  bytes_before BIGINT,"
+        f"  bytes_after BIGINT,"
+        f"  seconds DOUBLE,"
+        f"  error STRING,"
+        f"  logged_at TIMESTAMP"
+        f") USING DELTA"
+    ]
+    values = []
+    for table_name, stats, seconds, error in results:
+        stats = stats or {}
+        nums = ', '.join(
+            str(int(stats[k])) if k in stats else 'NULL'
+            for k in ('rows_deleted', 'files_before', 'files_after', 'bytes_before', 'bytes_after')
+        )
+        err = "NULL" if not error else "'" + str(error)[:500].replace("\\", "\\\\").replace("'", "\\'") + "'"
+        values.append(f"({run_id}, '{table_name}', {nums}, {seconds:.3f}, {err}, current_timestamp())")
+    if values:
+        statements.append(f"INSERT INTO {table} VALUES\n" + ",\n".join(values))
+    return statements
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Dataset registry compiler and linter for dashboard_queries.yaml.
+
+Both reload paths compile the YAML into an execution plan before touching a
+warehouse, and stop straight away when it has errors:
+
+  * Skipped: `is_coming_soon` and `is_retired` datasets.
+  * Deduplicated by normalized SQL hash (comments, whitespace and a trailing
+    semicolon ignored). Copies writing the same table run once. A copy
+    writing a different table becomes a view over the first one.
+  * Errors: the same table written by different SQL, a parameter the reload
+    does not substitute, `depends_on` pointing at a table nothing in the
+    plan writes, dependency cycles, duplicate dataset names and missing keys.
+  * Pillars normalized (`cost_optimisation` -> `cost_optimization`). A
+    missing pillar is inferred from the table name prefix.
+  * Warnings: declared parameters that are never used, merged duplicates,
+    and `*_old` tables that still run.
+
+Run standalone to lint the YAML, or to print the compact plan:
+
+    python reload_registry.py [--yaml PATH] [--json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+from reload_scheduler import build_dag, dataset_dependencies
+
+PARAMETERS = ('catalog', 'date_range_start', 'date_range_end', 'rollback_days')
+
+PILLARS = ('cost_optimization', 'governance', 'performance_efficiency', 'reliability', 'summary')
+
+PILLAR_ALIASES = {
+    'cost_optimisation': 'cost_optimization',
+    'cost': 'cost_optimization',
+    'data_governance': 'governance',
+    'performance': 'performance_efficiency',
+}
+
+# Inferred pillar for datasets without one, by table name
+_PILLAR_PREFIXES = [
+    (re.compile(r'^waf_co_'), 'cost_optimization'),
+    (re.compile(r'^waf_pe_'), 'performance_efficiency'),
+    (re.compile(r'^waf_r_'), 'reliability'),
+    (re.compile(r'^waf_(dg_|count_of_)'), 'governance'),
+    (re.compile(r'^waf_\w+_c$'), 'cost_optimization'),
+    (re.compile(r'^waf_\w+_g$'), 'governance'),
+    (re.compile(r'^waf_\w+_p$'), 'performance_efficiency'),
+    (re.compile(r'^waf_\w+_r$'), 'reliability'),
+]
+
+_REQUIRED_KEYS = ('name', 'display_name', 'table_name', 'sql')
+
+_PARAM_RE = re.compile(r'(?<![:\w]):([A-Za-z_]\w*)')
+
+
+class RegistryError(ValueError):
+    """dashboard_queries.yaml does not compile; .errors lists every problem."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__(f"{len(self.errors)} error(s) in dashboard_queries.yaml:\n  "
+                         + '\n  '.join(self.errors))
+
+
+def _split_literals(sql):
+    """
+    (code, literals): sql with comments removed, and with each string literal
+    replaced by a placeholder whose text is kept in `literals`.
+    """
+    code, literals = [], []
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"'):
+            j = i + 1
+            while j < n:
+                if sql[j] == '\\':
+                    j += 2
+                    continue
+                if sql[j] == ch:
+                    if j + 1 < n and sql[j + 1] == ch:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            literals.append(sql[i:j + 1])
+            code.append(f" \x00{len(literals) - 1}\x00 ")
+            i = j + 1
+        elif sql.startswith('--', i):
+            j = sql.find('\n', i)
+            i = n if j == -1 else j
+        elif sql.startswith('/*', i):
+            j = sql.find('*/', i + 2)
+            i = n if j == -1 else j + 2
+        else:
+            code.append(ch)
+            i += 1
+    return ''.join(code), literals
+
+
+def normalize_sql(sql):
+    """SQL with comments dropped, whitespace collapsed and keywords/identifiers lowercased."""
+    code, literals = _split_literals(sql or '')
+    code = re.sub(r'\s+', ' ', code.lower()).strip().rstrip(';').strip()
+    code = re.sub(r'\s*([(),=<>+*/-])\s*', r'\1', code)
+    return re.sub(r'\x00(\d+)\x00', lambda m: literals[int(m.group(1))], code)
+
+
+def sql_hash(sql):
+    """Short stable hash of normalize_sql(sql)."""
+    return hashlib.sha256(normalize_sql(sql).encode('utf-8')).hexdigest()[:16]
+
+
+def used_parameters(sql):
+    """`:name` parameters referenced outside comments and string literals."""
+    code, _ = _split_literals(sql or '')
+    return set(_PARAM_RE.findall(code))
+
+
+def normalize_pillar(pillar, table_name):
+    """(pillar, error): canonical pillar name, inferred from table_name when missing."""
+    if pillar:
+        key = str(pillar).strip().lower().replace('-', '_').replace(' ', '_')
+        key = PILLAR_ALIASES.get(key, key)
+        if key not in PILLARS:
+            return None, f"unknown pillar '{pillar}' (expected one of {', '.join(PILLARS)})"
+        return key, None
+    for pattern, inferred in _PILLAR_PREFIXES:
+        if pattern.search(table_name):
+            return inferred, None
+    return None, None
+
+
+def _declared(ds):
+    params = ds.get('parameters') or []
+    return {p if isinstance(p, str) else (p.get('keyword') or p.get('name')) for p in params}
+
+
+def compile_registry(data):
+    """
+    Compile the parsed YAML into an execution plan.
+
+    Args:
+        data: Parsed dashboard_queries.yaml ({'datasets': [...]})
+
+    Returns:
+        Plan dict: datasets (to run, YAML order), skipped ((name, reason)
+        pairs), warnings and errors (lists of strings). Each dataset keeps
+        its YAML keys plus `pillar` (normalized), `sql_hash` and `merged`
+        (names of duplicates folded into it).
+    """
+    errors, warnings, skipped = [], [], []
+    datasets = (data or {}).get('datasets') or []
+
+    names = {}
+    for i, ds in enumerate(datasets):
+        label = ds.get('name') or f"#{i + 1}"
+        missing = [k for k in _REQUIRED_KEYS if not ds.get(k)]
+        if missing:
+            errors.append(f"{label}: missing {', '.join(missing)}")
+        if ds.get('name') in names:
+            errors.append(f"{label}: duplicate dataset name")
+        names[ds.get('name')] = i
+    if errors:
+        return {'datasets': [], 'skipped': [], 'warnings': warnings, 'errors': errors}
+
+    candidates = []
+    for ds in datasets:
+        label = f"{ds['name']} ({ds['table_name']})"
+        if ds.get('is_coming_soon'):
+            skipped.append((ds['name'], 'coming soon'))
+            continue
+        if ds.get('is_retired'):
+            skipped.append((ds['name'], 'retired'))
+            continue
+        if ds['table_name'].endswith('_old'):
+            warnings.append(f"{label}: looks like a leftover; mark it `is_retired: true` if unused")
+
+        used, declared = used_parameters(ds['sql']), _declared(ds)
+        unsupported = sorted(used - set(PARAMETERS))
+        if unsupported:
+            errors.append(f"{label}: reload cannot substitute :{', :'.join(unsupported)}")
+        undeclared = sorted((used & set(PARAMETERS)) - declared)
+        if undeclared:
+            errors.append(f"{label}: uses undeclared parameter(s) {', '.join(undeclared)}")
+        unused = sorted(declared - used)
+        if unused:
+            warnings.append(f"{label}: declared parameter(s) never used: {', '.join(unused)}")
+
+        pillar, error = normalize_pillar(ds.get('pillar'), ds['table_name'])
+        if error:
+            errors.append(f"{label}: {error}")
+        candidates.append(dict(ds, pillar=pillar, sql_hash=sql_hash(ds['sql']), merged=[]))
+
+    plan = []
+    by_table, by_hash = {}, {}
+    for ds in candidates:
+        first = by_table.get(ds['table_name'])
+        if first is not None:
+            if first['sql_hash'] != ds['sql_hash'] or bool(first.get('is_view')) != bool(ds.get('is_view')):
+                errors.append(f"{ds['name']}: writes {ds['table_name']} with different SQL than {first['name']}")
+            else:
+                first['merged'].append(ds['name'])
+                first['pillar'] = first['pillar'] or ds['pillar']
+                first['depends_on'] = sorted(set(dataset_dependencies(first)) | set(dataset_dependencies(ds)))
+                warnings.append(f"{ds['name']}: identical to {first['name']} "
+                                f"({ds['table_name']}), runs once")
+            continue
+        source = by_hash.get(ds['sql_hash'])
+        if source is not None and not ds.get('is_view'):
+            warnings.append(f"{ds['name']}: same SQL as {source['name']}, "
+                            f"{ds['table_name']} becomes a view over {source['table_name']}")
+            ds = dict(ds, is_view=True, parameters=['catalog'], depends_on=[source['table_name']],
+                      sql=f"SELECT * FROM :catalog.waf_cache.{source['table_name']}")
+        else:
+            by_hash.setdefault(ds['sql_hash'], ds)
+        by_table[ds['table_name']] = ds
+        plan.append(ds)
+
+    if not errors:
+        try:
+            build_dag(plan)
+        except ValueError as exc:
+            errors.append(str(exc))
+
+    return {'datasets': plan, 'skipped': skipped, 'warnings': warnings, 'errors': errors}
+
+
+def load_plan(yaml_path):
+    """Compile the YAML file; raises RegistryError if it has errors."""
+    import yaml
+    with open(yaml_path, encoding='utf-8') as f:
+        plan = compile_registry(yaml.safe_load(f))
+    if plan['errors']:
+        raise RegistryError(plan['errors'])
+    return plan
+
+
+def compact_plan(plan):
+    """JSON-friendly plan without SQL text (table, hash, pillar and dependencies per dataset)."""
+    return {
+        'datasets': [
+            {k: ds[k] for k in ('name', 'table_name', 'pillar', 'sql_hash', 'depends_on',
+                                'is_view', 'merged') if ds.get(k)}
+            for ds in plan['datasets']
+        ],
+        'skipped': [{'name': n, 'reason': r} for n, r in plan['skipped']],
+        'warnings': plan['warnings'],
+        'errors': plan['errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lint dashboard_queries.yaml and print its execution plan')
+    parser.add_argument('--yaml', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       'dashboard_queries.yaml'))
+    parser.add_argument('--json', action='store_true', help='Print the compact plan as JSON')
+    args = parser.parse_args()
+
+    import yaml
+    with open(args.yaml, encoding='utf-8') as f:
+        plan = compile_registry(yaml.safe_load(f))
+
+    if args.json:
+        print(json.dumps(compact_plan(plan), indent=2))
+    else:
+        print(f"{len(plan['datasets'])} dataset(s) to run, {len(plan['skipped'])} skipped")
+        for w in plan['warnings']:
+            print(f"  ⚠ {w}")
+        for e in plan['errors']:
+            print(f"  ✗ {e}")
+    sys.exit(1 if plan['errors'] else 0)
+
+
+if __name__ == '__main__':
+    main()
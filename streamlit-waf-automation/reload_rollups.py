@@ -0,0 +1,221 @@
+"""
+Incremental daily rollups of the billing and compute system tables.
+
+The rolling-window usage metrics (serverless / Photon / DLT / model-serving
+share, SKU splits, per-cluster DBUs and utilization) only need per-day
+totals, yet each dataset used to re-aggregate 30-90 days of raw
+system.billing.usage and system.compute.node_timeline rows on every run.
+The rollups below keep those per-day totals in
+{catalog}.waf_cache._rollup_* tables, and the datasets read them via
+`:catalog.waf_cache._rollup_*`.
+
+Each run only recomputes the newest days:
+
+  * First run (or after a schema change): backfill `keep_days` days with
+    CREATE OR REPLACE TABLE ... CLUSTER BY (usage_date).
+  * Later runs: INSERT INTO ... REPLACE WHERE usage_date >= start, where
+    start is the newest day already rolled up minus `refresh_days`, so
+    late-arriving records are picked up. Days older than `keep_days` are
+    then deleted.
+  * Sources with an ingestion date (system.billing.usage) also recompute
+    every older usage_date that has rows ingested on or after the newest
+    rolled-up day, which is never later than the previous refresh. That
+    picks up RETRACTION / RESTATEMENT corrections and late ingestion for
+    any day in the window.
+
+Every measure is a SUM or COUNT, so window totals are re-aggregable:
+COUNT(*) becomes SUM(usage_records), AVG(x) becomes SUM(x_sum) / SUM(x_count).
+They match the source as of the last refresh for sources with an
+ingestion date. node_timeline has none, so rows it rewrites for days older
+than `refresh_days` are only picked up by a rebuild.
+
+Shared by reload_data.py (SQL connector) and the waf_reload notebook (Spark).
+"""
+from datetime import date, datetime, timedelta
+
+REFRESH_DAYS = 3
+
+ROLLUPS = [
+    {
+        'table_name': '_rollup_billing_daily',
+        'source': 'system.billing.usage',
+        'date_expr': 'usage_date',
+        'ingestion_expr': 'ingestion_date',
+        'keep_days': 400,
+        'dimensions': [
+            ('account_id', 'account_id'),
+            ('workspace_id', 'workspace_id'),
+            ('cloud', 'cloud'),
+            ('sku_name', 'sku_name'),
+            ('billing_origin_product', 'billing_origin_product'),
+            ('usage_type', 'usage_type'),
+            ('usage_unit', 'usage_unit'),
+            ('is_photon', 'product_features.is_photon'),
+            ('is_serverless', 'product_features.is_serverless'),
+            ('cluster_id', 'usage_metadata.cluster_id'),
+        ],
+        'measures': [
+            ('usage_records', 'COUNT(*)'),
+            ('usage_quantity', 'SUM(usage_quantity)'),
+        ],
+    },
+    {
+        'table_name': '_rollup_node_timeline_daily',
+        'source': 'system.compute.node_timeline',
+        'date_expr': 'CAST(start_time AS DATE)',
+        'keep_days': 100,
+        'dimensions': [
+            ('account_id', 'account_id'),
+            ('workspace_id', 'workspace_id'),
+            ('cluster_id', 'cluster_id'),
+        ],
+        'measures': [
+            ('cpu_busy_percent_sum', 'SUM(cpu_user_percent + cpu_system_percent)'),
+            ('cpu_busy_samples', 'COUNT(cpu_user_percent + cpu_system_percent)'),
+            ('mem_used_percent_sum', 'SUM(mem_used_percent)'),
+            ('mem_used_samples', 'COUNT(mem_used_percent)'),
+        ],
+    },
+]
+
+
+def _table_ref(catalog, rollup):
+    return f"`{catalog}`.`waf_cache`.`{rollup['table_name']}`"
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def plan_rollups(sqls):
+    """Rollups some dataset SQL reads, in ROLLUPS order."""
+    return [r for r in ROLLUPS
+            if any(f"waf_cache.{r['table_name']}" in sql.replace('`', '') for sql in sqls)]
+
+
+def _alias(name, expr):
+    return expr if expr == name else f"{expr} AS {name}"
+
+
+def _date_filter(column, since_sql, extra_dates=()):
+    """`column >= since_sql`, or'ed with membership in extra_dates (dates)."""
+    condition = f"{column} >= {since_sql}"
+    if extra_dates:
+        listed = ", ".join(f"DATE'{d.isoformat()}'" for d in sorted(extra_dates))
+        condition = f"({condition} OR {column} IN ({listed}))"
+    return condition
+
+
+def rollup_select(rollup, since_sql, extra_dates=()):
+    """
+    SELECT that aggregates the source table per day from `since_sql` (a SQL
+    date) on, plus the days in `extra_dates`.
+    """
+    date_expr = rollup['date_expr']
+    cols = [_alias('usage_date', date_expr)]
+    cols += [_alias(name, expr) for name, expr in rollup['dimensions'] + rollup['measures']]
+    group_by = [date_expr] + [expr for _, expr in rollup['dimensions']]
+    return (
+        "SELECT\n  " + ",\n  ".join(cols) + "\n"
+        f"FROM {rollup['source']}\n"
+        f"WHERE {_date_filter(date_expr, since_sql, extra_dates)}\n"
+        "GROUP BY " + ", ".join(group_by)
+    )
+
+
+def max_date_statement(rollup, catalog):
+    """Query returning the newest usage_date already rolled up."""
+    return f"SELECT MAX(usage_date) FROM {_table_ref(catalog, rollup)}"
+
+
+def corrected_dates_statement(rollup, start, ingested_since):
+    """
+    Query returning the comma-separated usage_dates before `start` (still in
+    the window) with rows ingested on or after `ingested_since`.
+    """
+    date_expr = rollup['date_expr']
+    return (
+        f"SELECT array_join(collect_set(CAST({date_expr} AS STRING)), ',')\n"
+        f"FROM {rollup['source']}\n"
+        f"WHERE {rollup['ingestion_expr']} >= DATE'{ingested_since.isoformat()}'\n"
+        f"  AND {date_expr} < DATE'{start.isoformat()}'\n"
+        f"  AND {date_expr} >= current_date() - INTERVAL {rollup['keep_days']} DAYS"
+    )
+
+
+def backfill_statement(rollup, catalog):
+    """CREATE OR REPLACE TABLE that rebuilds the whole rollup window."""
+    since = f"current_date() - INTERVAL {rollup['keep_days']} DAYS"
+    return (
+        f"CREATE OR REPLACE TABLE {_table_ref(catalog, rollup)}\n"
+        f"CLUSTER BY (usage_date) AS\n{rollup_select(rollup, since)}"
+    )
+
+
+def incremental_statements(rollup, catalog, start, extra_dates=()):
+    """
+    Statements that recompute every day from `start` (a date) plus the days
+    in `extra_dates`, and trim old days.
+    """
+    table = _table_ref(catalog, rollup)
+    since = f"DATE'{start.isoformat()}'"
+    return [
+        f"INSERT INTO {table}\nREPLACE WHERE {_date_filter('usage_date', since, extra_dates)}\n"
+        f"{rollup_select(rollup, since, extra_dates)}",
+        f"DELETE FROM {table}\n"
+        f"WHERE usage_date < current_date() - INTERVAL {rollup['keep_days']} DAYS",
+    ]
+
+
+def refresh_rollup(rollup, catalog, execute, fetch_value, refresh_days=REFRESH_DAYS):
+    """
+    Bring one rollup table up to date.
+
+    Args:
+        rollup: Entry from ROLLUPS
+        catalog: Unity Catalog holding waf_cache
+        execute: execute(sql) runs a statement
+        fetch_value: fetch_value(sql) runs a query and returns its first value
+        refresh_days: Trailing days recomputed on every run
+
+    Returns:
+        Short description of what was done (for progress output)
+
+    Raises:
+        Exception: If probing the rollup fails for any reason other than the
+            table not existing yet, or a refresh statement fails
+    """
+    try:
+        newest = fetch_value(max_date_statement(rollup, catalog))
+    except Exception as exc:
+        # Only a missing table means "not created yet"; a timeout, cancellation
+        # or permission error must not turn into a full keep_days backfill
+        if 'TABLE_OR_VIEW_NOT_FOUND' not in str(exc):
+            raise
+        newest = None
+
+    if newest is not None:
+        newest = _as_date(newest)
+        start = newest - timedelta(days=refresh_days)
+        corrected = []
+        if rollup.get('ingestion_expr'):
+            # The newest rolled-up day is never later than the previous refresh
+            listed = fetch_value(corrected_dates_statement(rollup, start, newest))
+            corrected = [_as_date(d) for d in str(listed or '').split(',') if d]
+        try:
+            for statement in incremental_statements(rollup, catalog, start, corrected):
+                execute(statement)
+            return (f"incremental from {start.isoformat()}"
+                    + (f" + {len(corrected)} corrected day(s)" if corrected else ""))
+        except Exception as exc:
+            # Most likely the rollup columns changed; rebuild from scratch
+            reason = str(exc).splitlines()[0][:120] if str(exc) else type(exc).__name__
+            execute(backfill_statement(rollup, catalog))
+            return f"rebuilt {rollup['keep_days']} days after incremental merge failed: {reason}"
+
+    execute(backfill_statement(rollup, catalog))
+    return f"backfilled {rollup['keep_days']} days"
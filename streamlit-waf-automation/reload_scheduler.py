@@ -0,0 +1,188 @@
+"""
+Dependency-aware scheduler for WAF reload datasets.
+
+Shared by reload_data.py (SQL connector) and the waf_reload notebook (Spark).
+Datasets in dashboard_queries.yaml may declare the tables they read:
+
+    depends_on:
+      - waf_controls_g
+
+Declare only tables the dataset's SQL actually reads from waf_cache: a
+failure upstream skips the dataset and counts it as failed.
+
+A dataset starts as soon as every dataset writing the tables it depends on has
+succeeded. Independent datasets run in parallel, and among ready datasets the
+one heading the longest remaining chain goes first, so total runtime tracks
+the critical path rather than the sum of all datasets. When a dataset fails,
+everything downstream of it is skipped.
+
+Ordering guarantees that what a dataset reads exists (a view cannot be
+created over a missing table), not that it is this run's data: the latest-run
+views only move to this run once the whole run has finished. Views such as
+waf_recommendations_not_met pick the new rows up then; a table-backed
+dependent would store the previous run's rows.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+SUCCESS = 'success'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+def dataset_dependencies(ds):
+    """Tables this dataset reads, from its `depends_on` key."""
+    deps = ds.get('depends_on') or []
+    if isinstance(deps, str):
+        deps = [deps]
+    return list(deps)
+
+
+def build_dag(datasets):
+    """
+    Resolve `depends_on` table names to dataset indices.
+
+    A table written by several datasets (duplicate table_name) is only ready
+    once all of them have run. Returns a list of dependency index sets, one
+    per dataset. Raises ValueError on unknown tables or dependency cycles.
+    """
+    writers = {}
+    for i, ds in enumerate(datasets):
+        writers.setdefault(ds['table_name'], []).append(i)
+
+    deps = []
+    unknown = []
+    for i, ds in enumerate(datasets):
+        node_deps = set()
+        for table in dataset_dependencies(ds):
+            if table not in writers:
+                unknown.append(f"{ds['table_name']} → {table}")
+                continue
+            node_deps.update(j for j in writers[table] if j != i)
+        deps.append(node_deps)
+    if unknown:
+        raise ValueError(f"Unknown depends_on table(s): {', '.join(unknown)}")
+
+    topological_order(deps)  # raises on cycles
+    return deps
+
+
+def topological_order(deps):
+    """Kahn's algorithm over dependency index sets. Raises ValueError on cycles."""
+    remaining = [len(d) for d in deps]
+    dependents = _dependents(deps)
+    order = [i for i, n in enumerate(remaining) if n == 0]
+    for i in order:
+        for j in dependents[i]:
+            remaining[j] -= 1
+            if remaining[j] == 0:
+                order.append(j)
+    if len(order) != len(deps):
+        cyclic = sorted(i for i, n in enumerate(remaining) if n > 0)
+        raise ValueError(f"Dependency cycle between dataset indices: {cyclic}")
+    return order
+
+
+def _dependents(deps):
+    dependents = [[] for _ in deps]
+    for i, node_deps in enumerate(deps):
+        for j in node_deps:
+            dependents[j].append(i)
+    return dependents
+
+
+def critical_path_lengths(datasets, deps, weights=None):
+    """
+    Longest weighted chain from each dataset to the end of the DAG.
+
+    `weights` maps table_name → expected seconds (e.g. last run's duration);
+    datasets without a weight count as 1.
+    """
+    weights = weights or {}
+    dependents = _dependents(deps)
+    lengths = [0.0] * len(datasets)
+    for i in reversed(topological_order(deps)):
+        own = float(weights.get(datasets[i]['table_name'], 1.0))
+        lengths[i] = own + max((lengths[j] for j in dependents[i]), default=0.0)
+    return lengths
+
+
+def critical_path(datasets, weights=None):
+    """Table names along the longest chain of the DAG (for logging)."""
+    if not datasets:
+        return []
+    deps = build_dag(datasets)
+    lengths = critical_path_lengths(datasets, deps, weights)
+    dependents = _dependents(deps)
+    node = max((i for i in range(len(datasets)) if not deps[i]), key=lambda i: lengths[i])
+    path = [datasets[node]['table_name']]
+    while dependents[node]:
+        node = max(dependents[node], key=lambda i: lengths[i])
+        path.append(datasets[node]['table_name'])
+    return path
+
+
+def run_dag(datasets, run_fn, max_workers=8, on_done=None, weights=None):
+    """
+    Run every dataset respecting `depends_on`, at most `max_workers` at a time.
+
+    run_fn(ds) runs one dataset on a worker thread and returns (ok, detail);
+    an exception counts as a failure with the exception text as detail.
+    on_done(index, status, detail) is called on the calling thread as each
+    dataset finishes or is skipped; skipped datasets get a text detail naming
+    the failed dependency.
+
+    Returns a list of (status, detail) in dataset order, where status is
+    SUCCESS, FAILED or SKIPPED.
+    """
+    max_workers = max(1, max_workers)
+    deps = build_dag(datasets)
+    dependents = _dependents(deps)
+    priority = critical_path_lengths(datasets, deps, weights)
+    remaining = [len(d) for d in deps]
+    results = [None] * len(datasets)
+    ready = [i for i, n in enumerate(remaining) if n == 0]
+
+    def _record(i, status, detail):
+        results[i] = (status, detail)
+        if on_done:
+            on_done(i, status, detail)
+
+    def _skip_downstream(i):
+        failed_table = datasets[i]['table_name']
+        stack = list(dependents[i])
+        while stack:
+            j = stack.pop()
+            if results[j] is not None:
+                continue
+            _record(j, SKIPPED, f"skipped: dependency {failed_table} did not succeed")
+            stack.extend(dependents[j])
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='waf-dag') as pool:
+        running = {}
+        while ready or running:
+            # Only hand the pool as much work as it can start, so a dataset
+            # that becomes ready later can still jump ahead on priority
+            ready.sort(key=lambda i: (-priority[i], i))
+            while ready and len(running) < max_workers:
+                i = ready.pop(0)
+                running[pool.submit(run_fn, datasets[i])] = i
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in sorted(done, key=lambda f: running[f]):
+                i = running.pop(fut)
+                try:
+                    ok, detail = fut.result()
+                except Exception as exc:
+                    ok, detail = False, str(exc)
+
+                if ok:
+                    _record(i, SUCCESS, detail)
+                    for j in dependents[i]:
+                        remaining[j] -= 1
+                        if remaining[j] == 0 and results[j] is None:
+                            ready.append(j)
+                else:
+                    _record(i, FAILED, detail)
+                    _skip_downstream(i)
+
+    return results
@@ -0,0 +1,242 @@
+"""
+Shared-scan staging for WAF reload runs.
+
+Most dataset queries scan the same few system tables (system.billing.usage,
+system.compute.clusters, system.compute.warehouses,
+system.information_schema.tables) and repeat the same latest-snapshot
+dedupe. At the start of each run the stages below are materialized once into
+{catalog}.waf_cache._stage_* tables, and dataset SQL is rewritten to read
+from them, so each hot source is scanned once per run instead of once per
+dataset.
+
+Rewrites only ever swap a table reference, so query results are unchanged:
+
+  * Full-copy stages (clusters, warehouses, table inventory) replace every
+    FROM/JOIN reference to their source.
+  * The billing stage keeps a trailing window of usage_date. A reference is
+    only rewritten when its own (sub)query filters usage_date or
+    usage_start_time to a window the stage covers. Unbounded lookups keep
+    reading system.billing.usage.
+  * The latest-cluster stage replaces subqueries that compute exactly
+    ROW_NUMBER() OVER (PARTITION BY cluster_id ORDER BY change_time DESC)
+    over the whole clusters table and nothing else.
+
+Shared by reload_data.py (SQL connector) and the waf_reload notebook (Spark).
+If a stage fails, the datasets that would have used it run their original SQL.
+"""
+import re
+
+BILLING_WINDOW_DAYS = 90
+
+STAGES = [
+    {
+        'table_name': '_stage_billing_usage',
+        'source': 'system.billing.usage',
+        'window_days': BILLING_WINDOW_DAYS,
+        # one extra day so a run that crosses midnight still covers every window
+        'sql': (f"SELECT * FROM system.billing.usage "
+                f"WHERE usage_date >= current_date() - INTERVAL {BILLING_WINDOW_DAYS + 1} DAYS"),
+    },
+    {
+        'table_name': '_stage_compute_clusters',
+        'source': 'system.compute.clusters',
+        'sql': "SELECT * FROM system.compute.clusters",
+    },
+    {
+        'table_name': '_stage_compute_clusters_latest',
+        'depends_on': ['_stage_compute_clusters'],
+        'sql': ("SELECT * EXCEPT (_rn) FROM (\n"
+                "  SELECT *, ROW_NUMBER() OVER (PARTITION BY cluster_id ORDER BY change_time DESC) AS _rn\n"
+                "  FROM {schema}.`_stage_compute_clusters`\n"
+                ") WHERE _rn = 1"),
+    },
+    {
+        'table_name': '_stage_compute_warehouses',
+        'source': 'system.compute.warehouses',
+        'sql': "SELECT * FROM system.compute.warehouses",
+    },
+    {
+        'table_name': '_stage_information_schema_tables',
+        'source': 'system.information_schema.tables',
+        'sql': "SELECT * FROM system.information_schema.tables",
+    },
+]
+
+_STAGES_BY_NAME = {s['table_name']: s for s in STAGES}
+
+_REF_RE = re.compile(r"\b(FROM|JOIN)\s+(system\.\w+\.\w+)\b", re.I)
+
+_LATEST_CLUSTERS_RE = re.compile(
+    r"ROW_NUMBER\(\)\s+OVER\s*\(\s*PARTITION\s+BY\s+cluster_id\s+ORDER\s+BY\s+change_time\s+DESC\s*\)"
+    r"(\s+(?:AS\s+)?\w+\s+FROM\s+)system\.compute\.clusters(?=(?:\s+(?:AS\s+)?\w+)?\s*\))",
+    re.I,
+)
+
+_NOW = r"(?:current_date|current_timestamp|now)\s*(?:\(\s*\))?"
+_COL = r"(?:\w+\.)?(?:usage_date|usage_start_time)"
+_WINDOW_RES = [
+    # usage_date >= current_date() - INTERVAL 30 DAYS
+    re.compile(rf"\b{_COL}\s*>=?\s*{_NOW}\s*-\s*INTERVAL\s*'?(\d+)'?\s*DAYS?\b", re.I),
+    # usage_date BETWEEN current_date() - INTERVAL 90 DAY AND ... / BETWEEN current_date()-30 AND
+    re.compile(rf"\b{_COL}\s+BETWEEN\s+{_NOW}\s*-\s*(?:INTERVAL\s*'?(\d+)'?\s*DAYS?|(\d+))\s+AND\b", re.I),
+    # date_diff(day, u.usage_start_time, now()) < 28
+    re.compile(rf"\bdate_diff\s*\(\s*day\s*,\s*{_COL}\s*,\s*{_NOW}\s*\)\s*<=?\s*(\d+)", re.I),
+]
+
+
+def _mask(sql):
+    """
+    Same-length copy of sql with string literals and comments blanked out,
+    so references and parentheses inside them are ignored. Purely numeric
+    literals are kept (INTERVAL '7' DAY).
+    """
+    out = list(sql)
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"'):
+            j = i + 1
+            while j < n:
+                if sql[j] == '\\':
+                    j += 2
+                    continue
+                if sql[j] == ch:
+                    if j + 1 < n and sql[j + 1] == ch:  # doubled quote escape
+                        j += 2
+                        continue
+                    break
+                j += 1
+            if not sql[i + 1:j].isdigit():
+                for k in range(i + 1, min(j, n)):
+                    out[k] = ' '
+            i = j + 1
+        elif sql.startswith('--', i):
+            j = sql.find('\n', i)
+            j = n if j == -1 else j
+            for k in range(i, j):
+                out[k] = ' '
+            i = j
+        elif sql.startswith('/*', i):
+            j = sql.find('*/', i + 2)
+            j = n if j == -1 else j + 2
+            for k in range(i, j):
+                out[k] = ' '
+            i = j
+        else:
+            i += 1
+    return ''.join(out)
+
+
+def _scope(masked, pos):
+    """
+    Text of the (sub)query containing pos, from pos to where it closes, with
+    nested subqueries blanked so their predicates are not attributed to it.
+    """
+    out = []
+    depth = 0
+    subquery_depth = None
+    i, n = pos, len(masked)
+    while i < n:
+        ch = masked[i]
+        if ch == '(':
+            depth += 1
+            if subquery_depth is None and re.match(r"\(\s*(SELECT|WITH)\b", masked[i:], re.I):
+                subquery_depth = depth
+        elif ch == ')':
+            if depth == 0:
+                break
+            if subquery_depth == depth:
+                subquery_depth = None
+                depth -= 1
+                i += 1
+                continue
+            depth -= 1
+        elif ch == ';' and depth == 0:
+            break
+        out.append(' ' if subquery_depth is not None else ch)
+        i += 1
+    return ''.join(out)
+
+
+def _window_days(scope):
+    """Largest day window found among recognised date predicates, or None."""
+    days = []
+    for pattern in _WINDOW_RES:
+        for m in pattern.finditer(scope):
+            days.append(max(int(g) for g in m.groups() if g))
+    return max(days) if days else None
+
+
+def _stage_ref(catalog, stage_name):
+    return f"`{catalog}`.`waf_cache`.`{stage_name}`"
+
+
+def rewrite_sql(sql, catalog, available=None):
+    """
+    Point a dataset's system-table references at staged copies.
+
+    Args:
+        sql: Dataset SQL with parameters already substituted
+        catalog: Unity Catalog holding waf_cache
+        available: Stage table names that exist for this run (None = all)
+
+    Returns:
+        (rewritten_sql, set of stage table names it reads)
+    """
+    available = set(_STAGES_BY_NAME) if available is None else set(available)
+    masked = _mask(sql)
+    edits = []  # (start, end, replacement)
+    used = set()
+
+    if '_stage_compute_clusters_latest' in available:
+        for m in _LATEST_CLUSTERS_RE.finditer(masked):
+            src_start = m.end(1)
+            edits.append((m.start(), src_start, "1" + sql[m.start(1):src_start]))
+            edits.append((src_start, m.end(),
+                          _stage_ref(catalog, '_stage_compute_clusters_latest')))
+            used.add('_stage_compute_clusters_latest')
+    claimed = {start for start, _, _ in edits}
+
+    for m in _REF_RE.finditer(masked):
+        source = m.group(2).lower()
+        start, end = m.start(2), m.end(2)
+        if start in claimed:
+            continue
+        stage = next((s for s in STAGES if s.get('source') == source
+                      and s['table_name'] in available), None)
+        if stage is None:
+            continue
+        if stage.get('window_days') is not None:
+            window = _window_days(_scope(masked, m.end()))
+            if window is None or window > stage['window_days']:
+                continue
+        edits.append((start, end, _stage_ref(catalog, stage['table_name'])))
+        used.add(stage['table_name'])
+
+    for start, end, replacement in sorted(edits, reverse=True):
+        sql = sql[:start] + replacement + sql[end:]
+    return sql, used
+
+
+def plan_stages(sqls, catalog):
+    """
+    Stages worth building this run: those some dataset SQL would read, plus
+    the stages they are built from. Returned in STAGES order.
+    """
+    needed = set()
+    for sql in sqls:
+        needed |= rewrite_sql(sql, catalog)[1]
+    frontier = list(needed)
+    while frontier:
+        for dep in _STAGES_BY_NAME[frontier.pop()].get('depends_on', []):
+            if dep not in needed:
+                needed.add(dep)
+                frontier.append(dep)
+    return [s for s in STAGES if s['table_name'] in needed]
+
+
+def stage_statement(stage, catalog):
+    """CREATE OR REPLACE TABLE statement that materializes one stage."""
+    schema = f"`{catalog}`.`waf_cache`"
+    body = stage['sql'].replace('{schema}', schema)
+    return f"CREATE OR REPLACE TABLE {schema}.`{stage['table_name']}` AS\n{body}"
@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+"""
+Synthetic system-table snapshots at a chosen account scale.
+
+Writes Parquet snapshots of the system tables the WAF SQL reads most, in
+the layout the offline backend (reload_local.py) serves under their
+original names:
+
+    <out>/system/billing/usage/part-00000.parquet ...
+    <out>/system/compute/clusters/part-00000.parquet
+    <out>/system/query/history/part-00000.parquet ...
+    <out>/system/access/table_lineage/part-00000.parquet ...
+    <out>/system/information_schema/tables/part-00000.parquet
+    <out>/manifest.json
+
+Columns and value domains follow what dashboard_queries.yaml filters and
+joins on: billing_origin_product / sku_name / usage_type values, the
+product_features and usage_metadata structs, custom_tags and cluster tags
+maps, cluster change history keyed by change_time, compute.type in
+query.history, lineage pointing at tables that exist in
+information_schema.tables. usage_quantity is DOUBLE rather than DECIMAL.
+
+Generation is vectorized (NumPy arrays into Arrow, large tables written in
+chunks) and deterministic for a given --seed and --as-of. The adoption
+knobs set per-cluster / per-row probabilities:
+
+    --photon        Photon runtime share of classic clusters and serverless usage
+    --serverless    Serverless share of JOBS / SQL / DLT usage
+    --autoscaling   Clusters with an autoscale range instead of a fixed size
+    --tag-adoption  Clusters and usage rows carrying tags
+    --policy        Clusters created under a cluster policy
+
+manifest.json records the settings, row counts and the realized shares
+(e.g. tagged live clusters), so score-correctness checks can compare the
+WAF results against what was generated.
+
+    python synthetic_snapshots.py --out ./snapshots                     # --scale small
+    python synthetic_snapshots.py --out ./big --scale large --photon 0.7  # 10k clusters, 50M usage rows
+    python reload_data.py --backend local --snapshot-dir ./snapshots
+
+Needs numpy and pyarrow (pip install numpy pyarrow).
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import date, datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    print("ERROR: numpy not installed.")
+    sys.exit(1)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    print("ERROR: pyarrow not installed.")
+    sys.exit(1)
+
+SCALES = {
+    'small': dict(workspaces=3, clusters=200, usage_rows=200_000, query_rows=50_000,
+                  lineage_rows=20_000, tables=2_000),
+    'medium': dict(workspaces=10, clusters=2_000, usage_rows=5_000_000, query_rows=1_000_000,
+                   lineage_rows=500_000, tables=50_000),
+    'large': dict(workspaces=25, clusters=10_000, usage_rows=50_000_000, query_rows=10_000_000,
+                  lineage_rows=5_000_000, tables=250_000),
+}
+
+DEFAULT_CHUNK_ROWS = 2_000_000
+
+ACCOUNT_ID = '5f3c1a2e-0000-4000-8000-00000000waf1'
+CLOUD = 'AWS'
+REGION = 'US_EAST'
+
+# billing_origin_product, share of usage rows, serverless (0 never, 1 always, None = --serverless)
+PRODUCTS = [
+    ('JOBS', 0.34, None),
+    ('ALL_PURPOSE', 0.20, 0),
+    ('SQL', 0.20, None),
+    ('DLT', 0.08, None),
+    ('MODEL_SERVING', 0.05, 1),
+    ('INTERACTIVE', 0.04, 1),
+    ('PREDICTIVE_OPTIMIZATION', 0.03, 1),
+    ('DATA_QUALITY_MONITORING', 0.02, 1),
+    ('DATABASE', 0.02, 1),
+    ('LAKEFLOW_CONNECT', 0.02, 1),
+]
+
+# sku_name per product for (classic, classic photon, serverless)
+SKUS = {
+    'JOBS': ('PREMIUM_JOBS_COMPUTE', 'PREMIUM_JOBS_COMPUTE_(PHOTON)',
+             f'PREMIUM_JOBS_SERVERLESS_COMPUTE_{REGION}'),
+    'ALL_PURPOSE': ('PREMIUM_ALL_PURPOSE_COMPUTE', 'PREMIUM_ALL_PURPOSE_COMPUTE_(PHOTON)',
+                    f'PREMIUM_ALL_PURPOSE_SERVERLESS_COMPUTE_{REGION}'),
+    'SQL': ('PREMIUM_SQL_PRO_COMPUTE', 'PREMIUM_SQL_PRO_COMPUTE', f'PREMIUM_SERVERLESS_SQL_COMPUTE_{REGION}'),
+    'DLT': ('PREMIUM_DLT_ADVANCED_COMPUTE', 'PREMIUM_DLT_ADVANCED_COMPUTE_(PHOTON)',
+            f'PREMIUM_JOBS_SERVERLESS_COMPUTE_{REGION}'),
+    'MODEL_SERVING': ('', '', f'PREMIUM_SERVERLESS_REAL_TIME_INFERENCE_{REGION}'),
+    'INTERACTIVE': ('', '', f'PREMIUM_ALL_PURPOSE_SERVERLESS_COMPUTE_{REGION}'),
+    'PREDICTIVE_OPTIMIZATION': ('', '', f'PREMIUM_JOBS_SERVERLESS_COMPUTE_{REGION}'),
+    'DATA_QUALITY_MONITORING': ('', '', f'PREMIUM_JOBS_SERVERLESS_COMPUTE_{REGION}'),
+    'DATABASE': ('', '', f'PREMIUM_DATABASE_SERVERLESS_COMPUTE_{REGION}'),
+    'LAKEFLOW_CONNECT': ('', '', f'PREMIUM_JOBS_SERVERLESS_COMPUTE_{REGION}'),
+}
+
+TAG_KEYS = ['team', 'cost_center', 'project', 'env']
+TAG_VALUES = ['data-eng', 'analytics', 'ml', 'finance', 'cc-100', 'cc-200', 'prod', 'dev']
+NODE_TYPES = ['i3.xlarge', 'i3.2xlarge', 'm5d.2xlarge', 'r5d.4xlarge', 'g5.2xlarge']
+DBR_VERSIONS = ['13.3.x-scala2.12', '14.3.x-scala2.12', '15.4.x-scala2.12', '16.4.x-scala2.12']
+STATEMENT_TYPES = ['SELECT', 'SELECT', 'SELECT', 'INSERT', 'MERGE', 'CREATE', 'OTHER']
+STATEMENT_TEXTS = [
+    'SELECT * FROM main.sales.orders WHERE order_date >= current_date() - 7',
+    'SELECT usage_date, SUM(usage_quantity) FROM system.billing.usage GROUP BY 1',
+    'SELECT sku_name, pricing.default FROM system.billing.list_prices',
+    'MERGE INTO main.sales.orders t USING updates s ON t.id = s.id WHEN MATCHED THEN UPDATE SET *',
+    'INSERT INTO main.ops.events SELECT * FROM main.ops.events_staging',
+    'CREATE OR REPLACE TABLE main.ml.features AS SELECT * FROM main.ml.raw_features',
+]
+TABLE_FORMATS = ['DELTA', 'DELTA', 'DELTA', 'DELTA', 'ICEBERG', 'PARQUET', 'CSV', 'DELTASHARING']
+
+
+# ---------------------------------------------------------------------------
+# Vectorized helpers
+# ---------------------------------------------------------------------------
+
+def _pick(rng, vocab, n, p=None, mask=None):
+    """String column of n values drawn from vocab (nulls where mask is True)."""
+    idx = rng.choice(len(vocab), size=n, p=p)
+    return pa.array(vocab).take(pa.array(idx, mask=mask))
+
+
+def _prefixed(prefix, numbers, mask=None):
+    """String column prefix + str(number), vectorized."""
+    text = pc.binary_join_element_wise(prefix, pc.cast(pa.array(numbers), pa.string()), '')
+    if mask is not None:
+        text = pc.if_else(pa.array(mask), pa.nulls(len(text), pa.string()), text)
+    return text
+
+
+def _timestamps(seconds):
+    """timestamp[us] column from epoch seconds."""
+    return pa.array((np.asarray(seconds) * 1_000_000).astype('datetime64[us]'))
+
+
+def _dates(seconds):
+    return pa.array((np.asarray(seconds) // 86400).astype('datetime64[D]'))
+
+
+def _tag_map(rng, tagged):
+    """map<string,string> column: 1-3 distinct TAG_KEYS for tagged rows, {} otherwise."""
+    counts = np.where(tagged, rng.integers(1, 4, size=len(tagged)), 0).astype(np.int32)
+    offsets = np.zeros(len(tagged) + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    starts = rng.integers(0, len(TAG_KEYS), size=len(tagged))
+    position = np.arange(offsets[-1]) - np.repeat(offsets[:-1], counts)
+    key_idx = (np.repeat(starts, counts) + position) % len(TAG_KEYS)
+    keys = pa.array(TAG_KEYS).take(pa.array(key_idx))
+    values = _pick(rng, TAG_VALUES, int(offsets[-1]))
+    return pa.MapArray.from_arrays(pa.array(offsets), keys, values)
+
+
+def _struct(**columns):
+    return pa.StructArray.from_arrays(list(columns.values()), names=list(columns))
+
+
+def _write(out_dir, schema, table, part, arrays):
+    """Write one Parquet part of system.<schema>.<table>."""
+    path = os.path.join(out_dir, 'system', schema, table)
+    os.makedirs(path, exist_ok=True)
+    pq.write_table(pa.table(arrays), os.path.join(path, f"part-{part:05d}.parquet"),
+                   compression='zstd')
+
+
+def _chunks(total, chunk_rows):
+    start = 0
+    while start < total:
+        yield start, min(chunk_rows, total - start)
+        start += chunk_rows
+
+
+# ---------------------------------------------------------------------------
+# Tables
+# ---------------------------------------------------------------------------
+
+def generate_clusters(rng, cfg, now, workspace_ids):
+    """
+    system.compute.clusters: 1-3 change rows per cluster (latest by change_time),
+    with about 15% of clusters deleted in their latest row.
+    Returns (arrays, clusters) where clusters holds per-cluster attributes
+    the usage generator joins on.
+    """
+    n = cfg['clusters']
+    days = cfg['days']
+    source = rng.choice(3, size=n, p=[0.6, 0.25, 0.15])  # JOB, UI, API
+    photon = rng.random(n) < cfg['photon']
+    autoscaling = rng.random(n) < cfg['autoscaling']
+    tagged = rng.random(n) < cfg['tag_adoption']
+    policy = rng.random(n) < cfg['policy']
+    deleted = rng.random(n) < 0.15
+    workspace = rng.integers(0, len(workspace_ids), size=n)
+    created = now - rng.integers(1, days * 86400, size=n)
+
+    changes = rng.choice([1, 2, 3], size=n, p=[0.5, 0.3, 0.2])
+    row_cluster = np.repeat(np.arange(n), changes)
+    first_row = np.repeat(np.cumsum(changes) - changes, changes)
+    change_no = np.arange(len(row_cluster)) - first_row
+    last = change_no == changes[row_cluster] - 1
+    span = np.maximum(now - created[row_cluster], 1)
+    change_time = created[row_cluster] + (span * change_no // np.maximum(changes[row_cluster], 1))
+    rows = len(row_cluster)
+
+    min_workers = rng.integers(1, 4, size=n)
+    max_workers = min_workers + rng.integers(2, 20, size=n)
+    interactive = source[row_cluster] > 0
+    auto_term = np.where(interactive, rng.choice([0, 30, 60, 120], size=rows, p=[0.2, 0.3, 0.3, 0.2]), 0)
+    dbr = np.array(DBR_VERSIONS)[rng.integers(0, len(DBR_VERSIONS), size=n)]
+    dbr = np.where(photon, np.char.replace(dbr, '-scala', '-photon-scala'), dbr)
+
+    arrays = {
+        'account_id': pa.array([ACCOUNT_ID] * rows),
+        'workspace_id': pa.array(workspace_ids).take(pa.array(workspace[row_cluster])),
+        'cluster_id': _prefixed('0101-', row_cluster),
+        'cluster_name': _prefixed('cluster-', row_cluster),
+        'owned_by': _prefixed('user', row_cluster % 500),
+        'create_time': _timestamps(created[row_cluster]),
+        'delete_time': pa.array(
+            (change_time * 1_000_000).astype('datetime64[us]'),
+            mask=~(deleted[row_cluster] & last)),
+        'driver_node_type': _pick(rng, NODE_TYPES, rows),
+        'worker_node_type': pa.array(NODE_TYPES).take(pa.array(row_cluster % len(NODE_TYPES))),
+        'worker_count': pa.array(rng.integers(1, 16, size=rows), mask=autoscaling[row_cluster]),
+        'min_autoscale_workers': pa.array(min_workers[row_cluster], mask=~autoscaling[row_cluster]),
+        'max_autoscale_workers': pa.array(max_workers[row_cluster], mask=~autoscaling[row_cluster]),
+        'auto_termination_minutes': pa.array(auto_term, mask=~interactive),
+        'enable_elastic_disk': pa.array(rng.random(rows) < 0.5),
+        'tags': _tag_map(rng, tagged[row_cluster]),
+        'cluster_source': pa.array(['JOB', 'UI', 'API']).take(pa.array(source[row_cluster])),
+        'aws_attributes': _struct(
+            availability=_pick(rng, ['SPOT_WITH_FALLBACK', 'ON_DEMAND', 'SPOT'], rows, p=[0.5, 0.4, 0.1]),
+            first_on_demand=pa.array(rng.integers(0, 2, size=rows)),
+            zone_id=pa.array(['auto'] * rows),
+        ),
+        'azure_attributes': _struct(availability=pa.nulls(rows, pa.string())),
+        'driver_instance_pool_id': pa.nulls(rows, pa.string()),
+        'worker_instance_pool_id': pa.nulls(rows, pa.string()),
+        'dbr_version': pa.array(dbr[row_cluster]),
+        'change_time': _timestamps(change_time),
+        'change_date': _dates(change_time),
+        'data_security_mode': _pick(rng, ['USER_ISOLATION', 'SINGLE_USER', 'NONE'], rows, p=[0.5, 0.4, 0.1]),
+        'policy_id': _prefixed('POL', row_cluster % 40, mask=~policy[row_cluster]),
+    }
+    live = ~deleted
+    clusters = {
+        'id': np.arange(n), 'source': source, 'photon': photon, 'workspace': workspace,
+        'stats': {
+            'clusters': n,
+            'live_clusters': int(live.sum()),
+            'live_tagged_share': _share(tagged[live]),
+            'live_policy_share': _share(policy[live]),
+            'live_autoscaling_share': _share(autoscaling[live]),
+            'photon_share': _share(photon),
+        },
+    }
+    return arrays, clusters
+
+
+def _share(flags):
+    return round(float(np.mean(flags)), 4) if len(flags) else 0.0
+
+
+def generate_usage_chunk(rng, cfg, now, workspace_ids, clusters, start, n):
+    """n rows of system.billing.usage (record ids from start)."""
+    days = cfg['days']
+    names = [p[0] for p in PRODUCTS]
+    weights = np.array([p[1] for p in PRODUCTS])
+    product = rng.choice(len(PRODUCTS), size=n, p=weights / weights.sum())
+
+    always = np.array([p[2] == 1 for p in PRODUCTS])
+    knob = np.array([p[2] is None for p in PRODUCTS])
+    serverless = always[product] | (knob[product] & (rng.random(n) < cfg['serverless']))
+
+    # Classic JOBS / DLT usage runs on job clusters, classic ALL_PURPOSE on UI/API clusters
+    job_clusters = clusters['id'][clusters['source'] == 0]
+    ap_clusters = clusters['id'][clusters['source'] > 0]
+    is_ap = product == names.index('ALL_PURPOSE')
+    classic_cluster = (~serverless) & np.isin(product, [names.index('JOBS'), names.index('ALL_PURPOSE'),
+                                                        names.index('DLT')])
+    cluster = np.where(is_ap,
+                       ap_clusters[rng.integers(0, max(len(ap_clusters), 1), size=n) % max(len(ap_clusters), 1)],
+                       job_clusters[rng.integers(0, max(len(job_clusters), 1), size=n) % max(len(job_clusters), 1)])
+    photon = np.where(classic_cluster, clusters['photon'][cluster], rng.random(n) < cfg['photon'])
+    photon &= product != names.index('SQL')
+
+    sku_vocab = [sku for name in names for sku in SKUS[name]]
+    variant = np.where(serverless, 2, photon.astype(int))
+    sku = pa.array(sku_vocab).take(pa.array(product * 3 + variant))
+
+    is_serving = product == names.index('MODEL_SERVING')
+    is_database = product == names.index('DATABASE')
+    usage_type = np.where(is_serving & (rng.random(n) < 0.3), 1,
+                          np.where(is_database & (rng.random(n) < 0.5), 2, 0))
+
+    start_s = now - rng.integers(0, days * 86400, size=n)
+    start_s -= start_s % 3600
+    workspace = np.where(classic_cluster, clusters['workspace'][cluster],
+                         rng.integers(0, len(workspace_ids), size=n))
+    is_jobs = product == names.index('JOBS')
+    is_sql = product == names.index('SQL')
+    is_dlt = product == names.index('DLT')
+    job_id = rng.integers(0, max(cfg['clusters'] * 2, 1), size=n)
+
+    arrays = {
+        'record_id': _prefixed('rec-', np.arange(start, start + n)),
+        'account_id': pa.array([ACCOUNT_ID] * n),
+        'workspace_id': pa.array(workspace_ids).take(pa.array(workspace)),
+        'sku_name': sku,
+        'cloud': pa.array([CLOUD] * n),
+        'usage_start_time': _timestamps(start_s),
+        'usage_end_time': _timestamps(start_s + 3600),
+        'usage_date': _dates(start_s),
+        'custom_tags': _tag_map(rng, rng.random(n) < cfg['tag_adoption']),
+        'usage_unit': pa.array(['DBU', 'DBU', 'DSU']).take(pa.array(usage_type)),
+        'usage_quantity': pa.array(np.round(rng.lognormal(0.0, 1.2, size=n), 6)),
+        'usage_metadata': _struct(
+            cluster_id=_prefixed('0101-', cluster, mask=~classic_cluster),
+            job_id=_prefixed('', job_id, mask=~is_jobs),
+            warehouse_id=_prefixed('wh', rng.integers(0, 20, size=n), mask=~is_sql),
+            instance_pool_id=pa.nulls(n, pa.string()),
+            node_type=pa.nulls(n, pa.string()),
+            job_run_id=_prefixed('', job_id * 7 + 1, mask=~is_jobs),
+            notebook_id=pa.nulls(n, pa.string()),
+            dlt_pipeline_id=_prefixed('pipe-', rng.integers(0, 50, size=n), mask=~is_dlt),
+            endpoint_name=_prefixed('endpoint-', rng.integers(0, 15, size=n), mask=~is_serving),
+            endpoint_id=_prefixed('ep', rng.integers(0, 15, size=n), mask=~is_serving),
+        ),
+        'identity_metadata': _struct(
+            run_as=_prefixed('user', rng.integers(0, 500, size=n)),
+            owned_by=pa.nulls(n, pa.string()),
+            created_by=pa.nulls(n, pa.string()),
+        ),
+        'record_type': pa.array(['ORIGINAL'] * n),
+        'ingestion_date': _dates(start_s + 86400),
+        'billing_origin_product': pa.array(names).take(pa.array(product)),
+        'product_features': _struct(
+            jobs_tier=pa.array(['CLASSIC'] * n, mask=~is_jobs),
+            sql_tier=pa.array(np.where(serverless, 'SERVERLESS', 'PRO'), mask=~is_sql),
+            dlt_tier=pa.array(['ADVANCED'] * n, mask=~is_dlt),
+            is_serverless=pa.array(serverless),
+            is_photon=pa.array(photon),
+            serving_type=pa.array(['MODEL'] * n, mask=~is_serving),
+            performance_target=pa.array(
+                np.where(rng.random(n) < 0.5, 'PERFORMANCE_OPTIMIZED', 'COST_OPTIMIZED'),
+                mask=~(serverless & (is_jobs | is_dlt))),
+        ),
+        'usage_type': pa.array(['COMPUTE_TIME', 'GPU_TIME', 'STORAGE_SPACE']).take(pa.array(usage_type)),
+    }
+    stats = {
+        'rows': n,
+        'serverless_rows': int(serverless.sum()),
+        'photon_rows': int(photon.sum()),
+    }
+    return arrays, stats
+
+
+def generate_query_history_chunk(rng, cfg, now, workspace_ids, start, n):
+    """n rows of system.query.history (statement ids from start)."""
+    days = min(cfg['days'], 90)
+    start_s = now - rng.integers(0, days * 86400, size=n)
+    execution_ms = rng.lognormal(7.0, 1.5, size=n).astype(np.int64)
+    waiting_ms = np.where(rng.random(n) < 0.1, rng.lognormal(8.0, 1.0, size=n), 0).astype(np.int64)
+    compile_ms = rng.integers(5, 500, size=n)
+    total_ms = execution_ms + waiting_ms + compile_ms
+    on_warehouse = rng.random(n) < cfg['warehouse_share']
+    return {
+        'account_id': pa.array([ACCOUNT_ID] * n),
+        'workspace_id': pa.array(workspace_ids).take(pa.array(rng.integers(0, len(workspace_ids), size=n))),
+        'statement_id': _prefixed('stmt-', np.arange(start, start + n)),
+        'executed_by': _prefixed('user', rng.integers(0, 500, size=n)),
+        'session_id': _prefixed('sess-', rng.integers(0, max(n // 20, 1), size=n)),
+        'execution_status': _pick(rng, ['FINISHED', 'FAILED', 'CANCELED'], n, p=[0.93, 0.05, 0.02]),
+        'compute': _struct(
+            type=pa.array(np.where(on_warehouse, 'WAREHOUSE', 'SERVERLESS_COMPUTE')),
+            cluster_id=pa.nulls(n, pa.string()),
+            warehouse_id=_prefixed('wh', rng.integers(0, 20, size=n), mask=~on_warehouse),
+        ),
+        'executed_by_user_id': _prefixed('', rng.integers(0, 500, size=n)),
+        'statement_text': _pick(rng, STATEMENT_TEXTS, n),
+        'statement_type': _pick(rng, STATEMENT_TYPES, n),
+        'error_message': pa.nulls(n, pa.string()),
+        'client_application': _pick(rng, ['Databricks SQL Editor', 'Notebook', 'Dashboards', 'JDBC'], n),
+        'total_duration_ms': pa.array(total_ms),
+        'waiting_for_compute_duration_ms': pa.array(np.zeros(n, dtype=np.int64)),
+        'waiting_at_capacity_duration_ms': pa.array(waiting_ms),
+        'execution_duration_ms': pa.array(execution_ms),
+        'compilation_duration_ms': pa.array(compile_ms),
+        'total_task_duration_ms': pa.array(execution_ms * rng.integers(1, 8, size=n)),
+        'result_fetch_duration_ms': pa.array(rng.integers(0, 200, size=n)),
+        'start_time': _timestamps(start_s),
+        'end_time': _timestamps(start_s + total_ms // 1000),
+        'update_time': _timestamps(start_s + total_ms // 1000),
+        'read_partitions': pa.array(rng.integers(0, 200, size=n)),
+        'pruned_files': pa.array(rng.integers(0, 1000, size=n)),
+        'read_files': pa.array(rng.integers(0, 1000, size=n)),
+        'read_rows': pa.array(rng.lognormal(10, 3, size=n).astype(np.int64)),
+        'produced_rows': pa.array(rng.lognormal(4, 3, size=n).astype(np.int64)),
+        'read_bytes': pa.array(rng.lognormal(16, 3, size=n).astype(np.int64)),
+        'read_io_cache_percent': pa.array(rng.integers(0, 101, size=n)),
+        'from_result_cache': pa.array(rng.random(n) < 0.15),
+        'spilled_local_bytes': pa.array(np.where(rng.random(n) < 0.03,
+                                                 rng.lognormal(20, 2, size=n), 0).astype(np.int64)),
+        'written_bytes': pa.array(rng.lognormal(12, 3, size=n).astype(np.int64)),
+        'shuffle_read_bytes': pa.array(rng.lognormal(14, 3, size=n).astype(np.int64)),
+    }
+
+
+def _table_names(n):
+    """(catalog, schema, name) index arrays for n tables: 5 catalogs, 40 schemas each."""
+    idx = np.arange(n)
+    return idx % 5, (idx // 5) % 40, idx
+
+
+def generate_tables(rng, cfg, now):
+    """
+    system.information_schema.tables: user tables across 5 catalogs, plus the
+    system / monitoring tables the governance queries probe for.
+    """
+    n = cfg['tables']
+    catalog, schema, name = _table_names(n)
+    monitored = rng.random(n) < cfg['monitoring']
+    kinds = ['MANAGED', 'EXTERNAL', 'VIEW', 'FOREIGN']
+    table_type = rng.choice(len(kinds), size=n, p=[0.7, 0.15, 0.12, 0.03])
+    created = now - rng.integers(86400, cfg['days'] * 86400 * 2, size=n)
+    altered = np.minimum(created + rng.integers(0, cfg['days'] * 86400, size=n), now)
+
+    extra = {'profile': np.flatnonzero(monitored), 'drift': np.flatnonzero(monitored)}
+    rows = n + len(extra['profile']) + len(extra['drift']) + 1
+    catalogs = pa.array([f"catalog_{i}" for i in range(5)])
+    names = pa.concat_arrays([
+        _prefixed('tbl_', name),
+        _prefixed('tbl_', extra['profile']).cast(pa.string()),
+        _prefixed('tbl_', extra['drift']).cast(pa.string()),
+        pa.array(['listing_access_events']),
+    ])
+    names = pc.binary_join_element_wise(
+        names,
+        pa.array([''] * n + ['_profile_metrics'] * len(extra['profile'])
+                 + ['_drift_metrics'] * len(extra['drift']) + ['']),
+        '')
+    all_catalog = np.concatenate([catalog, catalog[extra['profile']], catalog[extra['drift']], [0]])
+    all_schema = np.concatenate([schema, schema[extra['profile']], schema[extra['drift']], [0]])
+    all_type = np.concatenate([table_type, np.zeros(rows - n, dtype=int)])
+    all_created = np.concatenate([created, created[extra['profile']], created[extra['drift']], [now]])
+    all_altered = np.concatenate([altered, altered[extra['profile']], altered[extra['drift']], [now]])
+    system_row = np.zeros(rows, dtype=bool)
+    system_row[-1] = True
+
+    fmt = rng.choice(len(TABLE_FORMATS), size=rows)
+    fmt = np.where(all_type == 2, -1, fmt)  # views have no format
+    return {
+        'table_catalog': pc.if_else(pa.array(system_row), 'system', catalogs.take(pa.array(all_catalog))),
+        'table_schema': pc.if_else(pa.array(system_row), 'marketplace', _prefixed('schema_', all_schema)),
+        'table_name': names,
+        'table_type': pa.array(kinds).take(pa.array(all_type)),
+        'is_insertable_into': pa.array(np.where(all_type < 2, 'YES', 'NO')),
+        'commit_action': pa.nulls(rows, pa.string()),
+        'table_owner': _prefixed('user', rng.integers(0, 500, size=rows)),
+        'comment': _pick(rng, ['Curated table', 'Raw ingest', 'Feature table'], rows,
+                         mask=rng.random(rows) >= cfg['comment_share']),
+        'created': _timestamps(all_created),
+        'created_by': _prefixed('user', rng.integers(0, 500, size=rows)),
+        'last_altered': _timestamps(all_altered),
+        'last_altered_by': _prefixed('user', rng.integers(0, 500, size=rows)),
+        'data_source_format': pa.array(TABLE_FORMATS).take(pa.array(fmt, mask=fmt < 0)),
+        'storage_sub_directory': pa.nulls(rows, pa.string()),
+    }, {'tables': rows, 'monitored_tables': int(monitored.sum())}
+
+
+def generate_lineage_chunk(rng, cfg, now, workspace_ids, n):
+    """n rows of system.access.table_lineage between tables of information_schema.tables."""
+    tables = cfg['tables']
+    # Zipf-like popularity: a few tables are read most of the time
+    source = np.minimum(rng.zipf(1.3, size=n) - 1, tables - 1)
+    source = rng.permutation(tables)[source] if tables else source
+    target = rng.integers(0, max(tables, 1), size=n)
+    has_target = rng.random(n) < 0.4
+    s_cat, s_sch, s_name = _table_names(tables)
+    start_s = now - rng.integers(0, cfg['days'] * 86400, size=n)
+
+    def _full(idx, mask=None):
+        cat = pc.binary_join_element_wise('catalog_', pc.cast(pa.array(s_cat[idx]), pa.string()), '')
+        sch = _prefixed('schema_', s_sch[idx])
+        name = _prefixed('tbl_', s_name[idx])
+        full = pc.binary_join_element_wise(cat, sch, name, '.')
+        parts = (cat, sch, name, full)
+        if mask is not None:
+            nulls = pa.array(mask)
+            parts = tuple(pc.if_else(nulls, pa.nulls(n, pa.string()), p) for p in parts)
+        return parts
+
+    src_cat, src_sch, src_name, src_full = _full(source)
+    tgt_cat, tgt_sch, tgt_name, tgt_full = _full(target, mask=~has_target)
+    return {
+        'account_id': pa.array([ACCOUNT_ID] * n),
+        'metastore_id': pa.array(['metastore-1'] * n),
+        'workspace_id': pa.array(workspace_ids).take(pa.array(rng.integers(0, len(workspace_ids), size=n))),
+        'entity_type': _pick(rng, ['NOTEBOOK', 'JOB', 'PIPELINE', 'DBSQL_QUERY'], n),
+        'entity_id': _prefixed('', rng.integers(0, 100_000, size=n)),
+        'entity_run_id': _prefixed('', rng.integers(0, 1_000_000, size=n)),
+        'source_table_full_name': src_full,
+        'source_table_catalog': src_cat,
+        'source_table_schema': src_sch,
+        'source_table_name': src_name,
+        'source_path': pa.nulls(n, pa.string()),
+        'source_type': _pick(rng, ['TABLE', 'STREAMING_TABLE', 'VIEW', 'PATH'], n, p=[0.8, 0.05, 0.1, 0.05]),
+        'target_table_full_name': tgt_full,
+        'target_table_catalog': tgt_cat,
+        'target_table_schema': tgt_sch,
+        'target_table_name': tgt_name,
+        'target_path': pa.nulls(n, pa.string()),
+        'target_type': pa.array(['TABLE'] * n, mask=~has_target),
+        'created_by': _prefixed('user', rng.integers(0, 500, size=n)),
+        'event_time': _timestamps(start_s),
+        'event_date': _dates(start_s),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def generate(out_dir, cfg, log=print):
+    """Write every snapshot table under out_dir and return the manifest dict."""
+    as_of = datetime.strptime(cfg['as_of'], '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    now = int(as_of.timestamp()) + 86399  # end of the as-of day
+    seed = cfg['seed']
+    workspace_ids = [str(1_000_000_000_000_000 + i * 7919) for i in range(cfg['workspaces'])]
+    manifest = {'settings': cfg, 'tables': {}, 'stats': {}}
+
+    for table in ('billing/usage', 'compute/clusters', 'query/history',
+                  'access/table_lineage', 'information_schema/tables'):
+        shutil.rmtree(os.path.join(out_dir, 'system', table), ignore_errors=True)
+
+    arrays, clusters = generate_clusters(np.random.default_rng([seed, 1]), cfg, now, workspace_ids)
+    _write(out_dir, 'compute', 'clusters', 0, arrays)
+    manifest['tables']['system.compute.clusters'] = len(arrays['cluster_id'])
+    manifest['stats']['clusters'] = clusters['stats']
+    log(f"  ✓ system.compute.clusters: {len(arrays['cluster_id']):,} rows ({cfg['clusters']:,} clusters)")
+
+    arrays, stats = generate_tables(np.random.default_rng([seed, 2]), cfg, now)
+    _write(out_dir, 'information_schema', 'tables', 0, arrays)
+    manifest['tables']['system.information_schema.tables'] = stats['tables']
+    manifest['stats']['tables'] = stats
+    log(f"  ✓ system.information_schema.tables: {stats['tables']:,} rows")
+
+    usage = {'rows': 0, 'serverless_rows': 0, 'photon_rows': 0}
+    for part, (start, n) in enumerate(_chunks(cfg['usage_rows'], cfg['chunk_rows'])):
+        rng = np.random.default_rng([seed, 3, part])
+        arrays, stats = generate_usage_chunk(rng, cfg, now, workspace_ids, clusters, start, n)
+        _write(out_dir, 'billing', 'usage', part, arrays)
+        for k in usage:
+            usage[k] += stats[k]
+    manifest['tables']['system.billing.usage'] = usage['rows']
+    manifest['stats']['usage'] = dict(usage, serverless_share=round(usage['serverless_rows'] / max(usage['rows'], 1), 4),
+                                      photon_share=round(usage['photon_rows'] / max(usage['rows'], 1), 4))
+    log(f"  ✓ system.billing.usage: {usage['rows']:,} rows")
+
+    for part, (start, n) in enumerate(_chunks(cfg['query_rows'], cfg['chunk_rows'])):
+        rng = np.random.default_rng([seed, 4, part])
+        _write(out_dir, 'query', 'history', part,
+               generate_query_history_chunk(rng, cfg, now, workspace_ids, start, n))
+    manifest['tables']['system.query.history'] = cfg['query_rows']
+    log(f"  ✓ system.query.history: {cfg['query_rows']:,} rows")
+
+    for part, (_, n) in enumerate(_chunks(cfg['lineage_rows'], cfg['chunk_rows'])):
+        rng = np.random.default_rng([seed, 5, part])
+        _write(out_dir, 'access', 'table_lineage', part,
+               generate_lineage_chunk(rng, cfg, now, workspace_ids, n))
+    manifest['tables']['system.access.table_lineage'] = cfg['lineage_rows']
+    log(f"  ✓ system.access.table_lineage: {cfg['lineage_rows']:,} rows")
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic system-table Parquet snapshots')
+    parser.add_argument('--out', required=True, help='Snapshot directory (reload_local.py layout)')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                        help='Preset sizes (default small); the options below override them')
+    for name in ('workspaces', 'clusters', 'usage_rows', 'query_rows', 'lineage_rows', 'tables'):
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name)
+    parser.add_argument('--days', type=int, default=400, help='History length in days (default 400)')
+    parser.add_argument('--as-of', default=date.today().isoformat(), help='Last day of data (default today)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--photon', type=float, default=0.4)
+    parser.add_argument('--serverless', type=float, default=0.3)
+    parser.add_argument('--autoscaling', type=float, default=0.6)
+    parser.add_argument('--tag-adoption', type=float, default=0.5)
+    parser.add_argument('--policy', type=float, default=0.5)
+    parser.add_argument('--warehouse-share', type=float, default=0.7,
+                        help='Share of query.history statements run on SQL warehouses (default 0.7)')
+    parser.add_argument('--monitoring', type=float, default=0.02,
+                        help='Share of tables with Lakehouse Monitoring metric tables (default 0.02)')
+    parser.add_argument('--comment-share', type=float, default=0.4,
+                        help='Share of tables with a comment (default 0.4)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f'Rows per Parquet part (default {DEFAULT_CHUNK_ROWS:,})')
+    args = parser.parse_args()
+
+    cfg = dict(SCALES[args.scale])
+    for name in list(cfg):
+        if getattr(args, name) is not None:
+            cfg[name] = getattr(args, name)
+    cfg.update(days=args.days, as_of=args.as_of, seed=args.seed, photon=args.photon,
+               serverless=args.serverless, autoscaling=args.autoscaling,
+               tag_adoption=args.tag_adoption, policy=args.policy,
+               warehouse_share=args.warehouse_share, monitoring=args.monitoring,
+               comment_share=args.comment_share, chunk_rows=max(1, args.chunk_rows))
+    for name in ('photon', 'serverless', 'autoscaling', 'tag_adoption', 'policy',
+                 'warehouse_share', 'monitoring', 'comment_share'):
+        if not 0.0 <= cfg[name] <= 1.0:
+            print(f"ERROR: --{name.replace('_', '-')} must be between 0 and 1")
+            sys.exit(1)
+
+    print(f"Generating {args.scale} snapshots into {args.out} (as of {cfg['as_of']}, seed {cfg['seed']})...")
+    manifest = generate(args.out, cfg)
+    print(f"\nDone: {sum(manifest['tables'].values()):,} rows in {len(manifest['tables'])} tables "
+          f"(manifest.json has the realized shares)")
+
+
+if __name__ == '__main__':
+    main()
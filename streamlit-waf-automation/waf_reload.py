@@ -2,37 +2,85 @@
 # COMMAND ----------
 
 # WAF Reload — Databricks Job notebook
-# Uses spark.sql() + ThreadPoolExecutor for parallel execution.
+# Uses spark.sql() + the dependency-aware scheduler in reload_scheduler.py
+# for parallel execution (depends_on in dashboard_queries.yaml).
 # No subprocess, no JDBC — runs natively on the job cluster.
 
-import os, re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os, re, sys
 from datetime import datetime, timedelta
 
 import yaml
 
 ctx = dbutils.notebook.entry_point.getDbutils().notebook().getContext()
 dbutils.widgets.text("catalog", "main")
+dbutils.widgets.text("staging", "true")
+dbutils.widgets.text("fingerprint", "true")
+dbutils.widgets.text("keep_runs", "30")
+dbutils.widgets.text("keep_daily_days", "90")
+dbutils.widgets.text("maintenance_every", "1")
+dbutils.widgets.text("backend", "databricks")
+dbutils.widgets.text("snapshot_dir", "")
 catalog = dbutils.widgets.get("catalog").strip() or "main"
+staging = dbutils.widgets.get("staging").strip().lower() != "false"
+fingerprint = dbutils.widgets.get("fingerprint").strip().lower() != "false"
+keep_runs         = int(dbutils.widgets.get("keep_runs") or 30)
+keep_daily_days   = int(dbutils.widgets.get("keep_daily_days") or 90)
+maintenance_every = int(dbutils.widgets.get("maintenance_every") or 1)
+backend           = dbutils.widgets.get("backend").strip().lower() or "databricks"
+snapshot_dir      = dbutils.widgets.get("snapshot_dir").strip()
 
 # dashboard_queries.yaml lives next to this notebook in the workspace
 _nb_path   = ctx.notebookPath().get()           # e.g. /Users/.../wafauto-20260219-0317/waf_reload
 _ws_dir    = "/Workspace" + "/".join(_nb_path.split("/")[:-1])
 yaml_path  = _ws_dir + "/dashboard_queries.yaml"
 
+# reload_scheduler.py is uploaded alongside this notebook
+if _ws_dir not in sys.path:
+    sys.path.append(_ws_dir)
+import reload_fingerprint
+import reload_log
+from reload_maintenance import (
+    clustered_ensure_statement, clustered_record_statement, clustered_tables_statement,
+    format_stats, list_tables_statement, log_statements, maintain_table,
+    plan_retention, runs_statement, table_actions,
+)
+from reload_registry import RegistryError, compile_registry
+from reload_rollups import plan_rollups, refresh_rollup
+from reload_scheduler import SKIPPED, SUCCESS, critical_path, run_dag
+from reload_staging import plan_stages, rewrite_sql, stage_statement
+
+# backend=local: run every statement on DuckDB over the Parquet snapshots in
+# snapshot_dir instead of Spark, for deterministic offline runs (reload_local.py)
+_local = backend == "local"
+if _local:
+    import reload_local
+    if not snapshot_dir:
+        raise ValueError("backend=local needs the snapshot_dir widget")
+    spark = reload_local.LocalSpark(snapshot_dir, catalog)
+
 print("WAF Reload starting")
 print(f"  Catalog  : {catalog}")
 print(f"  YAML     : {yaml_path}")
+if _local:
+    print(f"  Backend  : local (DuckDB over {snapshot_dir})")
 
 # COMMAND ----------
 
 with open(yaml_path, "r", encoding="utf-8") as _f:
     _config = yaml.safe_load(_f)
 
+# Compile into the execution plan (see reload_registry.py): coming-soon and
+# retired datasets dropped, duplicates merged, conflicts fail before any query runs.
 _datasets = _config.get("datasets", [])
-active    = [d for d in _datasets if not d.get("is_coming_soon")]
+_plan     = compile_registry(_config)
+active    = _plan["datasets"]
 
-print(f"  Datasets : {len(active)} active / {len(_datasets)} total")
+print(f"  Datasets : {len(active)} to run / {len(_datasets)} total ({len(_plan['skipped'])} skipped)")
+if _plan["warnings"]:
+    print(f"  ⚠️  {len(_plan['warnings'])} registry warning(s); run reload_registry.py for details")
+if _plan["errors"]:
+    raise RegistryError(_plan["errors"])
+print(f"  Critical path: {' → '.join(critical_path(active))}")
 
 # COMMAND ----------
 
@@ -48,6 +96,31 @@ spark.sql(f"""
         tables_failed    INT
     ) USING DELTA
 """)
+# Single-row pointer the latest-run views read; moved when a run finishes.
+# Seeded from _run_log on first use so existing views keep their data.
+spark.sql(f"""
+    CREATE TABLE IF NOT EXISTS `{catalog}`.`waf_cache`.`_latest_run` (
+        run_id      INT,
+        finished_at TIMESTAMP
+    ) USING DELTA
+""")
+spark.sql(f"""
+    INSERT INTO `{catalog}`.`waf_cache`.`_latest_run`
+    SELECT run_id, finished_at FROM `{catalog}`.`waf_cache`.`_run_log`
+    WHERE status IN ('success', 'partial')
+      AND NOT EXISTS (SELECT 1 FROM `{catalog}`.`waf_cache`.`_latest_run`)
+    ORDER BY run_id DESC LIMIT 1
+""")
+
+# Which run holds each table's rows when a result was unchanged (reload_fingerprint.py)
+spark.sql(reload_fingerprint.ensure_statement(catalog))
+
+# _hist tables already clustered by _run_id, so each is only checked once
+spark.sql(clustered_ensure_statement(catalog))
+try:
+    _clustered = {r["table_name"] for r in spark.sql(clustered_tables_statement(catalog)).collect()}
+except Exception:
+    _clustered = set()
 
 _run_id_row = spark.sql(
     f"SELECT COALESCE(MAX(run_id), 0) + 1 FROM `{catalog}`.`waf_cache`.`_run_log`"
@@ -69,6 +142,7 @@ def _sub_dates(sql: str) -> str:
     sql = sql.replace(":date_range_start", f"'{(now - timedelta(days=30)).strftime('%Y-%m-%d')}'")
     sql = sql.replace(":date_range_end",   f"'{now.strftime('%Y-%m-%d')}'")
     sql = sql.replace(":rollback_days",    "30")
+    sql = sql.replace(":catalog",          f"`{catalog}`")
     return sql.rstrip().rstrip(";")
 
 def _safe_col(name: str) -> str:
@@ -76,112 +150,260 @@ def _safe_col(name: str) -> str:
     c = re.sub(r"_+", "_", c).strip("_")
     return ("col_" + c if (not c or c[0].isdigit()) else c) or "col"
 
+def _latest_view(table: str):
+    """
+    Point {table} at the latest successful (or partial) run in {table}_hist.
+    The run comes from the single-row _latest_run pointer, or the older run
+    _fingerprints says holds its unchanged rows, so the filter is a constant
+    by the time the scan starts and prunes to that run's files.
+    """
+    spark.sql(f"""
+        CREATE OR REPLACE VIEW `{catalog}`.`waf_cache`.`{table}` AS
+        SELECT * FROM `{catalog}`.`waf_cache`.`{table}_hist`
+        WHERE _run_id = {reload_fingerprint.data_run_subquery(catalog, table)}
+    """)
+
+def _append_local(table: str, sql: str):
+    """Local backend: append this run's rows with SQL, creating {table}_hist on first use."""
+    _hist    = f"`{catalog}`.`waf_cache`.`{table}_hist`"
+    _wrapped = (f"SELECT _q.*, {run_id} AS _run_id, TIMESTAMP('{triggered_at}') AS _run_started_at "
+                f"FROM (\n{sql}\n) AS _q")
+    try:
+        spark.sql(f"INSERT INTO {_hist}\n{_wrapped}")
+    except Exception as exc:
+        if "TABLE_OR_VIEW_NOT_FOUND" not in str(exc):
+            raise
+        spark.sql(f"CREATE TABLE {_hist} CLUSTER BY (_run_id) AS\n{_wrapped}")
+
+def _cluster_hist(table: str):
+    """Cluster {table}_hist by _run_id once (tables created before clustering); skips tables in _clustered."""
+    if table in _clustered:
+        return
+    _hist = f"`{catalog}`.`waf_cache`.`{table}_hist`"
+    _detail = spark.sql(f"DESCRIBE DETAIL {_hist}").collect()[0].asDict()
+    if list(_detail.get("clusteringColumns") or []) != ["_run_id"]:
+        spark.sql(f"ALTER TABLE {_hist} CLUSTER BY (_run_id)")
+    spark.sql(clustered_record_statement(catalog, table))
+    _clustered.add(table)
+
+_ds_info = {}  # id(ds) → timing / write metrics for _dataset_log
+
+# Set before the run: tables that are fingerprinted, and each one's last _fingerprints row
+_fp_tables, _fp_previous = set(), {}
+
+def _fp_value(sql: str) -> str:
+    return spark.sql(sql).collect()[0]["fingerprint"]
+
+def _record_fingerprint(table: str, prev, fp=None) -> int:
+    """
+    Record the fingerprint of the rows this run appended to {table}_hist.
+    When they match the previous run, record a reference instead and delete
+    them again. Returns the run whose rows the view serves for this run.
+    """
+    if fp is None:
+        fp = _fp_value(reload_fingerprint.hist_fingerprint_sql(catalog, table, run_id))
+    if prev and fp == prev["fingerprint"]:
+        spark.sql(reload_fingerprint.record_statement(catalog, table, run_id, prev["data_run_id"], fp))
+        spark.sql(reload_fingerprint.delete_run_rows_statement(catalog, table, run_id))
+        return prev["data_run_id"]
+    spark.sql(reload_fingerprint.record_statement(catalog, table, run_id, run_id, fp))
+    return run_id
+
 def _run_one(ds: dict):
-    """Run one dataset query and append to its _hist table. Returns (table_name, ok, err)."""
+    """
+    Run one dataset query, append to its _hist table and create its view, so
+    dependents created later in the run can reference it (it serves this run's
+    rows once the run finishes). is_view datasets become plain views. Returns (ok, err); timings and write metrics go to _ds_info.
+    """
+    _t0  = datetime.utcnow()
+    info = _ds_info.setdefault(id(ds), {"started_at": _t0.strftime("%Y-%m-%d %H:%M:%S")})
+    try:
+        return _run_one_inner(ds, info)
+    finally:
+        _t1 = datetime.utcnow()
+        info["finished_at"]      = _t1.strftime("%Y-%m-%d %H:%M:%S")
+        info["duration_seconds"] = (_t1 - _t0).total_seconds()
+
+def _run_one_inner(ds: dict, info: dict):
     table = ds["table_name"]
-    label = ds.get("display_name", table)
     sql   = _sub_dates(ds.get("sql", ""))
     if not sql:
-        return table, False, "no sql"
+        return False, "no sql"
     try:
-        from pyspark.sql.functions import lit, to_timestamp
-        df = spark.sql(sql)
-        # Sanitize column names (special chars → underscores)
-        renamed = [_safe_col(c) for c in df.columns]
-        for old, new in zip(df.columns, renamed):
-            if old != new:
-                df = df.withColumnRenamed(old, new)
-        df = (df
-              .withColumn("_run_id",         lit(run_id))
-              .withColumn("_run_started_at", to_timestamp(lit(triggered_at))))
-        (df.write
-           .mode("append")
-           .option("mergeSchema", "true")
-           .saveAsTable(f"`{catalog}`.`waf_cache`.`{table}_hist`"))
-        return table, True, None
+        if ds.get("is_view"):
+            spark.sql(f"CREATE OR REPLACE VIEW `{catalog}`.`waf_cache`.`{table}` AS\n{sql}")
+            return True, None
+        _prev, _fp = _fp_previous.get(table), None
+        if table in _fp_tables and reload_fingerprint.probe_first(_prev):
+            # Stable table: hash the result first and skip the write if unchanged
+            try:
+                _fp = _fp_value(reload_fingerprint.fingerprint_sql(sql))
+                if _fp == _prev["fingerprint"]:
+                    spark.sql(reload_fingerprint.record_statement(
+                        catalog, table, run_id, _prev["data_run_id"], _fp))
+                    info.update(reused_run_id=_prev["data_run_id"], rows_written=0, bytes_written=0)
+                    try:
+                        _latest_view(table)
+                    except Exception as ve:
+                        print(f"  ⚠️  View for {table}: {ve}")
+                    return True, None
+            except Exception:
+                _fp = None  # append as usual
+        if _local:
+            _append_local(table, sql)
+        else:
+            from pyspark.sql.functions import lit, to_timestamp
+            df = spark.sql(sql)
+            # Sanitize column names (special chars → underscores)
+            renamed = [_safe_col(c) for c in df.columns]
+            for old, new in zip(df.columns, renamed):
+                if old != new:
+                    df = df.withColumnRenamed(old, new)
+            df = (df
+                  .withColumn("_run_id",         lit(run_id))
+                  .withColumn("_run_started_at", to_timestamp(lit(triggered_at))))
+            (df.write
+               .mode("append")
+               .option("mergeSchema", "true")
+               .saveAsTable(f"`{catalog}`.`waf_cache`.`{table}_hist`"))
+        try:
+            _commit = spark.sql(reload_log.write_metrics_statement(catalog, f"{table}_hist")).collect()
+            if _commit:
+                info["rows_written"], info["bytes_written"] = reload_log.write_metrics(
+                    _commit[0]["operationMetrics"])
+        except Exception:
+            pass  # metrics are best effort
+        if table in _fp_tables:
+            try:
+                _served = _record_fingerprint(table, _prev, _fp)
+                if _served != run_id:
+                    info.update(reused_run_id=_served, rows_written=0, bytes_written=0)
+            except Exception as fe:
+                print(f"  ⚠️  Fingerprint for {table}: {fe}")
+        try:
+            _cluster_hist(table)
+        except Exception as ce:
+            print(f"  ⚠️  Clustering for {table}_hist: {ce}")
+        try:
+            _latest_view(table)
+        except Exception as ve:
+            print(f"  ⚠️  View for {table}: {ve}")
+        return True, None
     except Exception as exc:
-        return table, False, str(exc)[:400]
-
-# Run all datasets in parallel — 8 threads (Spark handles concurrency safely)
-print(f"\nRunning {len(active)} datasets in parallel (max 8 threads)...")
-succeeded, failed = [], []
-
-with ThreadPoolExecutor(max_workers=8) as pool:
-    futures = {pool.submit(_run_one, ds): ds["table_name"] for ds in active}
-    for fut in as_completed(futures):
-        table, ok, err = fut.result()
-        label = next((d.get("display_name", table) for d in active if d["table_name"] == table), table)
-        if ok:
-            succeeded.append(table)
-            print(f"  ✅ {label}")
+        return False, str(exc)[:400]
+
+def _on_done(i: int, status: str, err):
+    label = active[i].get("display_name", active[i]["table_name"])
+    if status == SUCCESS:
+        _reused = _ds_info.get(id(active[i]), {}).get("reused_run_id")
+        print(f"  ✅ {label}" + (f" (unchanged, reusing run #{_reused})" if _reused is not None else ""))
+    elif status == SKIPPED:
+        print(f"  ⏭️  {label}: {err}")
+    else:
+        print(f"  ❌ {label}: {err}")
+
+# COMMAND ----------
+
+# Incremental daily rollups: bring waf_cache._rollup_* (per-day billing and
+# node_timeline totals) up to date by recomputing only the trailing days
+# (see reload_rollups.py). A failed refresh keeps the previous contents.
+_rollups = plan_rollups([ds.get("sql", "") for ds in active])
+if _rollups:
+    print(f"\nRefreshing {len(_rollups)} daily rollup table(s)...")
+
+    def _fetch_value(sql: str):
+        _rows = spark.sql(sql).collect()
+        return _rows[0][0] if _rows else None
+
+    def _run_rollup(rollup: dict):
+        try:
+            return True, refresh_rollup(rollup, catalog, spark.sql, _fetch_value)
+        except Exception as exc:
+            return False, str(exc)[:400]
+
+    def _on_rollup_done(i: int, status: str, detail):
+        name = _rollups[i]["table_name"]
+        if status == SUCCESS:
+            print(f"  ✅ {name} ({detail})")
         else:
-            failed.append(table)
-            print(f"  ❌ {label}: {err}")
+            print(f"  ⚠️  {name} not refreshed, dependents read its previous contents: {detail}")
+
+    run_dag(_rollups, _run_rollup, max_workers=8, on_done=_on_rollup_done)
+
+# COMMAND ----------
+
+# Shared-scan staging: materialize the heavily shared system-table inputs once
+# into waf_cache._stage_* and point dataset SQL at them (see reload_staging.py).
+# A stage that fails just leaves its datasets reading the system tables.
+if staging:
+    _prepared = [_sub_dates(ds.get("sql", "")) for ds in active]
+    _stages   = plan_stages(_prepared, catalog)
+    if _stages:
+        print(f"\nStaging {len(_stages)} shared table(s)...")
+
+        def _run_stage(stage: dict):
+            try:
+                spark.sql(stage_statement(stage, catalog))
+                return True, None
+            except Exception as exc:
+                return False, str(exc)[:400]
+
+        def _on_stage_done(i: int, status: str, err):
+            name = _stages[i]["table_name"]
+            if status == SUCCESS:
+                print(f"  ✅ {name}")
+            else:
+                print(f"  ⚠️  {name} not staged, dependents read system tables: {err}")
+
+        _stage_outcome = run_dag(_stages, _run_stage, max_workers=8, on_done=_on_stage_done)
+        _built = {_stages[i]["table_name"] for i, (st, _) in enumerate(_stage_outcome) if st == SUCCESS}
+        _rewritten = [rewrite_sql(sql, catalog, _built) for sql in _prepared]
+        active = [dict(ds, sql=sql) if used else ds for ds, (sql, used) in zip(active, _rewritten)]
+        print(f"  {sum(1 for _, used in _rewritten if used)} dataset(s) read from staged tables")
 
 # COMMAND ----------
 
-# Create/replace views for succeeded tables — each view points to the latest successful run
-print(f"\nCreating views for {len(succeeded)} table(s)...")
-for table in succeeded:
+# Run datasets in dependency order — 8 threads (Spark handles concurrency safely).
+# Independent datasets run in parallel; dependents start as soon as their inputs
+# land, and anything downstream of a failure is skipped. Recent median durations
+# from _dataset_log weight the critical path, and unchanged results reuse the
+# previous run's rows (see reload_fingerprint.py).
+try:
+    _weights = {r["table_name"]: float(r["median_seconds"])
+                for r in spark.sql(reload_log.weights_statement(catalog)).collect()
+                if r["median_seconds"] is not None}
+except Exception:
+    _weights = {}  # no _dataset_log yet
+if fingerprint:
+    _fp_tables = reload_fingerprint.fingerprinted_tables(active)
     try:
-        spark.sql(f"""
-            CREATE OR REPLACE VIEW `{catalog}`.`waf_cache`.`{table}` AS
-            SELECT * FROM `{catalog}`.`waf_cache`.`{table}_hist`
-            WHERE _run_id = (
-                SELECT MAX(run_id)
-                FROM `{catalog}`.`waf_cache`.`_run_log`
-                WHERE status IN ('success', 'partial')
-            )
-        """)
-    except Exception as ve:
-        print(f"  ⚠️  View for {table}: {ve}")
+        _fp_previous = {r["table_name"]: r.asDict()
+                        for r in spark.sql(reload_fingerprint.previous_statement(catalog, run_id)).collect()}
+    except Exception:
+        _fp_previous = {}
+print(f"\nRunning {len(active)} datasets (max 8 threads, dependency-ordered)...")
+_outcome  = run_dag(active, _run_one, max_workers=8, on_done=_on_done, weights=_weights)
+succeeded = [active[i]["table_name"] for i, (st, _) in enumerate(_outcome) if st == SUCCESS]
+failed    = [active[i]["table_name"] for i, (st, _) in enumerate(_outcome) if st != SUCCESS]
 
 # COMMAND ----------
 
-# Create view: waf_recommendations_not_met (join controls with recommendations table, filter Not Met)
-# Depends on: waf_controls_g, waf_controls_c, waf_controls_p, waf_controls_r, waf_controls_with_recommendations
+# Per-dataset execution log (see reload_log.py) — timings, rows/bytes written
+# and errors, for the Reload Performance page and `reload_data.py --report`.
 try:
-    spark.sql(f"""
-        CREATE OR REPLACE VIEW `{catalog}`.`waf_cache`.`waf_recommendations_not_met` AS
-        SELECT
-            r.waf_id,
-            r.pillar_name,
-            r.principle,
-            r.best_practice,
-            r.capabilities,
-            r.details,
-            r.query_table_name,
-            r.threshold_percentage AS rec_threshold_pct,
-            r.metric_definition,
-            r.recommendation_if_not_met,
-            c.score_percentage,
-            c.threshold_percentage AS control_threshold_pct,
-            c.threshold_met
-        FROM (
-            SELECT waf_id, 'Data & AI Governance' AS pillar, principle,
-                   description AS best_practice,
-                   score_percentage, threshold_percentage, threshold_met
-            FROM `{catalog}`.`waf_cache`.`waf_controls_g`
-            UNION ALL
-            SELECT waf_id, 'Cost Optimization', principle, best_practice,
-                   score_percentage, threshold_percentage, threshold_met
-            FROM `{catalog}`.`waf_cache`.`waf_controls_c`
-            UNION ALL
-            SELECT waf_id, 'Performance Efficiency', principle, best_practice,
-                   score_percentage, threshold_percentage, threshold_met
-            FROM `{catalog}`.`waf_cache`.`waf_controls_p`
-            UNION ALL
-            SELECT waf_id, 'Reliability', principle, best_practice,
-                   score_percentage, threshold_percentage, threshold_met
-            FROM `{catalog}`.`waf_cache`.`waf_controls_r`
-        ) c
-        INNER JOIN `{catalog}`.`waf_cache`.`waf_controls_with_recommendations` r
-          ON r.waf_id = c.waf_id
-        WHERE c.threshold_met = 'Not Met'
-    """)
-    print("  ✅ View: waf_recommendations_not_met")
-except Exception as ve:
-    print(f"  ⚠️  View waf_recommendations_not_met: {ve}")
+    _entries = []
+    for _ds, (_st, _err) in zip(active, _outcome):
+        _info = _ds_info.get(id(_ds), {})
+        _entries.append(reload_log.entry(
+            run_id, _ds, _st, error=_err if _st != SUCCESS else None,
+            **{k: _info.get(k) for k in ("started_at", "finished_at", "duration_seconds",
+                                         "rows_written", "bytes_written")}
+        ))
+    spark.sql(reload_log.ensure_statement(catalog))
+    for _stmt in reload_log.insert_statements(catalog, _entries):
+        spark.sql(_stmt)
+except Exception as exc:
+    print(f"  ⚠️  Could not write _dataset_log: {str(exc)[:400]}")
 
 # COMMAND ----------
 
@@ -197,6 +419,62 @@ spark.sql(f"""
         tables_failed    = {len(failed)}
     WHERE run_id = {run_id}
 """)
+if _status != "failed":
+    # Atomically move every latest-run view to this run
+    spark.sql(f"""
+        INSERT OVERWRITE `{catalog}`.`waf_cache`.`_latest_run`
+        VALUES ({run_id}, TIMESTAMP('{_finished_at}'))
+    """)
+
+# COMMAND ----------
+
+# History retention + OPTIMIZE / VACUUM of every waf_cache table (see
+# reload_maintenance.py). Keeps the newest keep_runs runs plus one run per day
+# for keep_daily_days days; what was reclaimed goes to _maintenance_log.
+if maintenance_every > 0 and run_id % maintenance_every == 0:
+    try:
+        def _rows(sql: str):
+            return [r.asDict() for r in spark.sql(sql).collect()]
+
+        _tables  = [r["table_name"] for r in _rows(list_tables_statement(catalog))]
+        _runs    = [(r["run_id"], r["triggered_at"]) for r in _rows(runs_statement(catalog))]
+        _pointer = _rows(f"SELECT run_id FROM `{catalog}`.`waf_cache`.`_latest_run`")
+        _cutoff, _keep_older = plan_retention(_runs, keep_runs, keep_daily_days,
+                                              _pointer[0]["run_id"] if _pointer else None)
+        _targets = [{"table_name": t} for t in sorted(_tables) if table_actions(t)]
+        print(f"\nMaintaining {len(_targets)} waf_cache table(s)...")
+        _maint_results = []
+
+        def _maintain(target: dict):
+            _t0 = datetime.utcnow()
+            try:
+                _stats = maintain_table(catalog, target["table_name"], _rows, _cutoff, _keep_older)
+                return True, ((datetime.utcnow() - _t0).total_seconds(), _stats)
+            except Exception as exc:
+                return False, ((datetime.utcnow() - _t0).total_seconds(), str(exc)[:400])
+
+        def _on_maintained(i: int, status: str, detail):
+            name = _targets[i]["table_name"]
+            _elapsed, _info = detail
+            if status == SUCCESS:
+                _maint_results.append((name, _info, _elapsed, None))
+                if _info["rows_deleted"] or _info["files_after"] != _info["files_before"]:
+                    print(f"  ✅ {name}: {format_stats(_info)}")
+            else:
+                _maint_results.append((name, None, _elapsed, _info))
+                print(f"  ⚠️  {name}: {_info}")
+
+        run_dag(_targets, _maintain, max_workers=8, on_done=_on_maintained)
+        _ok = [st for _, st, _, _ in _maint_results if st]
+        print(f"  {len(_ok)}/{len(_targets)} table(s) maintained: "
+              f"{sum(st['rows_deleted'] for st in _ok)} row(s) deleted, "
+              f"{sum(st['bytes_before'] - st['bytes_after'] for st in _ok) / (1024 * 1024):.1f} MB reclaimed")
+        for _stmt in log_statements(catalog, run_id, _maint_results):
+            spark.sql(_stmt)
+    except Exception as exc:
+        print(f"  ⚠️  Maintenance skipped: {str(exc)[:400]}")
+
+# COMMAND ----------
 
 print(f"\n✅ Run {run_id} complete: {len(succeeded)} succeeded, {len(failed)} failed → {_status}")
 if failed:
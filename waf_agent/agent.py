@@ -10,8 +10,14 @@ import logging
 from typing import List, Dict, Any, Optional
 from databricks.sdk import WorkspaceClient
 
+from waf_core import tracing
+from waf_core.metrics import MODEL_CALLS
 from waf_core.databricks_client import DatabricksClient
-from waf_core.queries import get_all_scores, get_metric_by_id
+from waf_core.queries import get_all_scores, get_metric_by_id, get_latest_run_id
+from waf_core.scheduler import WarehouseSaturated
+
+from .cache import ResponseCache, get_default_cache
+from .tools import TOOL_SPECS, WAFToolExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +28,9 @@ class WAFRecommendationAgent:
     def __init__(
         self,
         workspace_client: Optional[WorkspaceClient] = None,
-        warehouse_id: Optional[str] = None
+        warehouse_id: Optional[str] = None,
+        response_cache: Optional[ResponseCache] = None,
+        tool_mode: Optional[bool] = None
     ):
         """
         Initialize the WAF Recommendation Agent
@@ -30,6 +38,9 @@ class WAFRecommendationAgent:
         Args:
             workspace_client: Databricks WorkspaceClient (uses default if None)
             warehouse_id: SQL Warehouse ID (required for querying scores)
+            response_cache: Response cache (uses the process-wide cache from env if None)
+            tool_mode: Let the model fetch data through tools instead of loading the
+                full assessment up front (defaults to WAF_AGENT_TOOL_MODE env var)
         """
         self.w = workspace_client or WorkspaceClient()
         self.warehouse_id = warehouse_id or os.getenv("DATABRICKS_WAREHOUSE_ID", "")
@@ -45,6 +56,14 @@ class WAFRecommendationAgent:
         # Claude model endpoint (Databricks Foundation Model API)
         self.model_name = os.getenv("DATABRICKS_FOUNDATION_MODEL", "databricks-meta-llama-3-1-70b-instruct")
         self.endpoint_name = os.getenv("DATABRICKS_ENDPOINT_NAME", None)
+        
+        # Shared across agent instances so per-request agents (REST API) still hit it
+        self.response_cache = response_cache or get_default_cache()
+        
+        if tool_mode is None:
+            tool_mode = os.getenv("WAF_AGENT_TOOL_MODE", "false").lower() in ("1", "true", "yes")
+        self.tool_mode = tool_mode
+        self.max_tool_rounds = int(os.getenv("WAF_AGENT_MAX_TOOL_ROUNDS", "5"))
     
     def get_waf_context(self) -> Dict[str, Any]:
         """Get current WAF scores and failing metrics as context"""
@@ -88,6 +107,9 @@ class WAFRecommendationAgent:
                 "failing_metrics": failing_metrics[:10],  # Top 10 failing metrics
                 "total_failing": len(failing_metrics)
             }
+        except WarehouseSaturated:
+            # Let the caller answer 503 + Retry-After instead of an error string
+            raise
         except Exception as e:
             logger.error(f"Error getting WAF context: {e}", exc_info=True)
             return {"error": str(e)}
@@ -120,30 +142,25 @@ class WAFRecommendationAgent:
             logger.warning(f"Vector Search not available: {e}")
             return []
     
-    def generate_recommendation(
+    def build_messages(
         self,
         user_question: str,
+        waf_context: Dict[str, Any],
         conversation_history: Optional[List[Dict[str, str]]] = None
-    ) -> str:
+    ) -> List[Dict[str, str]]:
         """
-        Generate recommendation using Claude via Databricks Foundation Model API
+        Assemble the chat messages for the full-context mode
         
         Args:
             user_question: User's question about WAF scores
+            waf_context: Context from get_waf_context()
             conversation_history: Previous conversation messages
             
         Returns:
-            Agent's response with recommendations
+            Chat-completion messages (system prompt, history, user prompt with context)
         """
-        try:
-            # Get current WAF context
-            waf_context = self.get_waf_context()
-            
-            if "error" in waf_context:
-                return f"I encountered an error retrieving WAF scores: {waf_context['error']}"
-            
-            # Build system prompt
-            system_prompt = """You are a Databricks Well-Architected Framework (WAF) expert assistant. 
+        # Build system prompt
+        system_prompt = """You are a Databricks Well-Architected Framework (WAF) expert assistant. 
 Your role is to:
 1. Analyze WAF assessment scores and identify issues
 2. Provide actionable recommendations to improve scores
@@ -152,24 +169,81 @@ Your role is to:
 
 Be concise, practical, and provide specific, actionable advice with code examples when relevant."""
 
-            # Build user prompt with context
-            context_str = json.dumps(waf_context, indent=2)
-            user_prompt = f"""Current WAF Assessment Context:
+        # Build user prompt with context
+        context_str = json.dumps(waf_context, indent=2)
+        user_prompt = f"""Current WAF Assessment Context:
 {context_str}
 
 User Question: {user_question}
 
 Please provide a helpful response based on the WAF scores above. If the user is asking about specific metrics or pillars, reference the actual scores and provide concrete recommendations."""
 
-            # Build messages for chat completion
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
+        # Build messages for chat completion
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        
+        # Add conversation history if provided
+        if conversation_history:
+            messages = [{"role": "system", "content": system_prompt}] + conversation_history + [{"role": "user", "content": user_prompt}]
+        return messages
+    
+    @tracing.traced("waf.agent.recommendation")
+    def generate_recommendation(
+        self,
+        user_question: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> str:
+        """
+        Generate recommendation using Claude via Databricks Foundation Model API
+        
+        Args:
+            user_question: User's question about WAF scores
+            conversation_history: Previous conversation messages
+            
+        Returns:
+            Agent's response with recommendations
+            
+        Raises:
+            WarehouseSaturated: If admission control refused the score lookups
+        """
+        if self.tool_mode:
+            try:
+                return self.generate_recommendation_with_tools(user_question, conversation_history)
+            except WarehouseSaturated:
+                # The full-context fallback would load every pillar from the same saturated warehouse
+                raise
+            except Exception as e:
+                logger.warning(f"Tool-calling mode failed ({e}), falling back to full context")
+        
+        try:
+            # Same question against the same run's data -> skip the pillar queries and the model call
+            cache_key = None
+            run_id = get_latest_run_id(self.waf_client) if self.response_cache else None
+            if run_id is not None:
+                self.response_cache.check_run(run_id)
+                cache_key = self._run_cache_key("context", run_id, user_question, conversation_history)
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Response cache hit")
+                    return cached
+            
+            # Get current WAF context
+            waf_context = self.get_waf_context()
             
-            # Add conversation history if provided
-            if conversation_history:
-                messages = [{"role": "system", "content": system_prompt}] + conversation_history + [{"role": "user", "content": user_prompt}]
+            if "error" in waf_context:
+                return f"I encountered an error retrieving WAF scores: {waf_context['error']}"
+            
+            if self.response_cache and cache_key is None:
+                # No run_id to key on: fingerprint the context instead (saves the model call only)
+                cache_key = self.response_cache.make_key(user_question, waf_context, conversation_history)
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Response cache hit")
+                    return cached
+            
+            messages = self.build_messages(user_question, waf_context, conversation_history)
             
             # Call Databricks Foundation Model API (Claude)
             # Use the serving endpoint or model serving
@@ -177,10 +251,15 @@ Please provide a helpful response based on the WAF scores above. If the user is
                 # Try to use Foundation Model serving endpoint
                 if self.endpoint_name:
                     # Use endpoint-based serving
-                    response = self.w.serving_endpoints.query(
-                        name=self.endpoint_name,
-                        dataframe_records=[{"messages": messages}]
-                    )
+                    with tracing.span("waf.agent.model_call", {
+                        "gen_ai.operation.name": "chat",
+                        "gen_ai.request.model": self.endpoint_name,
+                        "waf.agent.messages": len(messages),
+                    }, kind=tracing.SPAN_KIND_CLIENT), MODEL_CALLS.time(endpoint=self.endpoint_name):
+                        response = self.w.serving_endpoints.query(
+                            name=self.endpoint_name,
+                            dataframe_records=[{"messages": messages}]
+                        )
                     result = response.predictions[0] if response.predictions else None
                 else:
                     # Use Foundation Model API directly
@@ -189,6 +268,8 @@ Please provide a helpful response based on the WAF scores above. If the user is
                     result = self._call_claude_direct(messages)
                 
                 if result:
+                    if cache_key:
+                        self.response_cache.set(cache_key, result)
                     return result
                 else:
                     return "I'm having trouble connecting to the AI model. Please check your Databricks Foundation Model API configuration."
@@ -198,10 +279,134 @@ Please provide a helpful response based on the WAF scores above. If the user is
                 # Fallback: Generate response based on context
                 return self._generate_fallback_response(user_question, waf_context)
         
+        except WarehouseSaturated:
+            raise
         except Exception as e:
             logger.error(f"Error generating recommendation: {e}", exc_info=True)
             return f"I encountered an error: {str(e)}"
     
+    def generate_recommendation_with_tools(
+        self,
+        user_question: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> str:
+        """
+        Generate recommendation letting the model load only the data it needs
+        
+        The model is offered get_summary_scores / get_pillar / get_metric_by_id
+        as tools. Tool calls from one turn run concurrently, and results are
+        cached per reload run, so a question about one control costs a single
+        pillar lookup (or nothing, if that pillar is already cached).
+        
+        Args:
+            user_question: User's question about WAF scores
+            conversation_history: Previous conversation messages
+            
+        Returns:
+            Agent's response with recommendations
+            
+        Raises:
+            RuntimeError: If the model endpoint does not return a usable answer
+        """
+        run_id = get_latest_run_id(self.waf_client)
+        
+        cache_key = None
+        # No context payload in this mode: the run_id stands in for the data fingerprint,
+        # so without one there is nothing to invalidate a cached answer on reload
+        if self.response_cache and run_id is not None:
+            self.response_cache.check_run(run_id)
+            cache_key = self._run_cache_key("tools", run_id, user_question, conversation_history)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Response cache hit")
+                return cached
+        
+        executor = WAFToolExecutor(self.waf_client, run_id=run_id)
+        system_prompt = """You are a Databricks Well-Architected Framework (WAF) expert assistant.
+Use the provided tools to look up only the WAF scores needed to answer the question:
+- get_summary_scores for overall or cross-pillar questions
+- get_pillar for questions about one pillar
+- get_metric_by_id for questions about a specific control
+Request independent lookups together in one turn. Then answer concisely with specific,
+actionable advice and code examples when relevant, referencing the actual scores."""
+        
+        messages: List[Dict[str, Any]] = [{"role": "system", "content": system_prompt}]
+        messages += conversation_history or []
+        messages.append({"role": "user", "content": user_question})
+        
+        for _ in range(self.max_tool_rounds):
+            message = self._call_chat_endpoint(messages, tools=TOOL_SPECS)
+            tool_calls = message.get("tool_calls") or []
+            if not tool_calls:
+                answer = message.get("content")
+                if not answer:
+                    raise RuntimeError("Model returned an empty response")
+                if cache_key:
+                    self.response_cache.set(cache_key, answer)
+                return answer
+            
+            logger.info(f"Agent requested {len(tool_calls)} tool call(s): "
+                        f"{[c.get('function', {}).get('name') for c in tool_calls]}")
+            messages.append({"role": "assistant", "content": message.get("content"), "tool_calls": tool_calls})
+            messages.extend(executor.execute_many(tool_calls))
+        
+        raise RuntimeError(f"No final answer after {self.max_tool_rounds} tool rounds")
+    
+    def _run_cache_key(
+        self,
+        mode: str,
+        run_id: int,
+        user_question: str,
+        conversation_history: Optional[List[Dict[str, str]]]
+    ) -> str:
+        """Response cache key where the run (as this caller can see it) stands in for the context"""
+        return self.response_cache.make_key(
+            user_question,
+            {"mode": mode, "run_id": run_id, "identity": self.waf_client.identity},
+            conversation_history
+        )
+    
+    def _call_chat_endpoint(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Call a chat-completions serving endpoint and return the assistant message
+        
+        Uses the WorkspaceClient's API client so every auth type (PAT, OAuth, SP) works.
+        """
+        endpoint = self.endpoint_name or self.model_name
+        payload: Dict[str, Any] = {
+            "messages": messages,
+            "max_tokens": 2000,
+            "temperature": 0.2
+        }
+        if tools:
+            payload["tools"] = tools
+        
+        with tracing.span("waf.agent.model_call", {
+            "gen_ai.operation.name": "chat",
+            "gen_ai.request.model": endpoint,
+            "waf.agent.messages": len(messages),
+            "waf.agent.tools_offered": len(tools or []),
+        }, kind=tracing.SPAN_KIND_CLIENT) as span:
+            with MODEL_CALLS.time(endpoint=endpoint):
+                response = self.w.api_client.do(
+                    "POST",
+                    f"/serving-endpoints/{endpoint}/invocations",
+                    body=payload
+                )
+            usage = (response or {}).get("usage") or {}
+            span.set_attributes({
+                "gen_ai.usage.input_tokens": usage.get("prompt_tokens"),
+                "gen_ai.usage.output_tokens": usage.get("completion_tokens"),
+            })
+        choices = (response or {}).get("choices") or []
+        if not choices:
+            raise RuntimeError(f"Endpoint {endpoint} returned no choices")
+        return choices[0].get("message") or {}
+    
     def _call_claude_api(self, messages: List[Dict[str, str]]) -> Optional[str]:
         """Call Claude via Databricks Foundation Model API"""
         try:
@@ -335,10 +540,14 @@ Please provide a helpful response based on the WAF scores above. If the user is
 
 def create_agent(
     workspace_client: Optional[WorkspaceClient] = None,
-    warehouse_id: Optional[str] = None
+    warehouse_id: Optional[str] = None,
+    response_cache: Optional[ResponseCache] = None,
+    tool_mode: Optional[bool] = None
 ) -> WAFRecommendationAgent:
     """Factory function to create a WAF Recommendation Agent"""
     return WAFRecommendationAgent(
         workspace_client=workspace_client,
-        warehouse_id=warehouse_id
+        warehouse_id=warehouse_id,
+        response_cache=response_cache,
+        tool_mode=tool_mode
     )
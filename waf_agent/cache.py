@@ -0,0 +1,229 @@
+"""
+Response cache for the WAF Recommendation Agent
+
+Caches model answers keyed on the normalized user question plus a fingerprint
+of the WAF context the answer was generated from. Entries expire after a TTL,
+are evicted LRU when the cache is full, and are dropped as soon as a new
+reload run lands in _run_log.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from waf_core.metrics import cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Storage interface for cached responses (entries are JSON-serializable dicts)"""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU backend"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCacheBackend(CacheBackend):
+    """
+    Local-disk backend: one JSON file per entry
+
+    Survives process restarts (e.g. Databricks Apps redeploys). File mtime is
+    used as the LRU clock, so reads touch the file.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path, None)
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self.delete(key)
+            return None
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+            self._evict()
+
+    def _evict(self) -> None:
+        files = sorted(self.cache_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for path in files[:max(0, len(files) - self.max_entries)]:
+            path.unlink(missing_ok=True)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in self.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+
+class ResponseCache:
+    """LRU/TTL cache of agent responses, invalidated when the reload run changes"""
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl_seconds: int = 3600):
+        """
+        Initialize the response cache
+
+        Args:
+            backend: Storage backend (defaults to in-memory LRU)
+            ttl_seconds: Entry lifetime in seconds
+        """
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self._run_id: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Lowercase, drop punctuation and collapse whitespace"""
+        question = re.sub(r"['\u2019]", "", question.lower())
+        question = re.sub(r"[^\w\s-]", " ", question)
+        return " ".join(question.split())
+
+    @staticmethod
+    def fingerprint(payload: Any) -> str:
+        """Stable SHA-256 of a JSON-serializable payload"""
+        encoded = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def make_key(
+        self,
+        question: str,
+        context: Dict[str, Any],
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> str:
+        """Build the cache key from question, context and (optional) prior turns"""
+        return self.fingerprint({
+            "question": self.normalize_question(question),
+            "context": self.fingerprint(context),
+            "history": conversation_history or [],
+        })
+
+    def check_run(self, run_id: Optional[int]) -> None:
+        """Clear the cache if a different reload run is now the latest"""
+        if run_id is None:
+            return
+        with self._lock:
+            if self._run_id is not None and run_id != self._run_id:
+                logger.info(f"Reload run changed ({self._run_id} -> {run_id}), clearing response cache")
+                self.backend.clear()
+            self._run_id = run_id
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response, or None on miss/expiry/stale run"""
+        entry = self.backend.get(key)
+        if entry is not None and time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            self.backend.delete(key)
+            entry = None
+        if entry is not None and self._run_id is not None and entry.get("run_id") not in (None, self._run_id):
+            self.backend.delete(key)
+            entry = None
+        cache_lookup("agent_response", hit=entry is not None)
+        return entry.get("response") if entry is not None else None
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response for the current run"""
+        self.backend.set(key, {
+            "response": response,
+            "created_at": time.time(),
+            "run_id": self._run_id,
+        })
+
+
+_DEFAULT_CACHE: Optional[ResponseCache] = None
+_DEFAULT_CACHE_LOCK = threading.Lock()
+
+
+def get_default_cache() -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache configured from environment variables
+
+    WAF_AGENT_CACHE_BACKEND:     "memory" (default), "disk", or "none" to disable
+    WAF_AGENT_CACHE_DIR:         directory for the disk backend
+    WAF_AGENT_CACHE_TTL:         entry lifetime in seconds (default 3600)
+    WAF_AGENT_CACHE_MAX_ENTRIES: LRU capacity (default 256)
+    """
+    global _DEFAULT_CACHE
+    backend_name = os.getenv("WAF_AGENT_CACHE_BACKEND", "memory").lower()
+    if backend_name == "none":
+        return None
+
+    with _DEFAULT_CACHE_LOCK:
+        if _DEFAULT_CACHE is None:
+            max_entries = int(os.getenv("WAF_AGENT_CACHE_MAX_ENTRIES", "256"))
+            if backend_name == "disk":
+                cache_dir = os.getenv("WAF_AGENT_CACHE_DIR", "/tmp/waf_agent_cache")
+                backend: CacheBackend = DiskCacheBackend(cache_dir, max_entries=max_entries)
+            else:
+                backend = MemoryCacheBackend(max_entries=max_entries)
+            _DEFAULT_CACHE = ResponseCache(
+                backend=backend,
+                ttl_seconds=int(os.getenv("WAF_AGENT_CACHE_TTL", "3600"))
+            )
+        return _DEFAULT_CACHE
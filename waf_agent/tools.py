@@ -0,0 +1,261 @@
+"""
+Tools exposed to the WAF Recommendation Agent in tool-calling mode
+
+The model is given the waf_core.queries lookups below as tools and decides
+which data a question needs, instead of the agent loading every pillar up
+front. Results are memoized per reload run, and independent tool calls from
+one model turn run concurrently.
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from waf_core import tracing
+from waf_core.metrics import cache_lookup
+from waf_core.databricks_client import DatabricksClient
+from waf_core.queries import (
+    get_pillar_scores,
+    get_pillar_for_waf_id,
+    get_summary_scores
+)
+from waf_core.scheduler import WarehouseSaturated
+
+logger = logging.getLogger(__name__)
+
+PILLARS = ["reliability", "governance", "cost", "performance"]
+
+# Results kept across requests; tokens rotate, so each new caller identity adds entries
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("WAF_AGENT_TOOL_CACHE_MAX_ENTRIES", "256"))
+
+# OpenAI-compatible tool specs (Databricks Foundation Model API chat format)
+TOOL_SPECS: List[Dict[str, Any]] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_summary_scores",
+            "description": "Get the completion percentage of every WAF pillar. Cheapest call; use it for overall-score questions.",
+            "parameters": {"type": "object", "properties": {}, "required": []}
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_pillar",
+            "description": "Get one pillar's score, its control metrics and (optionally) principle-level scores.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "pillar": {
+                        "type": "string",
+                        "enum": PILLARS,
+                        "description": "The WAF pillar to load"
+                    },
+                    "include_principles": {
+                        "type": "boolean",
+                        "description": "Also return principle-level completion scores",
+                        "default": False
+                    }
+                },
+                "required": ["pillar"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_metric_by_id",
+            "description": "Get a single WAF control metric by ID (e.g. 'R-01-01', 'CO-01-09', 'PE-02-06', 'DG-01-04').",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "waf_id": {
+                        "type": "string",
+                        "description": "The WAF control ID"
+                    }
+                },
+                "required": ["waf_id"]
+            }
+        }
+    }
+]
+
+
+class WAFToolExecutor:
+    """Runs agent tool calls against waf_core with a per-run result cache"""
+
+    # Shared by all executors in the process, keyed by (warehouse_id, run_id, identity, ...);
+    # least recently used entries go first once SHARED_CACHE_MAX_ENTRIES is reached
+    _shared_cache: "OrderedDict[Tuple, Any]" = OrderedDict()
+    _shared_key_locks: Dict[Tuple, threading.Lock] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        client: DatabricksClient,
+        run_id: Optional[int] = None,
+        max_workers: int = 4
+    ):
+        """
+        Initialize the tool executor
+
+        Args:
+            client: Databricks client used for lookups
+            run_id: Current reload run_id; results are only shared across requests (of the
+                same caller identity) when known
+            max_workers: Max concurrent tool calls per model turn
+        """
+        self.client = client
+        self.run_id = run_id
+        self.max_workers = max_workers
+        self._local_cache: Dict[Tuple, Any] = {}
+        self._local_key_locks: Dict[Tuple, threading.Lock] = {}
+        self._local_lock = threading.Lock()
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "get_summary_scores": self._get_summary_scores,
+            "get_pillar": self._get_pillar,
+            "get_metric_by_id": self._get_metric_by_id,
+        }
+
+    def _cached(self, key: Tuple, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, loading it once on miss (concurrent callers wait)"""
+        if self.run_id is not None:
+            cache, lock, key_locks = self._shared_cache, self._shared_lock, self._shared_key_locks
+            # Callers only share results loaded under their own identity's permissions
+            key = (self.client.warehouse_id, self.run_id, self.client.identity) + key
+        else:
+            cache, lock, key_locks = self._local_cache, self._local_lock, self._local_key_locks
+
+        shared = self.run_id is not None
+
+        def lookup():
+            if key not in cache:
+                return False, None
+            if shared:
+                cache.move_to_end(key)
+            cache_lookup("agent_tools", hit=True)
+            return True, cache[key]
+
+        with lock:
+            found, value = lookup()
+            if found:
+                return value
+            key_lock = key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with lock:
+                found, value = lookup()
+                if found:
+                    return value
+            cache_lookup("agent_tools", hit=False)
+            try:
+                value = loader()
+                with lock:
+                    if shared:
+                        # Drop entries from older runs, then the least recently used
+                        for k in [k for k in cache if k[1] != self.run_id]:
+                            del cache[k]
+                        cache[key] = value
+                        while len(cache) > SHARED_CACHE_MAX_ENTRIES:
+                            cache.popitem(last=False)
+                    else:
+                        cache[key] = value
+            finally:
+                # Waiters already hold key_lock; later callers find the value (or reload it)
+                with lock:
+                    if key_locks.get(key) is key_lock:
+                        del key_locks[key]
+        return value
+
+    def _pillar_metrics(self, pillar: str):
+        return self._cached(
+            ("pillar", pillar),
+            lambda: get_pillar_scores(self.client, pillar, include_metrics=True, include_principles=False)
+        )
+
+    def _get_summary_scores(self, args: Dict[str, Any]) -> Dict[str, float]:
+        return self._cached(("summary",), lambda: get_summary_scores(self.client))
+
+    def _get_pillar(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        pillar = str(args.get("pillar", "")).lower()
+        if pillar not in PILLARS:
+            return {"error": f"Invalid pillar '{pillar}'. Must be one of: {', '.join(PILLARS)}"}
+
+        if args.get("include_principles"):
+            pillar_score = self._cached(
+                ("pillar_full", pillar),
+                lambda: get_pillar_scores(self.client, pillar, include_metrics=True, include_principles=True)
+            )
+        else:
+            pillar_score = self._pillar_metrics(pillar)
+        return pillar_score.dict()
+
+    def _get_metric_by_id(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        waf_id = str(args.get("waf_id", "")).strip().upper()
+        pillar = get_pillar_for_waf_id(waf_id)
+        if not pillar:
+            return {"error": f"Unknown WAF ID '{waf_id}'"}
+
+        # One pillar lookup serves every control in that pillar for the rest of the run
+        for metric in self._pillar_metrics(pillar).metrics:
+            if metric.waf_id.upper() == waf_id:
+                return {"pillar": pillar, **metric.dict()}
+        return {"error": f"Metric '{waf_id}' not found"}
+
+    def execute(self, name: str, arguments: Any) -> str:
+        """
+        Execute one tool call
+
+        Args:
+            name: Tool name
+            arguments: Tool arguments as a dict or JSON string
+
+        Returns:
+            JSON-encoded tool result (errors are returned to the model, not raised)
+            
+        Raises:
+            WarehouseSaturated: If admission control refused a lookup (the request should back off)
+        """
+        try:
+            args = json.loads(arguments) if isinstance(arguments, str) else (arguments or {})
+            handler = self._handlers.get(name)
+            if handler is None:
+                result: Any = {"error": f"Unknown tool '{name}'"}
+            else:
+                result = handler(args)
+        except WarehouseSaturated:
+            raise
+        except Exception as e:
+            logger.error(f"Error in agent tool '{name}': {e}", exc_info=True)
+            result = {"error": str(e)}
+        return json.dumps(result, default=str, separators=(",", ":"))
+
+    def execute_many(self, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Execute the tool calls from one model turn concurrently
+
+        Args:
+            tool_calls: OpenAI-style tool_calls ({id, function: {name, arguments}})
+
+        Returns:
+            Tool messages in the same order as tool_calls
+        """
+        def _run(call: Dict[str, Any]) -> str:
+            fn = call.get("function", {})
+            with tracing.span("waf.agent.tool", {"waf.tool.name": fn.get("name", "")}):
+                return self.execute(fn.get("name", ""), fn.get("arguments"))
+
+        if len(tool_calls) == 1:
+            outputs = [_run(tool_calls[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tool_calls))) as pool:
+                # bind() keeps the tool spans under this turn's span on the worker threads
+                outputs = list(pool.map(tracing.bind(_run), tool_calls))
+
+        return [
+            {"role": "tool", "tool_call_id": call.get("id", ""), "content": output}
+            for call, output in zip(tool_calls, outputs)
+        ]
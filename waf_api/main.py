@@ -2,15 +2,21 @@
 WAF Assessment Tool - REST API Main Application
 """
 import os
+import hmac
+import json
 import logging
+import time
+from contextlib import nullcontext
 from typing import Optional, List, Dict
 from fastapi import FastAPI, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from datetime import datetime
 
 from databricks.sdk import WorkspaceClient
+from waf_core import metrics, profiling, tracing
+from waf_core.scheduler import CONTEXT, INTERACTIVE, WarehouseSaturated, statement_priority
 from waf_core.databricks_client import DatabricksClient
 from waf_core.queries import (
     get_all_scores,
@@ -38,13 +44,26 @@ except ImportError as e:
     AGENT_AVAILABLE = False
     logger.warning(f"WAF Agent not available: {e}")
 
+# Tracing (WAF_TRACING=file|otlp|otel, see waf_core/tracing.py)
+TRACING_ENABLED = tracing.configure(service_name="waf-api")
+
+
+class TracedJSONResponse(JSONResponse):
+    """JSONResponse that records body encoding as a span"""
+
+    def render(self, content) -> bytes:
+        with tracing.span("waf.api.serialize"):
+            return super().render(content)
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="WAF Assessment Tool API",
     description="REST API for programmatic access to WAF assessment scores and metrics",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=TracedJSONResponse if TRACING_ENABLED else JSONResponse
 )
 
 # CORS middleware
@@ -56,6 +75,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """
+    Per-route latency, status and in-flight metrics for every request, plus a
+    SERVER span continuing the caller's W3C traceparent when tracing is on,
+    and a stored profile when the request opted in (see _profile_requested).
+    The route's warehouse statements run in its admission priority class.
+    """
+    started = time.perf_counter()
+    status = 500
+    metrics.HTTP_IN_FLIGHT.inc()
+    profile_context = (
+        # The event loop serves other requests too; the handler's threadpool and
+        # agent tool threads join the profile when they open spans
+        profiling.profiled(f"{request.method} {request.url.path}", caller_thread=False)
+        if _profile_requested(request) else nullcontext()
+    )
+    try:
+        with statement_priority(_ROUTE_PRIORITY.get(request.url.path, INTERACTIVE)), \
+                profile_context as profile, tracing.span(
+            f"{request.method} {request.url.path}",
+            {"http.request.method": request.method, "url.path": request.url.path},
+            kind=tracing.SPAN_KIND_SERVER,
+            traceparent=request.headers.get("traceparent")
+        ) as span:
+            response = await call_next(request)
+            status = response.status_code
+            route = request.scope.get("route")
+            if route is not None:
+                # Name by template (/api/v1/scores/{pillar}) so spans group per route
+                span.update_name(f"{request.method} {route.path}")
+                span.set_attribute("http.route", route.path)
+            span.set_attribute("http.response.status_code", status)
+            if status >= 500:
+                span.set_attribute("error.type", str(status))
+            if profile is not None:
+                if route is not None:
+                    profile.name = f"{request.method} {route.path}"
+                profile.meta.update(path=request.url.path, status=status)
+                response.headers["X-WAF-Profile-Id"] = profile.id
+            return response
+    finally:
+        metrics.HTTP_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        # Unmatched paths share one label so scanners cannot grow the series count
+        route_path = route.path if route is not None else "unmatched"
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=route_path, status=str(status))
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, method=request.method, route=route_path)
+
+
+# Statement priority class per path (waf_core/scheduler.py); score lookups stay interactive
+_ROUTE_PRIORITY = {
+    "/api/v1/context": CONTEXT,
+    "/api/v1/chat": CONTEXT,
+}
+
+
+# Admin secret for on-demand request profiles (X-WAF-Profile header); unset disables them
+WAF_PROFILE_TOKEN = os.getenv("WAF_PROFILE_TOKEN", "")
+
+
+def _is_profile_admin(supplied: Optional[str]) -> bool:
+    return bool(WAF_PROFILE_TOKEN and supplied and hmac.compare_digest(supplied, WAF_PROFILE_TOKEN))
+
+
+def _profile_requested(request: Request) -> bool:
+    """Profile a request carrying WAF_PROFILE_TOKEN, or a WAF_PROFILE_SAMPLE_RATE fraction of requests"""
+    if request.url.path in ("/metrics", "/api/v1/health") or request.url.path.startswith("/api/v1/admin/"):
+        return False
+    # Header only: a query-string token would land in access logs and Referer headers
+    return _is_profile_admin(request.headers.get("X-WAF-Profile")) or profiling.sampled()
+
+
 # Configuration
 DATABRICKS_WAREHOUSE_ID = os.getenv("DATABRICKS_WAREHOUSE_ID", "")
 
@@ -75,7 +168,14 @@ def get_client(request: Request, authorization: Optional[str] = Header(None)) ->
     
     This matches how the dashboard works - it uses your user credentials, not SP.
     """
+    with tracing.span("waf.auth.get_client"):
+        return _create_client(request, authorization)
+
+
+def _create_client(request: Request, authorization: Optional[str]) -> DatabricksClient:
+    """Resolve credentials (OBO token, PAT or SP) and build the request's DatabricksClient"""
     from databricks.sdk.core import Config
+    auth_span = tracing.current_span()
     
     # Debug: Log all headers on first request to see what's available
     if not hasattr(get_client, '_header_logged'):
@@ -121,14 +221,18 @@ def get_client(request: Request, authorization: Optional[str] = Header(None)) ->
         try:
             # Use token as PAT (OAuth tokens from Databricks Apps work as PATs)
             # The token from X-Forwarded-Access-Token is already a valid access token
+            auth_span.set_attribute("waf.auth.method", "obo")
             workspace_client = WorkspaceClient(config=Config(token=forwarded_token, host=os.getenv("DATABRICKS_HOST")))
             # Validate by getting current user
-            test_user = workspace_client.current_user.me()
+            with tracing.span("waf.auth.validate_token", kind=tracing.SPAN_KIND_CLIENT), \
+                    metrics.TOKEN_VALIDATION.time(service="api"):
+                test_user = workspace_client.current_user.me()
             logger.info(f"✅ Token validated for user: {test_user.user_name}")
             logger.info(f"✅ Using user credentials: {test_user.user_name}")
         except Exception as e:
             logger.error(f"❌ Token validation failed: {e}")
             logger.error("Falling back to Service Principal")
+            auth_span.set_attribute("waf.auth.method", "sp_fallback")
             workspace_client = WorkspaceClient()
     
     # Priority 2: PAT from Authorization header
@@ -137,10 +241,12 @@ def get_client(request: Request, authorization: Optional[str] = Header(None)) ->
         if len(auth_parts) == 2 and auth_parts[0].lower() == "bearer":
             pat = auth_parts[1]
             logger.info("Using PAT from Authorization header")
+            auth_span.set_attribute("waf.auth.method", "pat")
             workspace_client = WorkspaceClient(config=Config(token=pat, auth_type="pat"))
         else:
             # Invalid authorization format, fall back to SP
             logger.warning("Invalid Authorization header format, falling back to Service Principal")
+            auth_span.set_attribute("waf.auth.method", "sp")
             workspace_client = WorkspaceClient()
     
     # Priority 3: Service Principal (fallback - needs permissions granted)
@@ -153,6 +259,7 @@ def get_client(request: Request, authorization: Optional[str] = Header(None)) ->
         logger.error("   3. User has consented to scopes")
         logger.error("   4. App was restarted after OBO configuration")
         logger.warning("⚠️  Falling back to Service Principal (will fail without SP permissions)")
+        auth_span.set_attribute("waf.auth.method", "sp")
         workspace_client = WorkspaceClient()
     
     # Get warehouse ID (required for SQL queries)
@@ -242,6 +349,9 @@ class ChatResponse(BaseModel):
 
 
 # API Endpoints
+# Warehouse-bound endpoints are plain `def`: FastAPI runs them on its threadpool,
+# so a request waiting for a statement slot (waf_core/scheduler.py) never blocks
+# the event loop, and concurrent requests queue against each other by priority.
 
 @app.get("/api/v1/health", response_model=HealthResponse)
 async def health_check(request: Request):
@@ -254,8 +364,34 @@ async def health_check(request: Request):
     )
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text-format metrics (no authentication required, like /health)"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/api/v1/admin/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(
+    profile_id: str,
+    collapsed: bool = False,
+    x_waf_profile: Optional[str] = Header(None)
+):
+    """Stored request profile: JSON summary with statement timings, or collapsed stacks for a flamegraph"""
+    if not _is_profile_admin(x_waf_profile):
+        raise HTTPException(status_code=403, detail="Profiles require the X-WAF-Profile admin token")
+    try:
+        content = profiling.load(profile_id, collapsed=collapsed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    if collapsed:
+        return PlainTextResponse(content)
+    return JSONResponse(json.loads(content))
+
+
 @app.get("/api/v1/scores", response_model=ScoresResponse)
-async def get_scores(client: DatabricksClient = Depends(get_client)):
+def get_scores(client: DatabricksClient = Depends(get_client)):
     """Get overall WAF scores for all pillars"""
     try:
         scores = get_all_scores(client, include_metrics=False, include_principles=False)
@@ -266,6 +402,8 @@ async def get_scores(client: DatabricksClient = Depends(get_client)):
             performance=scores.performance.completion_percent,
             timestamp=scores.timestamp
         )
+    except WarehouseSaturated:
+        raise
     except ValueError as e:
         logger.error(f"Configuration error getting scores: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Configuration error: {str(e)}")
@@ -278,7 +416,7 @@ async def get_scores(client: DatabricksClient = Depends(get_client)):
 
 
 @app.get("/api/v1/scores/{pillar}", response_model=PillarScoresResponse)
-async def get_pillar_score(
+def get_pillar_score(
     pillar: str,
     client: DatabricksClient = Depends(get_client)
 ):
@@ -304,7 +442,7 @@ async def get_pillar_score(
             principles=[p.dict() for p in pillar_score.principles],
             timestamp=datetime.now()
         )
-    except HTTPException:
+    except (HTTPException, WarehouseSaturated):
         raise
     except ValueError as e:
         logger.error(f"Configuration error getting pillar score: {str(e)}")
@@ -318,7 +456,7 @@ async def get_pillar_score(
 
 
 @app.get("/api/v1/metrics", response_model=MetricsResponse)
-async def get_all_metrics(client: DatabricksClient = Depends(get_client)):
+def get_all_metrics(client: DatabricksClient = Depends(get_client)):
     """Get all WAF control metrics"""
     try:
         scores = get_all_scores(client, include_metrics=True, include_principles=False)
@@ -332,6 +470,8 @@ async def get_all_metrics(client: DatabricksClient = Depends(get_client)):
             total_count=len(all_metrics),
             timestamp=datetime.now()
         )
+    except WarehouseSaturated:
+        raise
     except ValueError as e:
         logger.error(f"Configuration error getting metrics: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Configuration error: {str(e)}")
@@ -344,7 +484,7 @@ async def get_all_metrics(client: DatabricksClient = Depends(get_client)):
 
 
 @app.get("/api/v1/metrics/{waf_id}", response_model=MetricDetailResponse)
-async def get_metric_details(
+def get_metric_details(
     waf_id: str,
     client: DatabricksClient = Depends(get_client)
 ):
@@ -358,7 +498,7 @@ async def get_metric_details(
             metric=metric.dict(),
             timestamp=datetime.now()
         )
-    except HTTPException:
+    except (HTTPException, WarehouseSaturated):
         raise
     except Exception as e:
         logger.error(f"Error getting metric details: {str(e)}")
@@ -366,7 +506,7 @@ async def get_metric_details(
 
 
 @app.get("/api/v1/recommendations", response_model=RecommendationsResponse)
-async def get_recommendations(
+def get_recommendations(
     pillar: Optional[str] = None,
     client: DatabricksClient = Depends(get_client)
 ):
@@ -404,13 +544,15 @@ async def get_recommendations(
             total_count=len(recommendations),
             timestamp=datetime.now()
         )
+    except WarehouseSaturated:
+        raise
     except Exception as e:
         logger.error(f"Error getting recommendations: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get recommendations: {str(e)}")
 
 
 @app.get("/api/v1/context", response_model=ContextResponse)
-async def get_context(client: DatabricksClient = Depends(get_client)):
+def get_context(client: DatabricksClient = Depends(get_client)):
     """Get structured context for AI agents (optimized for LLM consumption)"""
     try:
         scores = get_all_scores(client, include_metrics=True, include_principles=True)
@@ -485,6 +627,8 @@ async def get_context(client: DatabricksClient = Depends(get_client)):
                 "compliance_percentage": round((passing_controls / total_controls * 100) if total_controls > 0 else 0, 2)
             }
         )
+    except WarehouseSaturated:
+        raise
     except ValueError as e:
         logger.error(f"Configuration error getting context: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Configuration error: {str(e)}")
@@ -497,7 +641,7 @@ async def get_context(client: DatabricksClient = Depends(get_client)):
 
 
 @app.post("/api/v1/chat", response_model=ChatResponse)
-async def chat_with_agent(
+def chat_with_agent(
     request: ChatRequest,
     client: DatabricksClient = Depends(get_client)
 ):
@@ -524,6 +668,8 @@ async def chat_with_agent(
             response=response,
             timestamp=datetime.now()
         )
+    except WarehouseSaturated:
+        raise
     except ValueError as e:
         logger.error(f"Configuration error in chat: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Configuration error: {str(e)}")
@@ -535,6 +681,17 @@ async def chat_with_agent(
         raise HTTPException(status_code=500, detail=f"Failed to generate response: {str(e)}")
 
 
+@app.exception_handler(WarehouseSaturated)
+async def warehouse_saturated_handler(request, exc: WarehouseSaturated):
+    """Admission control refused a statement: 503 with the scheduler's Retry-After estimate"""
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler"""
@@ -0,0 +1,10 @@
+"""
+WAF Assessment Tool - Benchmarks
+
+Times the Python side of the tooling (result parsing, score models, API
+serialization, agent prompt assembly, end-to-end scoring and the reload)
+against a stubbed backend with injectable latency, and compares result
+files across commits.
+"""
+
+__version__ = "1.0.0"
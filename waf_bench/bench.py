@@ -0,0 +1,289 @@
+"""
+Benchmark runner and comparison CLI
+
+    python -m waf_bench run                          # all cases -> bench-results/<commit>.json
+    python -m waf_bench run --cases sdk_parse,api_context --latency 0.2
+    python -m waf_bench run --snapshot-dir ./snapshots   # include the reload case
+    python -m waf_bench run --replay-dir ./recorded --replay-speed 1   # recorded warehouse responses
+    python -m waf_bench compare                      # two newest results in bench-results/
+    python -m waf_bench compare base.json new.json --threshold 15
+    python -m waf_bench list
+
+compare exits 1 when a case's median regressed by more than --threshold
+percent, so it can gate a commit in CI.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .cases import CASES, REPO_ROOT, Skip
+
+RESULTS_SCHEMA = 1
+DEFAULT_RESULTS_DIR = "bench-results"
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        out = subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def environment() -> Dict[str, Any]:
+    """Commit and interpreter details recorded with every result file"""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "--short=12", "HEAD") or "unknown",
+        "branch": _git("rev-parse", "--abbrev-ref", "HEAD"),
+        "dirty": bool(status),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _stats(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "min_s": ordered[0],
+        "median_s": statistics.median(ordered),
+        "mean_s": statistics.fmean(ordered),
+        "p95_s": p95,
+        "stdev_s": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+    }
+
+
+def run_case(spec: Dict[str, Any], settings) -> Dict[str, Any]:
+    """Time one case; returns its result entry (timings, or skipped / error)"""
+    result: Dict[str, Any] = {"description": spec["description"], "group": spec["group"]}
+    try:
+        workload = spec["setup"](settings)
+    except Skip as e:
+        result["skipped"] = str(e)
+        return result
+    except Exception as e:
+        result["error"] = f"setup failed: {e}"
+        return result
+
+    repeat = settings.repeat_override or workload.repeat
+    samples = []
+    try:
+        for _ in range(settings.warmup):
+            workload.fn()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(workload.number):
+                workload.fn()
+            samples.append((time.perf_counter() - start) / workload.number)
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+
+    result.update(_stats(samples))
+    result.update(repeat=repeat, number=workload.number, meta=dict(workload.meta))
+    if workload.after:
+        result["meta"].update(workload.after())
+    return result
+
+
+def run(settings) -> Dict[str, Any]:
+    """Run the selected cases and return the result document"""
+    names = [n.strip() for n in settings.cases.split(",")] if settings.cases else list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        raise ValueError(f"Unknown case(s): {', '.join(unknown)} (see: python -m waf_bench list)")
+
+    document = {
+        "schema": RESULTS_SCHEMA,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "settings": {
+            k: v for k, v in vars(settings).items()
+            if k not in ("command", "func", "out", "results_dir")
+        },
+        "cases": {},
+    }
+    for name in names:
+        result = run_case(CASES[name], settings)
+        document["cases"][name] = result
+        if "skipped" in result:
+            print(f"  - {name}: skipped ({result['skipped']})")
+        elif "error" in result:
+            print(f"  ✗ {name}: {result['error']}")
+        else:
+            print(f"  ✓ {name}: median {_fmt(result['median_s'])}  p95 {_fmt(result['p95_s'])}  "
+                  f"({result['repeat']} x {result['number']})")
+    return document
+
+
+def _fmt(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.3f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.1f} us"
+
+
+def _result_path(settings, document: Dict[str, Any]) -> Path:
+    if settings.out:
+        return Path(settings.out)
+    env = document["environment"]
+    name = env["commit"] + ("-dirty" if env["dirty"] else "")
+    return Path(settings.results_dir) / f"{name}.json"
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    if document.get("schema") != RESULTS_SCHEMA:
+        raise ValueError(f"{path}: unsupported results schema {document.get('schema')}")
+    return document
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Per-case median change from base to new
+
+    Returns:
+        One row per case present in both documents with timings:
+        {case, base_s, new_s, change_pct, status} where status is
+        "regression" / "improvement" beyond threshold percent, else "ok"
+    """
+    rows = []
+    for name, new_case in new["cases"].items():
+        base_case = base["cases"].get(name)
+        if not base_case or "median_s" not in base_case or "median_s" not in new_case:
+            continue
+        change = (new_case["median_s"] / base_case["median_s"] - 1.0) * 100 if base_case["median_s"] else 0.0
+        status = "regression" if change > threshold else "improvement" if change < -threshold else "ok"
+        rows.append({
+            "case": name,
+            "base_s": base_case["median_s"],
+            "new_s": new_case["median_s"],
+            "change_pct": round(change, 2),
+            "status": status,
+        })
+    return rows
+
+
+def _latest_results(results_dir: str, count: int) -> List[str]:
+    paths = sorted(Path(results_dir).glob("*.json"), key=lambda p: p.stat().st_mtime)
+    return [str(p) for p in paths[-count:]]
+
+
+def cmd_run(settings) -> int:
+    # Keep per-statement INFO logging out of the timings and the output
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("waf_core").setLevel(logging.WARNING)
+    print(f"Running benchmarks (stub latency {settings.latency}s, jitter {settings.jitter:.0%})...")
+    document = run(settings)
+    path = _result_path(settings, document)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+    print(f"\nResults written to {path}")
+    return 1 if any("error" in c for c in document["cases"].values()) else 0
+
+
+def cmd_compare(settings) -> int:
+    paths = [p for p in (settings.base, settings.new) if p]
+    if len(paths) < 2:
+        latest = _latest_results(settings.results_dir, 2 - len(paths))
+        paths = (latest + paths) if settings.base is None else (paths + latest)
+    if len(paths) < 2 or paths[0] == paths[1]:
+        print(f"ERROR: need two result files (found {len(paths)} in {settings.results_dir})")
+        return 2
+    base, new = load_results(paths[0]), load_results(paths[1])
+    rows = compare(base, new, settings.threshold)
+
+    if settings.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"Base: {paths[0]} ({base['environment']['commit']})")
+        print(f"New:  {paths[1]} ({new['environment']['commit']})")
+        changed = sorted(k for k in set(base["settings"]) | set(new["settings"])
+                         if base["settings"].get(k) != new["settings"].get(k))
+        if changed:
+            print(f"⚠ Settings differ between runs: {', '.join(changed)}")
+        print()
+        width = max([len(r["case"]) for r in rows] + [4])
+        for r in rows:
+            mark = "✗" if r["status"] == "regression" else "✓"
+            print(f"{mark} {r['case']:<{width}}  {_fmt(r['base_s']):>12} -> {_fmt(r['new_s']):>12}  "
+                  f"{r['change_pct']:+7.1f}%  {r['status']}")
+    regressions = [r for r in rows if r["status"] == "regression"]
+    if not settings.json:
+        print(f"\n{len(rows)} case(s) compared, {len(regressions)} regression(s) beyond {settings.threshold}%")
+    return 1 if regressions else 0
+
+
+def cmd_list(settings) -> int:
+    width = max(len(n) for n in CASES)
+    for name, spec in CASES.items():
+        print(f"{name:<{width}}  [{spec['group']}] {spec['description']}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m waf_bench", description="WAF tooling benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Run benchmarks and write a JSON result file")
+    p_run.add_argument("--cases", help="Comma-separated case names (default: all)")
+    p_run.add_argument("--latency", type=float, default=float(os.getenv("WAF_BENCH_LATENCY", "0.05")),
+                       help="Simulated seconds per statement for get_all_scores (default 0.05)")
+    p_run.add_argument("--jitter", type=float, default=0.2, help="+/- fraction of latency (default 0.2)")
+    p_run.add_argument("--controls", type=int, default=20, help="WAF controls per pillar (default 20)")
+    p_run.add_argument("--principles", type=int, default=5, help="Principles per pillar (default 5)")
+    p_run.add_argument("--rows", type=int, default=5000, help="Rows for sdk_parse (default 5000)")
+    p_run.add_argument("--columns", type=int, default=8, help="Columns for sdk_parse (default 8)")
+    p_run.add_argument("--repeat", dest="repeat_override", type=int, default=None,
+                       help="Timed samples per case (default: per case)")
+    p_run.add_argument("--warmup", type=int, default=1, help="Untimed calls before sampling (default 1)")
+    p_run.add_argument("--seed", type=int, default=42)
+    p_run.add_argument("--replay-dir", help="Recorded responses for get_all_scores_replay (WAF_RECORD_DIR)")
+    p_run.add_argument("--replay-speed", type=float, default=0.0,
+                       help="Multiplier on recorded statement wall time for replay (default 0)")
+    p_run.add_argument("--snapshot-dir", help="Parquet snapshots for the reload case (reload_local.py layout)")
+    p_run.add_argument("--reload-latency", type=float, default=0.0,
+                       help="Simulated seconds per reload statement (WAF_LOCAL_LATENCY)")
+    p_run.add_argument("--reload-workers", type=int, default=8)
+    p_run.add_argument("--reload-repeat", type=int, default=1)
+    p_run.add_argument("--out", help="Result file (default: <results-dir>/<commit>.json)")
+    p_run.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR)
+    p_run.set_defaults(func=cmd_run)
+
+    p_cmp = sub.add_parser("compare", help="Compare two result files (default: the two newest)")
+    p_cmp.add_argument("base", nargs="?", help="Baseline result file")
+    p_cmp.add_argument("new", nargs="?", help="New result file")
+    p_cmp.add_argument("--threshold", type=float, default=10.0,
+                       help="Median change in percent that counts as a regression (default 10)")
+    p_cmp.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR)
+    p_cmp.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    p_cmp.set_defaults(func=cmd_compare)
+
+    p_list = sub.add_parser("list", help="List benchmark cases")
+    p_list.set_defaults(func=cmd_list)
+
+    settings = parser.parse_args(argv)
+    # Cases read settings.repeat as their default sample count
+    if settings.command == "run":
+        settings.repeat = settings.repeat_override or 20
+    return settings.func(settings)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+Benchmark cases
+
+Each case is a setup function registered with @case. It receives the run
+settings and returns a Workload: the callable to time, how many calls make
+up one timed sample, and metadata recorded with the result. Setup raises
+Skip when an optional component (FastAPI, the agent, a snapshot directory)
+is not available, so one run covers whatever is installed.
+"""
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from waf_core.databricks_client import DatabricksClient
+from waf_core.models import Metric, PillarScore, PrincipleScore
+from waf_core.queries import get_all_scores
+from waf_core.recording import ReplayBackend
+
+from .stub import PILLARS, StubBackend, StubWorkspaceClient
+
+REPO_ROOT = Path(__file__).parent.parent
+RELOAD_SCRIPT = REPO_ROOT / "streamlit-waf-automation" / "reload_data.py"
+
+
+class Skip(Exception):
+    """Raised by a case setup when the case cannot run in this environment"""
+
+
+class Workload:
+    """What a case times: fn() called `number` times per sample, `repeat` samples"""
+
+    def __init__(
+        self,
+        fn: Callable[[], Any],
+        number: int = 1,
+        repeat: int = 20,
+        meta: Optional[Dict[str, Any]] = None,
+        after: Optional[Callable[[], Dict[str, Any]]] = None
+    ):
+        self.fn = fn
+        self.number = number
+        self.repeat = repeat
+        self.meta = meta or {}
+        # Called once after timing; its dict is merged into meta (e.g. statement counts)
+        self.after = after
+
+
+CASES: Dict[str, Dict[str, Any]] = {}
+
+
+def case(name: str, description: str, group: str):
+    """Register a case setup function under `name`"""
+    def register(setup: Callable[[Any], Workload]):
+        CASES[name] = {"name": name, "description": description, "group": group, "setup": setup}
+        return setup
+    return register
+
+
+def _stub(settings, latency: float = 0.0, **kwargs) -> StubBackend:
+    return StubBackend(
+        latency=latency,
+        jitter=settings.jitter,
+        controls_per_pillar=settings.controls,
+        principles_per_pillar=settings.principles,
+        seed=settings.seed,
+        **kwargs
+    )
+
+
+def _backend_client(backend: StubBackend) -> DatabricksClient:
+    """Client that hands statements straight to the backend (no result parsing)"""
+    return DatabricksClient(workspace_client=StubWorkspaceClient(backend), warehouse_id="bench", backend=backend)
+
+
+def _sdk_client(backend: StubBackend) -> DatabricksClient:
+    """Client on the Statement Execution API path, served by the stub"""
+    client = DatabricksClient(workspace_client=StubWorkspaceClient(backend), warehouse_id="bench")
+    # WAF_BACKEND may select a process backend; this case needs the warehouse path
+    client.backend = None
+    return client
+
+
+def _dump_json(model) -> str:
+    if hasattr(model, "model_dump_json"):
+        return model.model_dump_json()
+    return model.json()
+
+
+# ---------------------------------------------------------------------------
+# waf_core
+# ---------------------------------------------------------------------------
+
+@case("sdk_parse", "execute_query_sdk: parse a wide Statement Execution API result", "core")
+def sdk_parse(settings) -> Workload:
+    columns = [f"col_{i}" for i in range(settings.columns)]
+    result = [{c: f"value-{r}-{i}" for i, c in enumerate(columns)} for r in range(settings.rows)]
+    client = _sdk_client(_stub(settings, result=result))
+    return Workload(
+        lambda: client.execute_query_sdk("SELECT * FROM waf_bench.sdk_parse"),
+        number=5,
+        meta={"rows": settings.rows, "columns": settings.columns},
+    )
+
+
+@case("pillar_models", "Metric / PrincipleScore / PillarScore construction for all pillars", "core")
+def pillar_models(settings) -> Workload:
+    stub = _stub(settings)
+    controls = {p: stub.rows_for(stub.query_for(p, "waf_controls")) for p in PILLARS}
+    principles = {p: stub.rows_for(stub.query_for(p, "waf_principal_percentage")) for p in PILLARS}
+
+    def build() -> List[PillarScore]:
+        # Same field mapping as waf_core.queries.get_<pillar>_scores
+        return [
+            PillarScore(
+                pillar=pillar,
+                completion_percent=50.0,
+                metrics=[
+                    Metric(
+                        waf_id=row.get("waf_id", ""),
+                        principle=row.get("principle", ""),
+                        best_practice=row.get("best_practice"),
+                        description=row.get("description"),
+                        score_percentage=float(row.get("score_percentage", 0.0)),
+                        threshold_percentage=float(row.get("threshold_percentage", 0.0)),
+                        threshold_met=row.get("threshold_met") == "Met",
+                        implemented=row.get("implemented", "Fail"),
+                        current_percentage=float(row.get("score_percentage", 0.0))
+                    )
+                    for row in controls[pillar]
+                ],
+                principles=[
+                    PrincipleScore(
+                        principle=row.get("principle", ""),
+                        completion_percent=float(row.get("completion_percent", 0.0))
+                    )
+                    for row in principles[pillar]
+                ]
+            )
+            for pillar in PILLARS
+        ]
+
+    return Workload(build, number=20, meta={"controls_per_pillar": settings.controls})
+
+
+@case("scores_serialize", "WAFScores JSON serialization (all metrics and principles)", "core")
+def scores_serialize(settings) -> Workload:
+    scores = get_all_scores(_backend_client(_stub(settings)))
+    return Workload(lambda: _dump_json(scores), number=20, meta={"bytes": len(_dump_json(scores))})
+
+
+@case("get_all_scores", "get_all_scores end to end on the SDK path with simulated statement latency", "core")
+def get_all_scores_e2e(settings) -> Workload:
+    stub = _stub(settings, latency=settings.latency)
+    client = _sdk_client(stub)
+    samples = {"n": 0}
+
+    def run():
+        samples["n"] += 1
+        return get_all_scores(client, include_metrics=True, include_principles=True)
+
+    return Workload(
+        run,
+        repeat=max(3, settings.repeat // 4) if settings.latency else settings.repeat,
+        meta={"latency_s": settings.latency, "jitter": settings.jitter},
+        after=lambda: {"statements_per_call": round(stub.statements / max(samples["n"], 1), 2)},
+    )
+
+
+@case("get_all_scores_replay", "get_all_scores end to end on recorded responses (needs --replay-dir)", "core")
+def get_all_scores_replay(settings) -> Workload:
+    if not settings.replay_dir:
+        raise Skip("no --replay-dir (record one with WAF_RECORD_DIR, see waf_core/recording.py)")
+    backend = ReplayBackend(settings.replay_dir, latency=settings.latency, speed=settings.replay_speed)
+    client = DatabricksClient(workspace_client=StubWorkspaceClient(_stub(settings)),
+                              warehouse_id="bench", backend=backend)
+    return Workload(
+        lambda: get_all_scores(client, include_metrics=True, include_principles=True),
+        repeat=max(3, settings.repeat // 4) if settings.latency or settings.replay_speed else settings.repeat,
+        meta={"recorded_statements": len(backend.store), "latency_s": settings.latency,
+              "replay_speed": settings.replay_speed},
+    )
+
+
+# ---------------------------------------------------------------------------
+# waf_api
+# ---------------------------------------------------------------------------
+
+def _api():
+    try:
+        from fastapi.encoders import jsonable_encoder
+        from waf_api import main as api_main
+    except ImportError as e:
+        raise Skip(f"waf_api not importable: {e}")
+    return api_main, jsonable_encoder
+
+
+def _api_workload(settings, route_name: str) -> Workload:
+    api_main, jsonable_encoder = _api()
+    client = _backend_client(_stub(settings))
+    handler = getattr(api_main, route_name)
+    loop = asyncio.new_event_loop()
+
+    def call():
+        # Handler plus the response encoding FastAPI does for response_model routes
+        response = loop.run_until_complete(handler(client=client))
+        return json.dumps(jsonable_encoder(response))
+
+    return Workload(call, number=5, meta={"bytes": len(call())})
+
+
+@case("api_context", "/api/v1/context handler and response serialization", "api")
+def api_context(settings) -> Workload:
+    return _api_workload(settings, "get_context")
+
+
+@case("api_metrics", "/api/v1/metrics handler and response serialization", "api")
+def api_metrics(settings) -> Workload:
+    return _api_workload(settings, "get_all_metrics")
+
+
+# ---------------------------------------------------------------------------
+# waf_agent
+# ---------------------------------------------------------------------------
+
+@case("agent_prompt", "Agent context loading and prompt assembly (no model call)", "agent")
+def agent_prompt(settings) -> Workload:
+    try:
+        from waf_agent.agent import WAFRecommendationAgent
+    except ImportError as e:
+        raise Skip(f"waf_agent not importable: {e}")
+    stub = _stub(settings)
+    agent = WAFRecommendationAgent(workspace_client=StubWorkspaceClient(stub), warehouse_id="bench")
+    agent.waf_client = _backend_client(stub)
+    history = [
+        {"role": "user", "content": "What is my overall score?"},
+        {"role": "assistant", "content": "Your overall WAF score is 61.2%."},
+    ]
+
+    def assemble():
+        return agent.build_messages("How do I improve cost?", agent.get_waf_context(), history)
+
+    return Workload(assemble, number=5, meta={"prompt_chars": sum(len(m["content"]) for m in assemble())})
+
+
+# ---------------------------------------------------------------------------
+# Reload
+# ---------------------------------------------------------------------------
+
+_DONE_RE = re.compile(r"DONE:\s*(\d+) succeeded,\s*(\d+) failed")
+
+
+@case("reload", "reload_data.py wall time on the local backend (needs --snapshot-dir)", "reload")
+def reload(settings) -> Workload:
+    if not settings.snapshot_dir:
+        raise Skip("no --snapshot-dir (see streamlit-waf-automation/synthetic_snapshots.py)")
+    command = [
+        sys.executable, str(RELOAD_SCRIPT),
+        "--backend", "local",
+        "--snapshot-dir", settings.snapshot_dir,
+        "--local-db", ":memory:",
+        "--workers", str(settings.reload_workers),
+    ]
+    env = dict(os.environ, WAF_LOCAL_LATENCY=str(settings.reload_latency))
+    last = {}
+
+    def run():
+        proc = subprocess.run(command, env=env, capture_output=True, text=True)
+        match = _DONE_RE.search(proc.stdout)
+        if not match:
+            tail = (proc.stdout + proc.stderr).strip().splitlines()[-3:]
+            raise RuntimeError(f"reload_data.py exited {proc.returncode}: {' | '.join(tail)}")
+        last["succeeded"], last["failed"] = int(match.group(1)), int(match.group(2))
+
+    return Workload(
+        run,
+        repeat=settings.reload_repeat,
+        meta={"latency_s": settings.reload_latency, "workers": settings.reload_workers},
+        after=lambda: dict(last),
+    )
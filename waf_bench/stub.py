@@ -0,0 +1,228 @@
+"""
+Stubbed Databricks backends for benchmarks
+
+StubBackend answers the WAF statements with deterministic synthetic rows
+(WAF controls, principle and pillar percentages, the latest run_id) after an
+injectable latency, so the Python side can be timed without a warehouse.
+
+StubWorkspaceClient puts the same rows behind the slice of the
+WorkspaceClient API that DatabricksClient.execute_query_sdk uses
+(statement_execution.execute_statement / get_statement), so benchmarks
+exercise the production result-parsing path rather than the backend hook.
+"""
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from databricks.sdk.service.sql import StatementState
+
+from waf_core import queries
+from waf_core.backends import ExecutionBackend
+
+PILLARS = ("reliability", "governance", "cost", "performance")
+WAF_ID_PREFIX = {"reliability": "R", "governance": "DG", "cost": "CO", "performance": "PE"}
+QUERY_TYPES = ("total_percentage", "waf_controls", "waf_principal_percentage")
+
+_RUN_ID_RE = re.compile(r"waf_cache`?\.`?_(latest_run|run_log)\b", re.IGNORECASE)
+
+
+def placeholder_queries() -> Dict[str, Any]:
+    """
+    Query catalogue in the extracted_queries.json shape, one marker statement per entry
+
+    Used when extracted_queries.json is not deployed next to waf_core, so
+    every statement is still distinguishable by the stub.
+    """
+    catalogue: Dict[str, Any] = {
+        pillar: {
+            query_type: {"query": f"SELECT * FROM waf_bench /* {pillar}.{query_type} */"}
+            for query_type in QUERY_TYPES
+        }
+        for pillar in PILLARS
+    }
+    catalogue["summary"] = {
+        "total_percentage_across_pillars": {
+            "query": "SELECT * FROM waf_bench /* summary.total_percentage_across_pillars */"
+        }
+    }
+    return catalogue
+
+
+def ensure_query_catalogue() -> Dict[str, Any]:
+    """The loaded query catalogue, falling back to placeholder_queries() if none is deployed"""
+    catalogue = queries._load_queries()
+    if not catalogue:
+        catalogue = placeholder_queries()
+        queries._QUERIES_CACHE = catalogue
+    return catalogue
+
+
+class StubBackend(ExecutionBackend):
+    """Deterministic WAF result rows after a configurable per-statement latency"""
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        controls_per_pillar: int = 20,
+        principles_per_pillar: int = 5,
+        seed: int = 42,
+        result: Optional[List[Dict[str, Any]]] = None
+    ):
+        """
+        Initialize the stub
+
+        Args:
+            latency: Seconds each statement takes (sleep before returning)
+            jitter: Random +/- fraction of latency per statement (0.2 = +/-20%)
+            controls_per_pillar: WAF control rows per waf_controls statement
+            principles_per_pillar: Rows per waf_principal_percentage statement
+            seed: Seed for the synthetic scores and the jitter
+            result: Rows returned for every statement (overrides the WAF rows)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.controls_per_pillar = controls_per_pillar
+        self.principles_per_pillar = principles_per_pillar
+        self.seed = seed
+        self.result = result
+        self.statements = 0
+        self._kinds = {}
+        for pillar, entries in ensure_query_catalogue().items():
+            for query_type, entry in (entries or {}).items():
+                if isinstance(entry, dict) and entry.get("query"):
+                    self._kinds[entry["query"]] = (pillar, query_type)
+        self._rows_cache: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Count one statement and sleep for its simulated latency"""
+        with self._lock:
+            self.statements += 1
+            spread = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        if self.latency > 0:
+            time.sleep(max(0.0, self.latency * (1.0 + spread)))
+
+    def kind(self, query: str) -> Optional[Tuple[str, str]]:
+        """(pillar, query_type) of a catalogue statement, ("waf_cache", "run_id") or None"""
+        if query in self._kinds:
+            return self._kinds[query]
+        if _RUN_ID_RE.search(query):
+            return ("waf_cache", "run_id")
+        return None
+
+    def query_for(self, pillar: str, query_type: str) -> str:
+        """Catalogue SQL for (pillar, query_type), "" if there is none"""
+        for query, kind in self._kinds.items():
+            if kind == (pillar, query_type):
+                return query
+        return ""
+
+    def rows_for(self, query: str) -> List[Dict[str, Any]]:
+        """Result rows for a statement, as Statement Execution API strings"""
+        if self.result is not None:
+            return self.result
+        kind = self.kind(query)
+        if kind is None:
+            return []
+        if kind not in self._rows_cache:
+            self._rows_cache[kind] = self._generate(*kind)
+        return self._rows_cache[kind]
+
+    def _generate(self, pillar: str, query_type: str) -> List[Dict[str, Any]]:
+        rng = random.Random(f"{self.seed}:{pillar}:{query_type}")
+        if query_type == "run_id":
+            return [{"run_id": "1"}]
+        if query_type == "total_percentage_across_pillars":
+            return [{"pillar": p.title(), "completion_percent": f"{rng.uniform(20, 95):.2f}"} for p in PILLARS]
+        if query_type == "total_percentage":
+            return [{"completion_percent": f"{rng.uniform(20, 95):.2f}"}]
+        if query_type == "waf_principal_percentage":
+            return [
+                {"principle": f"{pillar.title()} principle {i + 1}",
+                 "completion_percent": f"{rng.uniform(0, 100):.2f}"}
+                for i in range(self.principles_per_pillar)
+            ]
+        if query_type == "waf_controls":
+            rows = []
+            for i in range(self.controls_per_pillar):
+                score = rng.uniform(0, 100)
+                threshold = rng.choice([50.0, 70.0, 80.0, 90.0])
+                met = score >= threshold
+                rows.append({
+                    "waf_id": f"{WAF_ID_PREFIX.get(pillar, 'X')}-{i // 5 + 1:02d}-{i % 5 + 1:02d}",
+                    "principle": f"{pillar.title()} principle {i // 5 + 1}",
+                    "best_practice": f"Best practice {i + 1} for {pillar}",
+                    "description": f"Control {i + 1} for {pillar}",
+                    "score_percentage": f"{score:.2f}",
+                    "threshold_percentage": f"{threshold:.1f}",
+                    "threshold_met": "Met" if met else "Not Met",
+                    "implemented": "Pass" if met else "Fail",
+                })
+            return rows
+        return []
+
+    def execute(self, query: str, timeout: int = 30) -> List[Dict[str, Any]]:
+        self.wait()
+        # Copies, like a fresh response from the warehouse
+        return [dict(row) for row in self.rows_for(query)]
+
+
+class _StubStatementExecution:
+    """statement_execution.execute_statement / get_statement over a StubBackend"""
+
+    def __init__(self, backend: StubBackend):
+        self._backend = backend
+        self._statements: Dict[str, str] = {}
+        self._responses: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def execute_statement(self, warehouse_id: str, statement: str, wait_timeout: str = "30s", **_kwargs):
+        with self._lock:
+            self._next_id += 1
+            statement_id = f"stub-{self._next_id}"
+            self._statements[statement_id] = statement
+        self._backend.wait()
+        return SimpleNamespace(
+            statement_id=statement_id,
+            status=SimpleNamespace(state=StatementState.SUCCEEDED),
+            result=None,
+        )
+
+    def get_statement(self, statement_id: str):
+        with self._lock:
+            statement = self._statements.pop(statement_id, "")
+            response = self._responses.get(statement)
+        if response is None:
+            # Built once per statement text so timings measure the client, not the stub
+            rows = self._backend.rows_for(statement)
+            columns = list(rows[0].keys()) if rows else []
+            response = SimpleNamespace(
+                statement_id=statement_id,
+                status=SimpleNamespace(state=StatementState.SUCCEEDED),
+                result=SimpleNamespace(
+                    data_array=[[row.get(c) for c in columns] for row in rows] or None,
+                    manifest=SimpleNamespace(
+                        schema=SimpleNamespace(columns=[SimpleNamespace(name=c) for c in columns])
+                    ),
+                ),
+            )
+            with self._lock:
+                self._responses[statement] = response
+        return response
+
+
+class StubWorkspaceClient:
+    """The WorkspaceClient surface DatabricksClient and the agent touch, backed by a StubBackend"""
+
+    def __init__(self, backend: StubBackend, host: str = "https://bench.cloud.databricks.com"):
+        self.config = SimpleNamespace(host=host, token="bench-token")
+        self.statement_execution = _StubStatementExecution(backend)
+        self.backend = backend
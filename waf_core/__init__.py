@@ -7,6 +7,8 @@ from the dashboard into Python functions for use by REST API, MCP, and Agent ser
 
 # Use relative imports (standard Python package pattern)
 from .databricks_client import DatabricksClient
+from .backends import ExecutionBackend, DuckDBBackend, backend_from_env
+from .recording import StatementStore, ReplayBackend, StatementNotRecorded
 from .models import (
     PillarScore,
     Metric,
@@ -20,13 +22,25 @@ from .queries import (
     get_cost_scores,
     get_performance_scores,
     get_all_scores,
+    get_pillar_scores,
+    get_pillar_for_waf_id,
     get_summary_scores,
-    get_metric_by_id
+    get_metric_by_id,
+    get_latest_run_id,
+    check_waf_access
 )
+from .snapshot import ScoreSnapshotCache
+from .scheduler import StatementScheduler, WarehouseSaturated, statement_priority
 
 __version__ = "1.0.0"
 __all__ = [
     "DatabricksClient",
+    "ExecutionBackend",
+    "DuckDBBackend",
+    "backend_from_env",
+    "StatementStore",
+    "ReplayBackend",
+    "StatementNotRecorded",
     "PillarScore",
     "Metric",
     "PrincipleScore",
@@ -37,6 +51,14 @@ __all__ = [
     "get_cost_scores",
     "get_performance_scores",
     "get_all_scores",
+    "get_pillar_scores",
+    "get_pillar_for_waf_id",
     "get_summary_scores",
     "get_metric_by_id",
+    "get_latest_run_id",
+    "check_waf_access",
+    "ScoreSnapshotCache",
+    "StatementScheduler",
+    "WarehouseSaturated",
+    "statement_priority",
 ]
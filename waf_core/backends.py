@@ -0,0 +1,179 @@
+"""
+Pluggable SQL execution backends for DatabricksClient
+
+By default DatabricksClient.execute_query_sdk runs statements on a SQL
+warehouse through the Statement Execution API. With a backend configured it
+hands them to the backend instead:
+
+    DuckDBBackend - offline: DuckDB over Parquet snapshots of the system.*
+                    tables, through the dialect shim in
+                    streamlit-waf-automation/reload_local.py. The assessment
+                    runs on a laptop, and CI can time queries deterministically.
+    ReplayBackend - responses recorded from a warehouse (recording.py),
+                    served with optional simulated latency through a stand-in
+                    Statement Execution API, so the client parses them exactly
+                    as it parses live responses.
+
+Pass one explicitly (DatabricksClient(backend=DuckDBBackend(...))) or select
+it with environment variables:
+    WAF_BACKEND       - "duckdb" for the offline backend, "replay" for recorded
+                        responses (default: SQL warehouse)
+    WAF_SNAPSHOT_DIR  - directory of system/<schema>/<table> Parquet snapshots
+    WAF_LOCAL_DB      - DuckDB file holding waf_cache (default <snapshot dir>/<catalog>.duckdb)
+    WAF_REPLAY_DIR    - store to replay from (see recording.py for the latency settings)
+"""
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionBackend:
+    """Runs a SQL statement and returns its rows as dictionaries"""
+
+    name = "base"
+
+    # Statement Execution API stand-in (execute_statement / get_statement /
+    # get_statement_result_chunk_n). When set, execute_query_sdk runs statements
+    # through it and the client's own result parsing instead of calling execute().
+    statement_execution = None
+
+    def execute(self, query: str, timeout: int = 30) -> List[Dict[str, Any]]:
+        """
+        Execute a query and return results as list of dictionaries
+
+        Args:
+            query: SQL query string (Databricks SQL)
+            timeout: Query timeout in seconds
+
+        Returns:
+            List of dictionaries representing query results
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the backend's resources"""
+
+
+def _wire_value(value: Any) -> Optional[str]:
+    """A value as the Statement Execution API returns it (JSON_ARRAY rows hold strings)"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _load_local_engine():
+    """Import reload_local.py, which lives with the reload scripts in streamlit-waf-automation"""
+    try:
+        import reload_local
+    except ImportError:
+        engine_dir = str(Path(__file__).parent.parent / "streamlit-waf-automation")
+        if engine_dir not in sys.path:
+            sys.path.append(engine_dir)
+        import reload_local
+    return reload_local
+
+
+class DuckDBBackend(ExecutionBackend):
+    """DuckDB over Parquet snapshots of the system tables (needs duckdb and sqlglot)"""
+
+    name = "duckdb"
+
+    def __init__(
+        self,
+        snapshot_dir: str,
+        catalog: Optional[str] = None,
+        database: Optional[str] = None,
+        read_only: bool = False
+    ):
+        """
+        Initialize the offline backend
+
+        Args:
+            snapshot_dir: Directory of system/<schema>/<table> Parquet snapshots
+            catalog: Catalog whose waf_cache the queries read (defaults to WAF_CATALOG, then "main")
+            database: DuckDB file for that catalog (default <snapshot_dir>/<catalog>.duckdb)
+            read_only: Open the DuckDB file read-only
+        """
+        self._engine = _load_local_engine()
+        self.snapshot_dir = snapshot_dir
+        self.catalog = catalog or os.getenv("WAF_CATALOG") or "main"
+        self.database = database
+        self.read_only = read_only
+        self._local = threading.local()
+        # Open once up front so a bad snapshot directory fails at startup
+        self._connection()
+        logger.info(f"DuckDB backend over {len(self._engine.snapshot_tables(snapshot_dir))} "
+                    f"system table snapshot(s) in {snapshot_dir}")
+
+    def _connection(self):
+        # DuckDB connections are not thread-safe; one per thread, all on the same database
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._engine.connect(self.snapshot_dir, self.catalog, self.database, self.read_only)
+            self._local.conn = conn
+        return conn
+
+    def execute(self, query: str, timeout: int = 30) -> List[Dict[str, Any]]:
+        cursor = self._connection().cursor()
+        timer = threading.Timer(timeout, cursor.cancel) if timeout else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+        try:
+            cursor.execute(query)
+            columns = [d[0] for d in cursor.description or []]
+            # Same shape as the warehouse path, so callers parse both identically
+            results = [{c: _wire_value(v) for c, v in zip(columns, row)} for row in cursor.fetchall()]
+        except self._engine.LocalSQLError as e:
+            if "cancelled" in str(e).lower():
+                raise TimeoutError(f"Query timeout: the query took longer than {timeout} seconds.")
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+        logger.info(f"Query executed successfully via DuckDB, returned {len(results)} rows")
+        return results
+
+
+_ENV_BACKEND: Optional[ExecutionBackend] = None
+_ENV_BACKEND_LOCK = threading.Lock()
+
+
+def backend_from_env() -> Optional[ExecutionBackend]:
+    """Backend selected by WAF_BACKEND (one per process), or None for the SQL warehouse"""
+    global _ENV_BACKEND
+    name = os.getenv("WAF_BACKEND", "").strip().lower()
+    if name in ("", "databricks", "warehouse"):
+        return None
+    if name not in ("duckdb", "local", "replay"):
+        raise ValueError(f"Unknown WAF_BACKEND: {name} (expected databricks, duckdb or replay)")
+    with _ENV_BACKEND_LOCK:
+        if _ENV_BACKEND is None and name == "replay":
+            from .recording import ReplayBackend
+            replay_dir = os.getenv("WAF_REPLAY_DIR")
+            if not replay_dir:
+                raise ValueError("WAF_BACKEND=replay requires WAF_REPLAY_DIR")
+            _ENV_BACKEND = ReplayBackend(
+                replay_dir,
+                latency=float(os.getenv("WAF_REPLAY_LATENCY", "0")),
+                speed=float(os.getenv("WAF_REPLAY_SPEED", "0"))
+            )
+        elif _ENV_BACKEND is None:
+            snapshot_dir = os.getenv("WAF_SNAPSHOT_DIR")
+            if not snapshot_dir:
+                raise ValueError("WAF_BACKEND=duckdb requires WAF_SNAPSHOT_DIR")
+            _ENV_BACKEND = DuckDBBackend(snapshot_dir, database=os.getenv("WAF_LOCAL_DB") or None)
+        return _ENV_BACKEND
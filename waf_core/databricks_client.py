@@ -1,20 +1,30 @@
 """
 Databricks SQL API Client Wrapper
 """
+import hashlib
 import logging
 from typing import Optional, List, Dict, Any
 from databricks.sdk import WorkspaceClient
 from databricks.sdk.service.sql import StatementState
 from databricks.sql import connect
 from typing import TYPE_CHECKING
+from . import tracing
+from .metrics import STATEMENT_DURATION, STATEMENT_FAILURES
+from .scheduler import current_priority, get_scheduler
+from .backends import ExecutionBackend, backend_from_env
+from .recording import StatementNotRecorded, StatementStore, recorder_from_env
 
 if TYPE_CHECKING:
     # Type hint only - Connection is not directly importable
     from databricks.sql import Connection
+import os
 import time
 
 logger = logging.getLogger(__name__)
 
+# Look each traced statement up in Query History for queue / execution time (see tracing.py)
+TRACE_QUERY_METRICS = os.getenv("WAF_TRACE_QUERY_METRICS", "false").lower() in ("1", "true", "yes")
+
 
 class DatabricksClient:
     """Wrapper for Databricks SQL API operations"""
@@ -24,7 +34,9 @@ class DatabricksClient:
         workspace_url: Optional[str] = None,
         token: Optional[str] = None,
         warehouse_id: Optional[str] = None,
-        workspace_client: Optional[WorkspaceClient] = None
+        workspace_client: Optional[WorkspaceClient] = None,
+        backend: Optional[ExecutionBackend] = None,
+        record_dir: Optional[str] = None
     ):
         """
         Initialize Databricks client
@@ -34,7 +46,11 @@ class DatabricksClient:
             token: Databricks personal access token (optional if using workspace_client or SP)
             warehouse_id: SQL Warehouse ID (required for SQL queries)
             workspace_client: Optional pre-configured WorkspaceClient (uses SP if None and in Databricks Apps)
+            backend: Optional execution backend for execute_query_sdk (defaults to WAF_BACKEND, see backends.py)
+            record_dir: Record warehouse responses into this directory (defaults to WAF_RECORD_DIR, see recording.py)
         """
+        self.backend = backend or backend_from_env()
+        self.recorder: Optional[StatementStore] = StatementStore(record_dir) if record_dir else recorder_from_env()
         if workspace_client:
             # Use provided WorkspaceClient (may be SP, PAT, or OAuth-based)
             self.w = workspace_client
@@ -60,6 +76,11 @@ class DatabricksClient:
             self.workspace_url = workspace_url
             self.token = token
             self.w = WorkspaceClient(host=workspace_url, token=token)
+        elif self.backend is not None:
+            # Offline backend: no workspace to authenticate against
+            self.w = None
+            self.workspace_url = None
+            self.token = None
         else:
             # Default: Use app's Service Principal (WorkspaceClient() uses platform-provided SP creds)
             # This works in Databricks Apps where DATABRICKS_CLIENT_ID, DATABRICKS_CLIENT_SECRET, DATABRICKS_HOST are provided
@@ -70,6 +91,18 @@ class DatabricksClient:
         self.warehouse_id = warehouse_id
         self._connection = None  # Connection object from databricks.sql.connect()
     
+    @property
+    def identity(self) -> str:
+        """
+        Opaque key for the identity statements run as, for caches shared across callers
+
+        A hash of the token (PAT / OBO), else the service principal's client id.
+        """
+        if self.token:
+            return "token:" + hashlib.sha256(self.token.encode("utf-8")).hexdigest()[:16]
+        client_id = getattr(getattr(self.w, "config", None), "client_id", None)
+        return f"sp:{client_id}" if client_id else "default"
+    
     def get_connection(self):
         """Get or create SQL connection"""
         if self._connection is None or self._connection.is_closed:
@@ -139,7 +172,9 @@ class DatabricksClient:
         self,
         query: str,
         warehouse_id: Optional[str] = None,
-        timeout: int = 30
+        timeout: int = 30,
+        parameters: Optional[Dict[str, Any]] = None,
+        name: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Execute query using Databricks SDK (alternative method)
@@ -148,11 +183,66 @@ class DatabricksClient:
             query: SQL query string
             warehouse_id: SQL Warehouse ID (uses instance default if not provided)
             timeout: Query timeout in seconds (must be between 5-50, default: 30)
+            parameters: Optional query parameters (:param_name format), substituted into the text
+            name: Catalogue entry (e.g. "cost.waf_controls") labelling the statement metrics
             
         Returns:
             List of dictionaries representing query results
+
+        Raises:
+            WarehouseSaturated: If admission control (scheduler.py) refused the statement
         """
-        warehouse_id = warehouse_id or self.warehouse_id
+        if parameters:
+            for key, value in parameters.items():
+                # Simple parameter replacement (for :param_name format)
+                query = query.replace(f":{key}", str(value))
+
+        with tracing.span(
+            "waf.sql.statement",
+            {"db.system": "databricks", "db.query.text": query[:1000]},
+            kind=tracing.SPAN_KIND_CLIENT
+        ) as span:
+            scheduler = get_scheduler()
+            if scheduler is None:
+                return self._run_statement(query, warehouse_id, timeout, parameters, span, name)
+            priority = current_priority()
+            span.set_attribute("waf.sql.priority", priority)
+            with scheduler.slot(priority) as queued:
+                span.set_attribute("waf.sql.queue_ms", round(queued * 1000, 1))
+                return self._run_statement(query, warehouse_id, timeout, parameters, span, name)
+
+    def _run_statement(self, query, warehouse_id, timeout, parameters, span, name=None) -> List[Dict[str, Any]]:
+        """
+        Run one admitted statement on the configured backend or the warehouse
+
+        Duration and failures are recorded here, so queue wait (waf.sql.queue_ms)
+        and admission rejections (waf_statement_rejections_total) stay out of them.
+        """
+        name = name or "adhoc"
+        with STATEMENT_DURATION.time(query=name):
+            try:
+                if self.backend is not None:
+                    span.set_attribute("waf.backend", self.backend.name)
+                if self.backend is not None and self.backend.statement_execution is None:
+                    results = self.backend.execute(query, timeout=timeout)
+                    span.set_attribute("db.response.returned_rows", len(results))
+                    return results
+                return self._execute_statement(query, warehouse_id, timeout, parameters, span)
+            except Exception as e:
+                STATEMENT_FAILURES.inc(query=name, error=type(e).__name__)
+                raise
+
+    def _execute_statement(
+        self,
+        query: str,
+        warehouse_id: Optional[str],
+        timeout: int,
+        parameters: Optional[Dict[str, Any]],
+        span
+    ) -> List[Dict[str, Any]]:
+        """Run one statement through the Statement Execution API (the warehouse's, or a backend's stand-in)"""
+        statements = self.backend.statement_execution if self.backend is not None else self.w.statement_execution
+        warehouse_id = warehouse_id or self.warehouse_id or (self.backend.name if self.backend is not None else None)
         if not warehouse_id:
             raise ValueError("warehouse_id is required")
         
@@ -166,11 +256,18 @@ class DatabricksClient:
         try:
             # Use SQL Execution API
             # Note: wait_timeout must be between 5-50 seconds
-            execution = self.w.statement_execution.execute_statement(
+            started = time.monotonic()
+            execution = statements.execute_statement(
                 warehouse_id=warehouse_id,
                 statement=query,
                 wait_timeout=f"{timeout}s"
             )
+            submitted = time.monotonic()
+            span.set_attributes({
+                "db.databricks.statement_id": execution.statement_id,
+                "db.databricks.warehouse_id": warehouse_id,
+                "waf.sql.submit_ms": round((submitted - started) * 1000, 1),
+            })
 
             # Check execution state
             # Note: State might be PENDING if query takes longer than wait_timeout
@@ -231,7 +328,7 @@ class DatabricksClient:
                 # Also try to get statement details if available
                 if hasattr(execution, 'statement_id'):
                     try:
-                        statement_details = self.w.statement_execution.get_statement(execution.statement_id)
+                        statement_details = statements.get_statement(execution.statement_id)
                         logger.error(f"Statement details: {statement_details}")
                     except Exception as e:
                         logger.debug(f"Could not get statement details: {e}")
@@ -240,23 +337,36 @@ class DatabricksClient:
             
             # Extract results
             results = []
+            chunks = []
+            manifest = None
             # Always use get_statement() to get the full result with schema
             try:
-                statement_details = self.w.statement_execution.get_statement(execution.statement_id)
+                statement_details = statements.get_statement(execution.statement_id)
                 
                 # Check if we have result data
                 if statement_details.result and hasattr(statement_details.result, 'data_array'):
-                    data_array = statement_details.result.data_array
+                    # Large results arrive in chunks; the statement only carries the first
+                    chunks = [statement_details.result.data_array or []]
+                    next_chunk = getattr(statement_details.result, 'next_chunk_index', None)
+                    while next_chunk is not None:
+                        chunk = statements.get_statement_result_chunk_n(
+                            execution.statement_id, next_chunk
+                        )
+                        chunks.append(chunk.data_array or [])
+                        next_chunk = getattr(chunk, 'next_chunk_index', None)
+                    data_array = [row for chunk in chunks for row in chunk]
+                    manifest = getattr(statement_details.result, 'manifest', None) or \
+                        getattr(statement_details, 'manifest', None)
                     
                     if data_array:
                         # Get column names from manifest schema
                         column_names = []
-                        if (hasattr(statement_details.result, 'manifest') and 
-                            statement_details.result.manifest and
-                            hasattr(statement_details.result.manifest, 'schema') and
-                            statement_details.result.manifest.schema and
-                            hasattr(statement_details.result.manifest.schema, 'columns')):
-                            columns = statement_details.result.manifest.schema.columns
+                        # The SDK carries the manifest on the statement, not on result
+                        if (manifest is not None and
+                            hasattr(manifest, 'schema') and
+                            manifest.schema and
+                            hasattr(manifest.schema, 'columns')):
+                            columns = manifest.schema.columns
                             column_names = [col.name for col in columns]
                         else:
                             # Fallback: infer column names from first row
@@ -297,6 +407,20 @@ class DatabricksClient:
                 else:
                     raise Exception(f"Could not extract results: {e}")
             
+            byte_count = getattr(manifest, 'total_byte_count', None) if manifest is not None else None
+            span.set_attributes({
+                "waf.sql.fetch_ms": round((time.monotonic() - submitted) * 1000, 1),
+                "waf.sql.chunks": len(chunks),
+                "db.response.returned_rows": len(results),
+                "db.response.bytes": byte_count,
+            })
+            if TRACE_QUERY_METRICS and tracing.enabled() and self.backend is None:
+                self._trace_query_metrics(span, execution.statement_id)
+
+            if self.recorder is not None and self.backend is None:
+                self._record(query, parameters, chunks, manifest, time.monotonic() - started,
+                             execution.statement_id, warehouse_id)
+            
             logger.info(f"Query executed successfully via SDK, returned {len(results)} rows")
             return results
             
@@ -304,6 +428,9 @@ class DatabricksClient:
             # Re-raise ValueError (e.g., missing warehouse_id) as-is
             logger.error(f"Configuration error: {str(e)}")
             raise
+        except StatementNotRecorded:
+            # Replay store miss: re-raise as-is so it is not mistaken for a warehouse error
+            raise
         except Exception as e:
             # Provide more detailed error information
             error_msg = str(e)
@@ -319,6 +446,53 @@ class DatabricksClient:
             else:
                 raise Exception(f"Query execution failed: {error_msg}")
     
+    def _trace_query_metrics(self, span, statement_id: str):
+        """Add warehouse-side timings from Query History to a statement span (best effort)"""
+        try:
+            from databricks.sdk.service.sql import QueryFilter
+            response = self.w.query_history.list(
+                filter_by=QueryFilter(statement_ids=[statement_id]),
+                include_metrics=True
+            )
+            infos = getattr(response, 'res', None) or []
+            metrics = infos[0].metrics if infos and infos[0].metrics else None
+            if metrics is None:
+                return
+            queued_at = min(
+                (t for t in (metrics.provisioning_queue_start_timestamp,
+                             metrics.overloading_queue_start_timestamp) if t),
+                default=None
+            )
+            span.set_attributes({
+                "waf.sql.queue_ms": (metrics.query_compilation_start_timestamp - queued_at)
+                if queued_at and metrics.query_compilation_start_timestamp else 0,
+                "waf.sql.compile_ms": metrics.compilation_time_ms,
+                "waf.sql.execution_ms": metrics.execution_time_ms,
+                "waf.sql.result_fetch_ms": metrics.result_fetch_time_ms,
+                "waf.sql.total_ms": metrics.total_time_ms,
+                "waf.sql.read_bytes": metrics.read_bytes,
+                "waf.sql.rows_produced": metrics.rows_produced_count,
+                "waf.sql.result_from_cache": metrics.result_from_cache,
+            })
+        except Exception as e:
+            logger.debug(f"Query History lookup failed for {statement_id}: {e}")
+
+    def _record(self, query, parameters, chunks, manifest, elapsed, statement_id, warehouse_id):
+        """Save a warehouse response for replay; never fails the query itself"""
+        try:
+            key = self.recorder.save(
+                query,
+                chunks,
+                manifest=manifest,
+                parameters=parameters,
+                elapsed=elapsed,
+                statement_id=statement_id,
+                warehouse_id=warehouse_id
+            )
+            logger.debug(f"Recorded statement {key[:12]} ({elapsed:.3f}s)")
+        except Exception as e:
+            logger.warning(f"Could not record statement: {e}")
+    
     def close(self):
         """Close SQL connection"""
         if self._connection and not self._connection.is_closed:
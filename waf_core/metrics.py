@@ -0,0 +1,281 @@
+"""
+Prometheus-style process metrics
+
+Counters, gauges and histograms kept in process memory and rendered in the
+Prometheus text exposition format (0.0.4) by render(). waf_api serves them at
+/metrics and the MCP server's HTTP transport at /metrics, so any Prometheus
+scraper (or the Databricks Apps logs via curl) can read:
+
+    waf_http_requests_total                  requests per method, route template and status
+    waf_http_request_duration_seconds        request latency per method and route template
+    waf_http_requests_in_flight              requests being handled now
+    waf_cache_requests_total                 hits / misses per cache (score_snapshot, agent_response, agent_tools)
+    waf_statement_duration_seconds           warehouse statement time per query name and result
+    waf_statement_failures_total             failed statements per query name and exception type
+    waf_statement_queue_seconds              time waiting for a warehouse slot per priority and result
+    waf_statement_rejections_total           statements refused by admission control per priority and reason
+    waf_statements_running / _queued         statements holding / waiting for a warehouse slot
+    waf_token_validation_duration_seconds    current_user.me() token checks per service and result
+    waf_model_call_duration_seconds          model-serving calls per endpoint and result
+
+Query names are catalogue entries ("cost.waf_controls"), so label cardinality
+stays bounded. Values are per process; with several workers, scrape each.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; statements and model calls run far longer than routes that hit a cache
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Labelled series of one metric family"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value) -> List[str]:
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, +Inf last, then sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Observe the duration of the enclosed block
+
+        A "result" label, if the histogram has one and it is not given, is
+        filled with "ok" or "error" depending on whether the block raised.
+        """
+        started = time.perf_counter()
+        result = "ok"
+        try:
+            yield
+        except BaseException:
+            result = "error"
+            raise
+        finally:
+            if "result" in self.labelnames and "result" not in labels:
+                labels["result"] = result
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def _render_series(self, key, series) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{self._labels(key, ('le', _format_value(bound)))} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(series[-1])}")
+        lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Named metric families rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered with a different type or labels")
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Reset every series (tests and benchmarks)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render() -> str:
+    """Every registered metric in Prometheus text format"""
+    return REGISTRY.render()
+
+
+# ---------------------------------------------------------------------------
+# WAF metrics
+# ---------------------------------------------------------------------------
+
+HTTP_REQUESTS = counter(
+    "waf_http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+HTTP_LATENCY = histogram(
+    "waf_http_request_duration_seconds", "HTTP request latency until the response starts", ("method", "route"))
+HTTP_IN_FLIGHT = gauge(
+    "waf_http_requests_in_flight", "HTTP requests being handled")
+CACHE_REQUESTS = counter(
+    "waf_cache_requests_total", "Cache lookups by outcome", ("cache", "result"))
+STATEMENT_DURATION = histogram(
+    "waf_statement_duration_seconds", "Warehouse statement wall time", ("query", "result"))
+STATEMENT_FAILURES = counter(
+    "waf_statement_failures_total", "Failed warehouse statements", ("query", "error"))
+STATEMENT_QUEUE_TIME = histogram(
+    "waf_statement_queue_seconds", "Time waiting for a warehouse statement slot", ("priority", "result"),
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+STATEMENT_REJECTIONS = counter(
+    "waf_statement_rejections_total", "Statements refused by admission control", ("priority", "reason"))
+STATEMENTS_RUNNING = gauge(
+    "waf_statements_running", "Statements holding a warehouse slot")
+STATEMENTS_QUEUED = gauge(
+    "waf_statements_queued", "Statements waiting for a warehouse slot", ("priority",))
+TOKEN_VALIDATION = histogram(
+    "waf_token_validation_duration_seconds", "Token validation (current_user.me) latency", ("service", "result"))
+MODEL_CALLS = histogram(
+    "waf_model_call_duration_seconds", "Model serving endpoint call latency", ("endpoint", "result"))
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    """Count one cache lookup"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
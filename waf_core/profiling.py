@@ -0,0 +1,325 @@
+"""
+Opt-in sampling profiler for slow requests, tool calls and reloads
+
+A profile is a wall-clock sampling profile of the threads doing the work (or
+every thread, for batch runs) plus that unit of work's statement timings.
+Besides the calling thread, every thread that opens a tracing span in the
+profiled context (a threadpool handler, an agent tool call) is sampled.
+It is stored as two files named by profile id:
+
+    <WAF_PROFILE_DIR>/<id>.collapsed   collapsed stacks ("frame;frame;frame count"),
+                                       the input format of flamegraph.pl, speedscope
+                                       and inferno
+    <WAF_PROFILE_DIR>/<id>.json        name, duration, sample count, hottest frames
+                                       and per-statement timings
+
+Nothing is sampled unless a caller opts in:
+
+    waf_api     X-WAF-Profile: <WAF_PROFILE_TOKEN> header, or a random
+                WAF_PROFILE_SAMPLE_RATE fraction of requests
+    waf_mcp     tools listed in WAF_PROFILE_TOOLS, or WAF_PROFILE_SAMPLE_RATE
+    reload      reload_data.py --profile
+
+    WAF_PROFILE_DIR          - where profiles are stored (default waf_profiles)
+    WAF_PROFILE_KEEP         - newest profiles kept there, older ones are deleted
+                               on save (default 200, 0 keeps all)
+    WAF_PROFILE_INTERVAL_MS  - sampling interval (default 5)
+
+Samples are wall-clock, so time blocked on the warehouse shows up as frames
+in the SDK / connector. The module only needs the standard library and has
+no package-relative imports at load time, so the reload scripts load it by
+path without importing the rest of waf_core.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_INTERVAL = float(os.getenv("WAF_PROFILE_INTERVAL_MS", "5")) / 1000.0
+MAX_DEPTH = 128
+
+
+def profile_dir() -> Path:
+    return Path(os.getenv("WAF_PROFILE_DIR", "waf_profiles"))
+
+
+def keep_profiles() -> int:
+    try:
+        return int(os.getenv("WAF_PROFILE_KEEP", "200") or 0)
+    except ValueError:
+        return 200
+
+
+def sample_rate() -> float:
+    try:
+        return float(os.getenv("WAF_PROFILE_SAMPLE_RATE", "0") or 0)
+    except ValueError:
+        return 0.0
+
+
+def sampled(rate: Optional[float] = None) -> bool:
+    """Whether to profile this unit of work under random sampling"""
+    rate = sample_rate() if rate is None else rate
+    return rate > 0 and random.random() < rate
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Collects stack samples of selected threads from a background thread"""
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_INTERVAL,
+        all_threads: bool = False,
+        caller_thread: bool = True
+    ):
+        """
+        Initialize the profiler
+
+        Args:
+            interval: Seconds between samples
+            all_threads: Sample every thread, not just the one that calls start()
+                and those added with add_thread()
+            caller_thread: Sample the thread that calls start()
+        """
+        self.interval = max(interval, 0.001)
+        self.all_threads = all_threads
+        self.caller_thread = caller_thread
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._threads = set()
+        self._caller: Optional[int] = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def add_thread(self, ident: Optional[int] = None) -> None:
+        """Also sample this thread (default: the calling thread)"""
+        self._threads.add(ident or threading.get_ident())
+
+    def join_thread(self) -> None:
+        """add_thread() for the calling thread, unless it is an excluded start() caller"""
+        ident = threading.get_ident()
+        if self.caller_thread or ident != self._caller:
+            self._threads.add(ident)
+
+    def start(self) -> "SamplingProfiler":
+        self._caller = threading.get_ident()
+        if self.caller_thread:
+            self.add_thread()
+        self._sampler = threading.Thread(target=self._run, name="waf-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == me or (not self.all_threads and ident not in self._threads):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    code = frame.f_code
+                    name = names.get(code)
+                    if name is None:
+                        name = names[code] = _frame_name(code)
+                    stack.append(name)
+                    frame = frame.f_back
+                if self.all_threads:
+                    stack.append(f"thread {ident}")
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format, one "stack count" line each"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def hottest(self, limit: int = 15) -> List[Dict[str, Any]]:
+        """Frames with the most samples on top of the stack (self time)"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = max(self.samples, 1)
+        return [
+            {"frame": frame, "samples": count, "percent": round(100.0 * count / total, 1)}
+            for frame, count in leaves.most_common(limit)
+        ]
+
+
+class Profile:
+    """One profiled unit of work: samples, statement timings and metadata"""
+
+    def __init__(self, name: str, meta: Optional[Dict[str, Any]] = None):
+        stamp = datetime.now(timezone.utc)
+        self.id = f"{stamp:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.name = name
+        self.meta = dict(meta or {})
+        self.started_at = stamp.isoformat(timespec="seconds")
+        self.duration_s: Optional[float] = None
+        self.statements: List[Dict[str, Any]] = []
+        self.profiler: Optional[SamplingProfiler] = None
+        self._lock = threading.Lock()
+
+    def add_statement(self, name: str, seconds: float, **details: Any) -> None:
+        """Record one statement's timing (details: statement_id, rows, status, ...)"""
+        entry = {"name": name, "ms": round(seconds * 1000, 1)}
+        entry.update({k: v for k, v in details.items() if v is not None})
+        with self._lock:
+            self.statements.append(entry)
+
+    def add_spans(self, spans) -> None:
+        """Statement timings from spans captured by tracing.capture()"""
+        by_parent = {s.parent_id: s for s in spans if s.name == "waf.sql.statement"}
+        for span in spans:
+            if span.name != "waf.query" or span.end_ns is None:
+                continue
+            statement = by_parent.get(span.span_id)
+            attributes = statement.attributes if statement is not None else {}
+            self.add_statement(
+                span.attributes.get("waf.query.name", "adhoc"),
+                (span.end_ns - span.start_ns) / 1e9,
+                statement_id=attributes.get("db.databricks.statement_id"),
+                rows=attributes.get("db.response.returned_rows"),
+                submit_ms=attributes.get("waf.sql.submit_ms"),
+                fetch_ms=attributes.get("waf.sql.fetch_ms"),
+                queue_ms=attributes.get("waf.sql.queue_ms"),
+                status="error" if span.status == 2 else "ok",
+            )
+
+    def to_dict(self) -> Dict[str, Any]:
+        profiler = self.profiler
+        statement_ms = sum(s["ms"] for s in self.statements)
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_s * 1000, 1) if self.duration_s is not None else None,
+            "meta": self.meta,
+            "interval_ms": round(profiler.interval * 1000, 2) if profiler else None,
+            "samples": profiler.samples if profiler else 0,
+            "hottest_frames": profiler.hottest() if profiler else [],
+            "statement_count": len(self.statements),
+            "statement_ms": round(statement_ms, 1),
+            "statements": sorted(self.statements, key=lambda s: -s["ms"]),
+        }
+
+    def save(self, directory: Optional[Path] = None) -> Path:
+        """Write <id>.collapsed and <id>.json, then prune old profiles; returns the JSON path"""
+        directory = Path(directory or profile_dir())
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.profiler is not None:
+            (directory / f"{self.id}.collapsed").write_text(self.profiler.collapsed(), encoding="utf-8")
+        path = directory / f"{self.id}.json"
+        path.write_text(json.dumps(self.to_dict(), indent=2, default=str) + "\n", encoding="utf-8")
+        prune(directory)
+        return path
+
+
+def prune(directory: Optional[Path] = None, keep: Optional[int] = None) -> int:
+    """
+    Delete all but the newest `keep` profiles (default WAF_PROFILE_KEEP)
+
+    Ids start with their UTC timestamp, so name order is age order.
+
+    Returns:
+        Number of profiles deleted
+    """
+    keep = keep_profiles() if keep is None else keep
+    if keep <= 0:
+        return 0
+    directory = Path(directory or profile_dir())
+    stale = sorted(directory.glob("*.json"))[:-keep]
+    for path in stale:
+        for artifact in (path, path.with_suffix(".collapsed")):
+            try:
+                artifact.unlink()
+            except FileNotFoundError:
+                pass  # pruned concurrently by another worker
+    return len(stale)
+
+
+def _span_capture(on_thread):
+    """tracing.capture() when loaded as part of waf_core, else a no-op"""
+    try:
+        from . import tracing
+    except ImportError:
+        return nullcontext(None)
+    return tracing.capture(on_thread=on_thread)
+
+
+@contextmanager
+def profiled(
+    name: str,
+    meta: Optional[Dict[str, Any]] = None,
+    all_threads: bool = False,
+    directory: Optional[Path] = None,
+    interval: float = DEFAULT_INTERVAL,
+    caller_thread: bool = True
+) -> Iterator[Profile]:
+    """
+    Profile the enclosed block and store the result
+
+    Statement timings are taken from the waf.query spans the block produces
+    (recorded even when WAF_TRACING is off); callers without spans add their
+    own with Profile.add_statement().
+
+    Args:
+        name: What was profiled (route, tool or script)
+        meta: Extra fields stored in the JSON (status, arguments, ...)
+        all_threads: Sample every thread instead of only the block's own threads
+        directory: Output directory (default WAF_PROFILE_DIR)
+        interval: Seconds between samples
+        caller_thread: Sample the calling thread; False when it is an event loop
+            shared with other requests (threads opening spans are still sampled)
+    """
+    profile = Profile(name, meta)
+    profile.profiler = SamplingProfiler(interval=interval, all_threads=all_threads,
+                                        caller_thread=caller_thread)
+    started = time.perf_counter()
+    spans = None
+    try:
+        with profile.profiler, _span_capture(profile.profiler.join_thread) as spans:
+            yield profile
+    finally:
+        profile.duration_s = time.perf_counter() - started
+        if spans:
+            profile.add_spans(spans)
+        profile.save(directory)
+
+
+def load(profile_id: str, directory: Optional[Path] = None, collapsed: bool = False) -> Optional[str]:
+    """
+    A stored profile's JSON (or collapsed stacks), or None if there is no such profile
+
+    Raises:
+        ValueError: If profile_id is not a profile id (path traversal guard)
+    """
+    if not profile_id or not all(c.isalnum() or c in "-T" for c in profile_id):
+        raise ValueError(f"Invalid profile id: {profile_id}")
+    path = Path(directory or profile_dir()) / f"{profile_id}.{'collapsed' if collapsed else 'json'}"
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8")
@@ -6,9 +6,12 @@ and return structured Python objects.
 """
 import json
 import logging
+import os
 from pathlib import Path
 from typing import Optional, Dict, Any, List
+from . import tracing
 from .databricks_client import DatabricksClient
+from .scheduler import WarehouseSaturated
 from .models import (
     PillarScore,
     Metric,
@@ -59,17 +62,23 @@ def _get_query(pillar: str, query_type: str) -> str:
         return query_data.get("query", "")
     return ""
 
-def _execute_query(client: DatabricksClient, query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-    """Execute a query and return results"""
+def _execute_query(
+    client: DatabricksClient,
+    query: str,
+    parameters: Optional[Dict[str, Any]] = None,
+    name: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Execute a query and return results (name: catalogue entry, e.g. "cost.waf_controls", for traces and metrics)"""
+    name = name or "adhoc"
     try:
         # Use SDK method which works with both SP and PAT authentication
-        # Replace parameters in query if provided
-        if parameters:
-            for key, value in parameters.items():
-                # Simple parameter replacement (for :param_name format)
-                query = query.replace(f":{key}", str(value))
-        
-        return client.execute_query_sdk(query)
+        # (parameters are substituted there, and kept with recorded responses)
+        with tracing.span("waf.query", {"waf.query.name": name}):
+            return client.execute_query_sdk(query, parameters=parameters, name=name)
+    except WarehouseSaturated as e:
+        # Admission control shed the statement; the caller reports Retry-After
+        logger.warning(f"Query {name} not admitted: {str(e)}")
+        raise
     except ValueError as e:
         # Configuration errors (e.g., missing warehouse_id)
         logger.error(f"Configuration error in query execution: {str(e)}")
@@ -88,6 +97,7 @@ def _execute_query(client: DatabricksClient, query: str, parameters: Optional[Di
         logger.debug(f"Query that failed: {query[:200]}...")  # Log first 200 chars of query
         raise
 
+@tracing.traced("waf.scores.reliability")
 def get_reliability_scores(
     client: DatabricksClient,
     include_metrics: bool = True,
@@ -108,38 +118,40 @@ def get_reliability_scores(
     
     # Get total percentage
     total_query = _get_query("reliability", "total_percentage")
-    total_results = _execute_query(client, total_query)
+    total_results = _execute_query(client, total_query, name="reliability.total_percentage")
     completion_percent = total_results[0].get("completion_percent", 0.0) if total_results else 0.0
     
     metrics = []
     if include_metrics:
         controls_query = _get_query("reliability", "waf_controls")
-        controls_results = _execute_query(client, controls_query)
-        metrics = [
-            Metric(
-                waf_id=row.get("waf_id", ""),
-                principle=row.get("principle", ""),
-                best_practice=row.get("best_practice"),
-                score_percentage=float(row.get("score_percentage", 0.0)),
-                threshold_percentage=float(row.get("threshold_percentage", 0.0)),
-                threshold_met=row.get("threshold_met") == "Met",
-                implemented=row.get("implemented", "Fail"),
-                current_percentage=float(row.get("score_percentage", 0.0))
-            )
-            for row in controls_results
-        ]
+        controls_results = _execute_query(client, controls_query, name="reliability.waf_controls")
+        with tracing.span("waf.models.build", {"waf.model": "Metric", "waf.pillar": "reliability"}):
+            metrics = [
+                Metric(
+                    waf_id=row.get("waf_id", ""),
+                    principle=row.get("principle", ""),
+                    best_practice=row.get("best_practice"),
+                    score_percentage=float(row.get("score_percentage", 0.0)),
+                    threshold_percentage=float(row.get("threshold_percentage", 0.0)),
+                    threshold_met=row.get("threshold_met") == "Met",
+                    implemented=row.get("implemented", "Fail"),
+                    current_percentage=float(row.get("score_percentage", 0.0))
+                )
+                for row in controls_results
+            ]
     
     principles = []
     if include_principles:
         principles_query = _get_query("reliability", "waf_principal_percentage")
-        principles_results = _execute_query(client, principles_query)
-        principles = [
-            PrincipleScore(
-                principle=row.get("principle", ""),
-                completion_percent=float(row.get("completion_percent", 0.0))
-            )
-            for row in principles_results
-        ]
+        principles_results = _execute_query(client, principles_query, name="reliability.waf_principal_percentage")
+        with tracing.span("waf.models.build", {"waf.model": "PrincipleScore", "waf.pillar": "reliability"}):
+            principles = [
+                PrincipleScore(
+                    principle=row.get("principle", ""),
+                    completion_percent=float(row.get("completion_percent", 0.0))
+                )
+                for row in principles_results
+            ]
     
     return PillarScore(
         pillar="reliability",
@@ -148,6 +160,7 @@ def get_reliability_scores(
         principles=principles
     )
 
+@tracing.traced("waf.scores.governance")
 def get_governance_scores(
     client: DatabricksClient,
     include_metrics: bool = True,
@@ -157,38 +170,40 @@ def get_governance_scores(
     logger.info("Fetching Governance scores...")
     
     total_query = _get_query("governance", "total_percentage")
-    total_results = _execute_query(client, total_query)
+    total_results = _execute_query(client, total_query, name="governance.total_percentage")
     completion_percent = total_results[0].get("completion_percent", 0.0) if total_results else 0.0
     
     metrics = []
     if include_metrics:
         controls_query = _get_query("governance", "waf_controls")
-        controls_results = _execute_query(client, controls_query)
-        metrics = [
-            Metric(
-                waf_id=row.get("waf_id", ""),
-                principle=row.get("principle", ""),
-                description=row.get("description"),
-                score_percentage=float(row.get("score_percentage", 0.0)),
-                threshold_percentage=float(row.get("threshold_percentage", 0.0)),
-                threshold_met=row.get("threshold_met") == "Met",
-                implemented=row.get("implemented", "Fail"),
-                current_percentage=float(row.get("score_percentage", 0.0))
-            )
-            for row in controls_results
-        ]
+        controls_results = _execute_query(client, controls_query, name="governance.waf_controls")
+        with tracing.span("waf.models.build", {"waf.model": "Metric", "waf.pillar": "governance"}):
+            metrics = [
+                Metric(
+                    waf_id=row.get("waf_id", ""),
+                    principle=row.get("principle", ""),
+                    description=row.get("description"),
+                    score_percentage=float(row.get("score_percentage", 0.0)),
+                    threshold_percentage=float(row.get("threshold_percentage", 0.0)),
+                    threshold_met=row.get("threshold_met") == "Met",
+                    implemented=row.get("implemented", "Fail"),
+                    current_percentage=float(row.get("score_percentage", 0.0))
+                )
+                for row in controls_results
+            ]
     
     principles = []
     if include_principles:
         principles_query = _get_query("governance", "waf_principal_percentage")
-        principles_results = _execute_query(client, principles_query)
-        principles = [
-            PrincipleScore(
-                principle=row.get("principle", ""),
-                completion_percent=float(row.get("completion_percent", 0.0))
-            )
-            for row in principles_results
-        ]
+        principles_results = _execute_query(client, principles_query, name="governance.waf_principal_percentage")
+        with tracing.span("waf.models.build", {"waf.model": "PrincipleScore", "waf.pillar": "governance"}):
+            principles = [
+                PrincipleScore(
+                    principle=row.get("principle", ""),
+                    completion_percent=float(row.get("completion_percent", 0.0))
+                )
+                for row in principles_results
+            ]
     
     return PillarScore(
         pillar="governance",
@@ -197,6 +212,7 @@ def get_governance_scores(
         principles=principles
     )
 
+@tracing.traced("waf.scores.cost")
 def get_cost_scores(
     client: DatabricksClient,
     include_metrics: bool = True,
@@ -206,38 +222,40 @@ def get_cost_scores(
     logger.info("Fetching Cost Optimization scores...")
     
     total_query = _get_query("cost", "total_percentage")
-    total_results = _execute_query(client, total_query)
+    total_results = _execute_query(client, total_query, name="cost.total_percentage")
     completion_percent = total_results[0].get("completion_percent", 0.0) if total_results else 0.0
     
     metrics = []
     if include_metrics:
         controls_query = _get_query("cost", "waf_controls")
-        controls_results = _execute_query(client, controls_query)
-        metrics = [
-            Metric(
-                waf_id=row.get("waf_id", ""),
-                principle=row.get("principle", ""),
-                best_practice=row.get("best_practice"),
-                score_percentage=float(row.get("score_percentage", 0.0)),
-                threshold_percentage=float(row.get("threshold_percentage", 0.0)),
-                threshold_met=row.get("threshold_met") == "Met",
-                implemented=row.get("implemented", "Fail"),
-                current_percentage=float(row.get("score_percentage", 0.0))
-            )
-            for row in controls_results
-        ]
+        controls_results = _execute_query(client, controls_query, name="cost.waf_controls")
+        with tracing.span("waf.models.build", {"waf.model": "Metric", "waf.pillar": "cost"}):
+            metrics = [
+                Metric(
+                    waf_id=row.get("waf_id", ""),
+                    principle=row.get("principle", ""),
+                    best_practice=row.get("best_practice"),
+                    score_percentage=float(row.get("score_percentage", 0.0)),
+                    threshold_percentage=float(row.get("threshold_percentage", 0.0)),
+                    threshold_met=row.get("threshold_met") == "Met",
+                    implemented=row.get("implemented", "Fail"),
+                    current_percentage=float(row.get("score_percentage", 0.0))
+                )
+                for row in controls_results
+            ]
     
     principles = []
     if include_principles:
         principles_query = _get_query("cost", "waf_principal_percentage")
-        principles_results = _execute_query(client, principles_query)
-        principles = [
-            PrincipleScore(
-                principle=row.get("principle", ""),
-                completion_percent=float(row.get("completion_percent", 0.0))
-            )
-            for row in principles_results
-        ]
+        principles_results = _execute_query(client, principles_query, name="cost.waf_principal_percentage")
+        with tracing.span("waf.models.build", {"waf.model": "PrincipleScore", "waf.pillar": "cost"}):
+            principles = [
+                PrincipleScore(
+                    principle=row.get("principle", ""),
+                    completion_percent=float(row.get("completion_percent", 0.0))
+                )
+                for row in principles_results
+            ]
     
     return PillarScore(
         pillar="cost",
@@ -246,6 +264,7 @@ def get_cost_scores(
         principles=principles
     )
 
+@tracing.traced("waf.scores.performance")
 def get_performance_scores(
     client: DatabricksClient,
     include_metrics: bool = True,
@@ -255,38 +274,40 @@ def get_performance_scores(
     logger.info("Fetching Performance Efficiency scores...")
     
     total_query = _get_query("performance", "total_percentage")
-    total_results = _execute_query(client, total_query)
+    total_results = _execute_query(client, total_query, name="performance.total_percentage")
     completion_percent = total_results[0].get("completion_percent", 0.0) if total_results else 0.0
     
     metrics = []
     if include_metrics:
         controls_query = _get_query("performance", "waf_controls")
-        controls_results = _execute_query(client, controls_query)
-        metrics = [
-            Metric(
-                waf_id=row.get("waf_id", ""),
-                principle=row.get("principle", ""),
-                best_practice=row.get("best_practice"),
-                score_percentage=float(row.get("score_percentage", 0.0)),
-                threshold_percentage=float(row.get("threshold_percentage", 0.0)),
-                threshold_met=row.get("threshold_met") == "Met",
-                implemented=row.get("implemented", "Fail"),
-                current_percentage=float(row.get("score_percentage", 0.0))
-            )
-            for row in controls_results
-        ]
+        controls_results = _execute_query(client, controls_query, name="performance.waf_controls")
+        with tracing.span("waf.models.build", {"waf.model": "Metric", "waf.pillar": "performance"}):
+            metrics = [
+                Metric(
+                    waf_id=row.get("waf_id", ""),
+                    principle=row.get("principle", ""),
+                    best_practice=row.get("best_practice"),
+                    score_percentage=float(row.get("score_percentage", 0.0)),
+                    threshold_percentage=float(row.get("threshold_percentage", 0.0)),
+                    threshold_met=row.get("threshold_met") == "Met",
+                    implemented=row.get("implemented", "Fail"),
+                    current_percentage=float(row.get("score_percentage", 0.0))
+                )
+                for row in controls_results
+            ]
     
     principles = []
     if include_principles:
         principles_query = _get_query("performance", "waf_principal_percentage")
-        principles_results = _execute_query(client, principles_query)
-        principles = [
-            PrincipleScore(
-                principle=row.get("principle", ""),
-                completion_percent=float(row.get("completion_percent", 0.0))
-            )
-            for row in principles_results
-        ]
+        principles_results = _execute_query(client, principles_query, name="performance.waf_principal_percentage")
+        with tracing.span("waf.models.build", {"waf.model": "PrincipleScore", "waf.pillar": "performance"}):
+            principles = [
+                PrincipleScore(
+                    principle=row.get("principle", ""),
+                    completion_percent=float(row.get("completion_percent", 0.0))
+                )
+                for row in principles_results
+            ]
     
     return PillarScore(
         pillar="performance",
@@ -320,29 +341,163 @@ def get_all_scores(
     
     # Get summary
     summary_query = _get_query("summary", "total_percentage_across_pillars")
-    summary_results = _execute_query(client, summary_query)
+    summary_results = _execute_query(client, summary_query, name="summary.total_percentage_across_pillars")
     summary = {
         row.get("pillar", "").lower(): float(row.get("completion_percent", 0.0))
         for row in summary_results
     }
     
-    return WAFScores(
-        reliability=reliability,
-        governance=governance,
-        cost=cost,
-        performance=performance,
-        summary=summary
-    )
+    with tracing.span("waf.models.build", {"waf.model": "WAFScores"}):
+        return WAFScores(
+            reliability=reliability,
+            governance=governance,
+            cost=cost,
+            performance=performance,
+            summary=summary
+        )
 
 def get_summary_scores(client: DatabricksClient) -> Dict[str, float]:
     """Get summary scores across all pillars"""
     summary_query = _get_query("summary", "total_percentage_across_pillars")
-    summary_results = _execute_query(client, summary_query)
+    summary_results = _execute_query(client, summary_query, name="summary.total_percentage_across_pillars")
     return {
         row.get("pillar", "").lower(): float(row.get("completion_percent", 0.0))
         for row in summary_results
     }
 
+def get_latest_run_id(
+    client: DatabricksClient,
+    catalog: Optional[str] = None
+) -> Optional[int]:
+    """
+    Get the run_id of the latest successful (or partial) reload run
+
+    Reads the {catalog}.waf_cache._latest_run pointer, the same row the
+    latest-run views filter on, so a new run_id is only reported once the
+    views serve that run. Falls back to _run_log for catalogs reloaded before
+    the pointer existed. Callers use the run_id to invalidate anything cached
+    from an older run.
+
+    Args:
+        client: Databricks client instance
+        catalog: Unity Catalog name (defaults to WAF_CATALOG env var)
+
+    Returns:
+        Latest run_id, or None if no catalog is configured or the run log is unavailable
+
+    Raises:
+        WarehouseSaturated: If admission control refused the statement
+    """
+    catalog = catalog or os.getenv("WAF_CATALOG", "")
+    if not catalog:
+        return None
+
+    query = f"SELECT MAX(run_id) AS run_id FROM `{catalog}`.`waf_cache`.`_latest_run`"
+    fallback = (
+        f"SELECT MAX(run_id) AS run_id FROM `{catalog}`.`waf_cache`.`_run_log` "
+        f"WHERE status IN ('success', 'partial')"
+    )
+    try:
+        try:
+            results = _execute_query(client, query, name="waf_cache.latest_run")
+        except WarehouseSaturated:
+            raise
+        except Exception:
+            results = _execute_query(client, fallback, name="waf_cache.run_log")
+    except WarehouseSaturated:
+        # A refusal is not "no run": callers must not invalidate on it
+        raise
+    except Exception as e:
+        logger.warning(f"Could not read latest run_id from {catalog}.waf_cache: {e}")
+        return None
+
+    run_id = results[0].get("run_id") if results else None
+    return int(run_id) if run_id is not None else None
+
+
+def check_waf_access(
+    client: DatabricksClient,
+    catalog: Optional[str] = None
+) -> None:
+    """
+    Check that the client's identity can read the WAF results
+
+    One cheap statement under that identity: a LIMIT 0 read of every
+    pillar's waf_controls view (the score data a shared snapshot serves, so
+    read access to the run log alone is not enough), or the cross-pillar
+    summary when no catalog is configured. Services that serve data loaded
+    under another identity (a shared snapshot) call this first.
+
+    Args:
+        client: Databricks client running as the identity to check
+        catalog: Unity Catalog name (defaults to WAF_CATALOG env var)
+
+    Raises:
+        Exception: Whatever the warehouse raised for the check statement
+    """
+    catalog = catalog or os.getenv("WAF_CATALOG", "")
+    if not catalog:
+        get_summary_scores(client)
+        return
+    probe = " UNION ALL ".join(
+        f"(SELECT 1 FROM `{catalog}`.`waf_cache`.`waf_controls_{suffix}` LIMIT 0)"
+        for suffix in ("r", "g", "c", "p")
+    )
+    _execute_query(client, probe, name="waf_cache.access_check")
+
+
+def get_pillar_scores(
+    client: DatabricksClient,
+    pillar: str,
+    include_metrics: bool = True,
+    include_principles: bool = True
+) -> PillarScore:
+    """
+    Get scores for a single pillar by name
+
+    Args:
+        client: Databricks client instance
+        pillar: One of 'reliability', 'governance', 'cost', 'performance'
+        include_metrics: Whether to include individual metrics
+        include_principles: Whether to include principle-level scores
+
+    Returns:
+        PillarScore object for the requested pillar
+
+    Raises:
+        ValueError: If the pillar name is unknown
+    """
+    pillar_fns = {
+        "reliability": get_reliability_scores,
+        "governance": get_governance_scores,
+        "cost": get_cost_scores,
+        "performance": get_performance_scores,
+    }
+    fn = pillar_fns.get((pillar or "").lower())
+    if fn is None:
+        raise ValueError(f"Invalid pillar: {pillar}. Must be one of: {', '.join(pillar_fns)}")
+    return fn(client, include_metrics, include_principles)
+
+def get_pillar_for_waf_id(waf_id: str) -> Optional[str]:
+    """
+    Map a WAF ID to its pillar name from the ID prefix
+
+    Reliability uses R-, Governance DG- (or G-), Cost CO- and Performance PE-.
+
+    Returns:
+        Pillar name, or None if the prefix is not recognised
+    """
+    waf_id = (waf_id or "").upper()
+    if waf_id.startswith("CO"):
+        return "cost"
+    if waf_id.startswith("PE"):
+        return "performance"
+    if waf_id.startswith("DG") or waf_id.startswith("G"):
+        return "governance"
+    if waf_id.startswith("R"):
+        return "reliability"
+    return None
+
 def get_metric_by_id(
     client: DatabricksClient,
     waf_id: str
@@ -357,37 +512,13 @@ def get_metric_by_id(
     Returns:
         Metric object if found, None otherwise
     """
-    # Determine pillar from WAF ID prefix
-    pillar_map = {
-        "R": "reliability",
-        "G": "governance",
-        "C": "CO",  # Cost uses CO prefix
-        "P": "PE",  # Performance uses PE prefix
-    }
-    
-    prefix = waf_id[0] if waf_id else ""
-    if prefix == "C" and waf_id.startswith("CO"):
-        pillar = "cost"
-    elif prefix == "P" and waf_id.startswith("PE"):
-        pillar = "performance"
-    else:
-        pillar = pillar_map.get(prefix, "").lower()
-    
+    pillar = get_pillar_for_waf_id(waf_id)
     if not pillar:
         logger.warning(f"Unknown pillar for WAF ID: {waf_id}")
         return None
     
     # Get all metrics for the pillar
-    if pillar == "reliability":
-        pillar_score = get_reliability_scores(client, include_metrics=True, include_principles=False)
-    elif pillar == "governance":
-        pillar_score = get_governance_scores(client, include_metrics=True, include_principles=False)
-    elif pillar == "cost":
-        pillar_score = get_cost_scores(client, include_metrics=True, include_principles=False)
-    elif pillar == "performance":
-        pillar_score = get_performance_scores(client, include_metrics=True, include_principles=False)
-    else:
-        return None
+    pillar_score = get_pillar_scores(client, pillar, include_metrics=True, include_principles=False)
     
     # Find the metric
     for metric in pillar_score.metrics:
@@ -0,0 +1,288 @@
+"""
+Statement record / replay for DatabricksClient
+
+Record mode captures what the SQL warehouse returned for each statement
+(statement text, parameters, result manifest, every result chunk and the
+wall time) into an on-disk store, one gzipped JSON file per statement keyed
+by the hash of its normalized SQL:
+
+    <record_dir>/<sha256 of normalized SQL>.json.gz
+
+Replay mode (ReplayBackend) serves those responses through the same
+execute_query_sdk call, optionally sleeping for the recorded wall time
+(scaled) or a fixed latency, so slow or large production responses can be
+reproduced offline: profiling the parsing and scoring paths, or running
+the API under load without a warehouse. Replayed statements go through a
+stand-in statement_execution that rebuilds the SDK StatementResponse /
+ResultData payloads chunk by chunk, so the client's pagination, manifest
+and row parsing run exactly as they do against a warehouse.
+
+    WAF_RECORD_DIR          - record every warehouse statement into this directory
+    WAF_BACKEND=replay      - serve statements from WAF_REPLAY_DIR instead of a warehouse
+    WAF_REPLAY_DIR          - store to replay from
+    WAF_REPLAY_LATENCY      - fixed seconds added to every replayed statement (default 0)
+    WAF_REPLAY_SPEED        - multiplier on the recorded wall time (default 0 = no delay, 1 = real time)
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from databricks.sdk.service.sql import ResultData, StatementResponse
+
+from .backends import ExecutionBackend
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Statement text with whitespace collapsed and any trailing semicolon removed"""
+    return _WHITESPACE_RE.sub(" ", sql or "").strip().rstrip(";").rstrip()
+
+
+def statement_key(sql: str) -> str:
+    """Store key for a statement: sha256 of its normalized text"""
+    return hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()
+
+
+class StatementNotRecorded(LookupError):
+    """Raised in replay mode for a statement the store has no response for"""
+
+
+def _as_dict(obj: Any) -> Optional[Dict[str, Any]]:
+    """SDK dataclass (or stand-in) as a JSON-safe dict"""
+    if obj is None:
+        return None
+    if hasattr(obj, "as_dict"):
+        return obj.as_dict()
+    columns = getattr(getattr(obj, "schema", None), "columns", None) or []
+    return {"schema": {"columns": [{"name": c.name, "position": i} for i, c in enumerate(columns)]}}
+
+
+class StatementStore:
+    """Directory of recorded statement responses"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.json.gz"
+
+    def save(
+        self,
+        sql: str,
+        chunks: List[List[Any]],
+        manifest: Any = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        elapsed: Optional[float] = None,
+        statement_id: Optional[str] = None,
+        warehouse_id: Optional[str] = None
+    ) -> str:
+        """
+        Store one statement's response (the latest recording of a statement wins)
+
+        Args:
+            sql: Statement text as executed (parameters already substituted)
+            chunks: data_array of every result chunk, in order
+            manifest: Result manifest (SDK ResultManifest or dict)
+            parameters: :name parameters the statement was built from
+            elapsed: Wall time of the statement in seconds
+            statement_id: Warehouse statement_id
+            warehouse_id: Warehouse that ran it
+
+        Returns:
+            The statement key
+        """
+        key = statement_key(sql)
+        entry = {
+            "version": STORE_VERSION,
+            "key": key,
+            "sql": normalize_sql(sql),
+            "parameters": parameters or {},
+            "manifest": manifest if isinstance(manifest, dict) or manifest is None else _as_dict(manifest),
+            "chunks": chunks,
+            "elapsed_s": round(elapsed, 6) if elapsed is not None else None,
+            "statement_id": statement_id,
+            "warehouse_id": warehouse_id,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        data = gzip.compress(json.dumps(entry, separators=(",", ":"), default=str).encode("utf-8"))
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so concurrent readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._file(key))
+        return key
+
+    def load(self, sql: str) -> Optional[Dict[str, Any]]:
+        """The recorded entry for a statement, or None"""
+        return self.load_key(statement_key(sql))
+
+    def load_key(self, key: str) -> Optional[Dict[str, Any]]:
+        """The entry stored under a statement key, or None"""
+        path = self._file(key)
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Every recorded entry (order unspecified)"""
+        for path in self.path.glob("*.json.gz"):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                yield json.load(f)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.path.glob("*.json.gz"))
+
+
+def rows_from_entry(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Result rows of a recorded entry, shaped like execute_query_sdk's"""
+    columns = ((entry.get("manifest") or {}).get("schema") or {}).get("columns") or []
+    names = [c["name"] for c in sorted(columns, key=lambda c: c.get("position", 0))]
+    rows = [row for chunk in entry.get("chunks") or [] for row in chunk or []]
+    if not names:
+        return rows
+    return [dict(zip(names, row)) for row in rows]
+
+
+class _ReplayStatementExecution:
+    """statement_execution.execute_statement / get_statement / get_statement_result_chunk_n over a ReplayBackend"""
+
+    def __init__(self, backend: "ReplayBackend"):
+        self._backend = backend
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _entry_for(self, statement_id: str) -> Dict[str, Any]:
+        # Statement ids are replay-<n>-<key>, so no per-statement state is kept
+        return self._backend.entry_by_key(statement_id.rsplit("-", 1)[-1])
+
+    @staticmethod
+    def _chunk(entry: Dict[str, Any], index: int) -> Dict[str, Any]:
+        chunks = entry.get("chunks") or [[]]
+        chunk = {"chunk_index": index, "data_array": chunks[index] or None, "row_count": len(chunks[index] or [])}
+        if index + 1 < len(chunks):
+            chunk["next_chunk_index"] = index + 1
+        return chunk
+
+    def execute_statement(self, warehouse_id: str, statement: str, wait_timeout: str = "30s", **_kwargs):
+        entry = self._backend.entry(statement)
+        self._backend.wait(entry)
+        with self._lock:
+            self._next_id += 1
+            statement_id = f"replay-{self._next_id}-{entry['key']}"
+        return StatementResponse.from_dict({"statement_id": statement_id, "status": {"state": "SUCCEEDED"}})
+
+    def get_statement(self, statement_id: str):
+        entry = self._entry_for(statement_id)
+        return StatementResponse.from_dict({
+            "statement_id": statement_id,
+            "status": {"state": "SUCCEEDED"},
+            "manifest": entry.get("manifest"),
+            "result": self._chunk(entry, 0),
+        })
+
+    def get_statement_result_chunk_n(self, statement_id: str, chunk_index: int):
+        return ResultData.from_dict(self._chunk(self._entry_for(statement_id), chunk_index))
+
+
+class ReplayBackend(ExecutionBackend):
+    """
+    Serves statements from a StatementStore, with optional simulated latency
+
+    DatabricksClient runs them through statement_execution (recorded payloads
+    parsed by the client); execute() returns the rows directly.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        record_dir: str,
+        latency: float = 0.0,
+        speed: float = 0.0
+    ):
+        """
+        Initialize the replay backend
+
+        Args:
+            record_dir: Directory written by record mode (WAF_RECORD_DIR)
+            latency: Fixed seconds added to every statement
+            speed: Multiplier on each statement's recorded wall time (1.0 = real time, 0 = none)
+        """
+        self.store = StatementStore(record_dir)
+        if not self.store.path.is_dir():
+            raise FileNotFoundError(f"Replay directory not found: {record_dir}")
+        self.latency = latency
+        self.speed = speed
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.statement_execution = _ReplayStatementExecution(self)
+        logger.info(f"Replay backend over {len(self.store)} recorded statement(s) in {record_dir}")
+
+    def entry(self, query: str) -> Dict[str, Any]:
+        """The recorded entry for a statement; raises StatementNotRecorded if there is none"""
+        try:
+            return self.entry_by_key(statement_key(query))
+        except StatementNotRecorded as e:
+            raise StatementNotRecorded(f"{e}: {normalize_sql(query)[:200]}") from None
+
+    def entry_by_key(self, key: str) -> Dict[str, Any]:
+        """The recorded entry stored under a statement key"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self.store.load_key(key)
+            if entry is None:
+                raise StatementNotRecorded(
+                    f"No recorded response for statement {key[:12]} (record it with WAF_RECORD_DIR)"
+                )
+            with self._lock:
+                self._entries[key] = entry
+        return entry
+
+    def wait(self, entry: Dict[str, Any]) -> None:
+        """Sleep for a statement's simulated latency"""
+        delay = self.latency + self.speed * (entry.get("elapsed_s") or 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def execute(self, query: str, timeout: int = 30) -> List[Dict[str, Any]]:
+        entry = self.entry(query)
+        self.wait(entry)
+        results = rows_from_entry(entry)
+        logger.info(f"Query replayed from {entry['key'][:12]}, returned {len(results)} rows")
+        return results
+
+
+_ENV_RECORDER: Optional[StatementStore] = None
+_ENV_RECORDER_LOCK = threading.Lock()
+
+
+def recorder_from_env() -> Optional[StatementStore]:
+    """Store selected by WAF_RECORD_DIR (one per process), or None when not recording"""
+    global _ENV_RECORDER
+    record_dir = os.getenv("WAF_RECORD_DIR", "").strip()
+    if not record_dir:
+        return None
+    with _ENV_RECORDER_LOCK:
+        if _ENV_RECORDER is None or str(_ENV_RECORDER.path) != str(Path(record_dir)):
+            _ENV_RECORDER = StatementStore(record_dir)
+            logger.info(f"Recording warehouse statements into {record_dir}")
+        return _ENV_RECORDER
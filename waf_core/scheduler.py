@@ -0,0 +1,239 @@
+"""
+Process-wide warehouse admission control
+
+Every statement DatabricksClient.execute_query_sdk sends goes through one
+StatementScheduler per process, so the API, MCP server and agent together
+never have more than WAF_MAX_CONCURRENT_STATEMENTS statements running on the
+warehouse. Statements beyond that wait in a priority queue:
+
+    interactive   score, metric and recommendation lookups (the default)
+    context       AI context building: /api/v1/context, chat, MCP tool calls
+    history       background work: run polling, trend and history reads
+
+A freed slot always goes to the highest class waiting, oldest first. Lower
+classes may only queue behind a smaller share of WAF_STATEMENT_QUEUE_MAX
+(all, 1/2, 1/4), so under a burst history work is shed first. A statement is
+rejected with WarehouseSaturated (carrying a Retry-After estimate) as soon as
+its class's queue is full, or after waiting WAF_STATEMENT_QUEUE_TIMEOUT
+seconds for a slot; waf_api turns that into 503 with a Retry-After header.
+
+    WAF_MAX_CONCURRENT_STATEMENTS  - statements running at once (default 8, 0 disables admission control)
+    WAF_STATEMENT_QUEUE_MAX        - statements waiting at once (default 32)
+    WAF_STATEMENT_QUEUE_TIMEOUT    - seconds a statement may wait for a slot (default 10)
+
+The class of the current code path is a context variable, set with
+statement_priority() and carried onto worker threads by tracing.bind().
+"""
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from .metrics import STATEMENT_QUEUE_TIME, STATEMENT_REJECTIONS, STATEMENTS_QUEUED, STATEMENTS_RUNNING
+
+INTERACTIVE = "interactive"
+CONTEXT = "context"
+HISTORY = "history"
+PRIORITIES = (INTERACTIVE, CONTEXT, HISTORY)
+_RANK = {name: rank for rank, name in enumerate(PRIORITIES)}
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("waf_statement_priority", default=INTERACTIVE)
+
+
+class WarehouseSaturated(RuntimeError):
+    """The statement was not admitted; retry after retry_after seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextmanager
+def statement_priority(priority: str) -> Iterator[None]:
+    """Run the enclosed block's statements in the given priority class"""
+    if priority not in _RANK:
+        raise ValueError(f"Unknown statement priority: {priority} (expected one of {', '.join(PRIORITIES)})")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+class _Waiter:
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class StatementScheduler:
+    """Bounded-concurrency statement admission with priority queueing"""
+
+    def __init__(self, max_concurrent: int = 8, max_queued: int = 32, queue_timeout: float = 10.0):
+        """
+        Initialize the scheduler
+
+        Args:
+            max_concurrent: Statements running at once
+            max_queued: Statements waiting at once (interactive share; lower classes get less)
+            queue_timeout: Seconds a statement may wait before it is rejected
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self.queue_timeout = queue_timeout
+
+        self._running = 0
+        self._queue: List = []  # heap of (rank, seq, priority, waiter)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        # Moving average of statement wall time, for Retry-After estimates
+        self._avg_seconds = 1.0
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def queue_limit(self, priority: str) -> int:
+        """How many waiting statements a statement of this class may queue behind"""
+        return self.max_queued >> _RANK[priority]
+
+    def retry_after(self) -> int:
+        """Seconds until a new statement is likely to be admitted"""
+        backlog = (len(self._queue) + 1) / self.max_concurrent
+        return max(1, min(60, math.ceil(backlog * self._avg_seconds)))
+
+    def _reject(self, priority: str, reason: str, waited: float) -> WarehouseSaturated:
+        STATEMENT_REJECTIONS.inc(priority=priority, reason=reason)
+        STATEMENT_QUEUE_TIME.observe(waited, priority=priority, result="rejected")
+        retry_after = self.retry_after()
+        return WarehouseSaturated(
+            f"Warehouse is saturated ({self._running} statements running, {len(self._queue)} queued, "
+            f"{priority} {reason.replace('_', ' ')}); retry after {retry_after}s",
+            retry_after
+        )
+
+    def acquire(self, priority: Optional[str] = None) -> float:
+        """
+        Wait for a statement slot
+
+        Returns:
+            Seconds spent queued
+
+        Raises:
+            WarehouseSaturated: If the class's queue is full or the wait timed out
+        """
+        priority = priority or _priority.get()
+        rank = _RANK[priority]
+        started = time.perf_counter()
+        with self._lock:
+            if self._running < self.max_concurrent and not self._queue:
+                self._running += 1
+                STATEMENTS_RUNNING.set(self._running)
+                STATEMENT_QUEUE_TIME.observe(0.0, priority=priority, result="admitted")
+                return 0.0
+            if len(self._queue) >= self.queue_limit(priority):
+                raise self._reject(priority, "queue_full", 0.0)
+            waiter = _Waiter()
+            heapq.heappush(self._queue, (rank, next(self._seq), priority, waiter))
+            STATEMENTS_QUEUED.inc(priority=priority)
+
+        waiter.event.wait(self.queue_timeout)
+        waited = time.perf_counter() - started
+        with self._lock:
+            if not waiter.granted:
+                self._queue = [entry for entry in self._queue if entry[3] is not waiter]
+                heapq.heapify(self._queue)
+                STATEMENTS_QUEUED.dec(priority=priority)
+                raise self._reject(priority, "timeout", waited)
+        STATEMENT_QUEUE_TIME.observe(waited, priority=priority, result="admitted")
+        return waited
+
+    def release(self, seconds: Optional[float] = None) -> None:
+        """Free a slot, handing it to the best waiting statement (seconds: how long it ran)"""
+        with self._lock:
+            if seconds is not None:
+                self._avg_seconds += 0.2 * (seconds - self._avg_seconds)
+            if self._queue:
+                _, _, priority, waiter = heapq.heappop(self._queue)
+                STATEMENTS_QUEUED.dec(priority=priority)
+                # The slot passes straight to the waiter; _running is unchanged
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self._running -= 1
+                STATEMENTS_RUNNING.set(self._running)
+
+    @contextmanager
+    def slot(self, priority: Optional[str] = None) -> Iterator[float]:
+        """Hold a statement slot for the enclosed block; yields the seconds spent queued"""
+        waited = self.acquire(priority)
+        started = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            self.release(time.perf_counter() - started)
+
+
+_scheduler: Optional[StatementScheduler] = None
+_configured = False
+_config_lock = threading.Lock()
+
+
+def _from_env(
+    max_concurrent: Optional[int],
+    max_queued: Optional[int],
+    queue_timeout: Optional[float]
+) -> Optional[StatementScheduler]:
+    if max_concurrent is None:
+        max_concurrent = int(os.getenv("WAF_MAX_CONCURRENT_STATEMENTS", "8"))
+    if max_queued is None:
+        max_queued = int(os.getenv("WAF_STATEMENT_QUEUE_MAX", "32"))
+    if queue_timeout is None:
+        queue_timeout = float(os.getenv("WAF_STATEMENT_QUEUE_TIMEOUT", "10"))
+    if max_concurrent <= 0:
+        return None
+    return StatementScheduler(max_concurrent, max_queued, queue_timeout)
+
+
+def configure(
+    max_concurrent: Optional[int] = None,
+    max_queued: Optional[int] = None,
+    queue_timeout: Optional[float] = None
+) -> Optional[StatementScheduler]:
+    """
+    Replace the process-wide scheduler (arguments default to the WAF_* env vars)
+
+    Returns:
+        The new scheduler, or None when max_concurrent is 0 (admission control off)
+    """
+    global _scheduler, _configured
+    with _config_lock:
+        _scheduler = _from_env(max_concurrent, max_queued, queue_timeout)
+        _configured = True
+        return _scheduler
+
+
+def get_scheduler() -> Optional[StatementScheduler]:
+    """The process-wide scheduler, created from the environment on first use (None if disabled)"""
+    global _scheduler, _configured
+    if not _configured:
+        with _config_lock:
+            if not _configured:
+                _scheduler = _from_env(None, None, None)
+                _configured = True
+    return _scheduler
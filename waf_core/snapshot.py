@@ -0,0 +1,150 @@
+"""
+Run-keyed WAF score snapshot cache
+
+Loads the full assessment (all pillars, metrics and principles) once per
+reload run and serves every consumer from that snapshot until _run_log
+reports a newer run. Thread-safe, with single-flight loading so concurrent
+callers never trigger duplicate warehouse queries.
+"""
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+from .databricks_client import DatabricksClient
+from .metrics import cache_lookup
+from .models import PillarScore, WAFScores
+from .queries import get_all_scores, get_latest_run_id
+
+logger = logging.getLogger(__name__)
+
+
+class ScoreSnapshotCache:
+    """Caches one WAFScores snapshot per reload run"""
+
+    def __init__(
+        self,
+        run_check_interval: float = 30.0,
+        ttl_seconds: float = 300.0,
+        catalog: Optional[str] = None
+    ):
+        """
+        Initialize the snapshot cache
+
+        Args:
+            run_check_interval: Seconds between _run_log checks for a new run
+            ttl_seconds: Snapshot lifetime when no run_id is available (no catalog configured)
+            catalog: Unity Catalog holding waf_cache (defaults to WAF_CATALOG env var)
+        """
+        self.run_check_interval = run_check_interval
+        self.ttl_seconds = ttl_seconds
+        self.catalog = catalog
+
+        self._scores: Optional[WAFScores] = None
+        self._run_id: Optional[int] = None
+        self._loaded_at = 0.0
+        self._run_checked_at = 0.0
+        self._latest_run_id: Optional[int] = None
+
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._listeners: List[Callable[[Optional[int], Optional[int]], None]] = []
+
+    @property
+    def run_id(self) -> Optional[int]:
+        """run_id of the snapshot currently held (None if unknown or not loaded)"""
+        return self._run_id
+
+    def add_listener(self, callback: Callable[[Optional[int], Optional[int]], None]) -> None:
+        """Register callback(old_run_id, new_run_id), called when a new run is detected"""
+        self._listeners.append(callback)
+
+    def check_run(self, client: DatabricksClient, force: bool = False) -> Optional[int]:
+        """
+        Return the latest run_id, querying _run_log at most once per run_check_interval
+
+        Args:
+            client: Databricks client instance
+            force: Ignore the check interval
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._run_checked_at < self.run_check_interval:
+                return self._latest_run_id
+            self._run_checked_at = now
+            previous = self._latest_run_id
+
+        latest = get_latest_run_id(client, self.catalog)
+        if latest is None:
+            # Unavailable (or no runs yet): keep the last known run, so the next
+            # successful check still detects a change against it
+            return None
+        with self._lock:
+            self._latest_run_id = latest
+        if previous is not None and latest != previous:
+            logger.info(f"New reload run detected: {previous} -> {latest}")
+            for callback in list(self._listeners):
+                try:
+                    callback(previous, latest)
+                except Exception as e:
+                    logger.warning(f"Snapshot listener failed: {e}")
+        return latest
+
+    def _is_fresh(self, run_id: Optional[int]) -> bool:
+        if self._scores is None:
+            return False
+        if run_id is not None:
+            return run_id == self._run_id
+        return time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    def get_scores(self, client: DatabricksClient) -> WAFScores:
+        """
+        Get the full assessment for the current run, loading it on first use
+
+        Args:
+            client: Databricks client used for the run check and (on miss) the load
+
+        Returns:
+            WAFScores with metrics and principles for all pillars
+        """
+        run_id = self.check_run(client)
+        with self._lock:
+            if self._is_fresh(run_id):
+                cache_lookup("score_snapshot", hit=True)
+                return self._scores
+
+        # Single flight: concurrent callers wait for one load instead of racing
+        with self._load_lock:
+            with self._lock:
+                if self._is_fresh(run_id):
+                    cache_lookup("score_snapshot", hit=True)
+                    return self._scores
+            cache_lookup("score_snapshot", hit=False)
+            logger.info(f"Loading WAF score snapshot (run_id={run_id})...")
+            scores = get_all_scores(client, include_metrics=True, include_principles=True)
+            with self._lock:
+                self._scores = scores
+                self._run_id = run_id
+                self._loaded_at = time.monotonic()
+            return scores
+
+    def get_pillar(self, client: DatabricksClient, pillar: str) -> PillarScore:
+        """
+        Get one pillar from the current snapshot
+
+        Raises:
+            ValueError: If the pillar name is unknown
+        """
+        pillar = (pillar or "").lower()
+        if pillar not in ("reliability", "governance", "cost", "performance"):
+            raise ValueError(
+                f"Invalid pillar '{pillar}'. Must be one of: reliability, governance, cost, performance"
+            )
+        return getattr(self.get_scores(client), pillar)
+
+    def invalidate(self) -> None:
+        """Drop the snapshot so the next call reloads it"""
+        with self._lock:
+            self._scores = None
+            self._run_id = None
+            self._run_checked_at = 0.0
@@ -0,0 +1,449 @@
+"""
+Request tracing with OpenTelemetry-compatible spans
+
+The API, MCP server, agent and query library open spans around the work
+that makes a request slow: the route, auth resolution and token
+validation, every warehouse statement, pydantic model construction and
+serialization, and model-serving calls. Spans nest through contextvars, so
+a route span holds its statement spans even across worker threads that run
+with a copied context (see bind()).
+
+Tracing is off by default; span() then costs one dictionary lookup. Select
+an exporter with WAF_TRACING:
+
+    file  - OTLP/JSON lines appended to WAF_TRACE_FILE (default waf_traces.jsonl),
+            readable by the collector's otlpjsonfile receiver
+    otlp  - OTLP/HTTP JSON posted to OTEL_EXPORTER_OTLP_ENDPOINT
+            (default http://localhost:4318) at /v1/traces
+    otel  - hand spans to the OpenTelemetry API in this process (needs
+            opentelemetry-api; use with opentelemetry-instrument or your own
+            TracerProvider)
+
+OTEL_SERVICE_NAME overrides the service name passed to configure().
+Incoming W3C traceparent headers are continued, so spans join the caller's
+trace. WAF_TRACE_QUERY_METRICS=true also looks each statement up in the
+Query History API for queue / execution time and bytes read (one extra API
+call per statement, best effort).
+"""
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("waf_current_span", default=None)
+# Span list of an active capture() (profiling), filled even when tracing is off
+_capture: contextvars.ContextVar = contextvars.ContextVar("waf_span_capture", default=None)
+# capture(on_thread=...) callback, run on each thread that starts a span in the capture
+_capture_hook: contextvars.ContextVar = contextvars.ContextVar("waf_span_capture_hook", default=None)
+
+
+class Span:
+    """One timed operation; attribute and status calls mirror opentelemetry.trace.Span"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "kind", "start_ns", "end_ns",
+                 "attributes", "status", "status_message", "events")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = 0
+        self.status_message = ""
+        self.events: List[Dict[str, Any]] = []
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def update_name(self, name: str) -> None:
+        self.name = name
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = str(exc)[:500]
+        self.events.append({
+            "name": "exception",
+            "timeUnixNano": str(time.time_ns()),
+            "attributes": _otlp_attributes({
+                "exception.type": type(exc).__name__,
+                "exception.message": str(exc)[:2000],
+            }),
+        })
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent header value for this span"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status, "message": self.status_message} if self.status else {},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.events:
+            span["events"] = self.events
+        return span
+
+
+class _NoopSpan:
+    """Stand-in yielded while tracing is off"""
+
+    trace_id = None
+    span_id = None
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def update_name(self, name: str) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+# ---------------------------------------------------------------------------
+# Exporters
+# ---------------------------------------------------------------------------
+
+class SpanExporter:
+    """Receives finished spans as OTLP/JSON resourceSpans payloads"""
+
+    def export(self, payload: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends one OTLP/JSON payload per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, payload: Dict[str, Any]) -> None:
+        line = json.dumps(payload, separators=(",", ":"))
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """Posts OTLP/JSON to a collector's /v1/traces endpoint"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        endpoint = endpoint.rstrip("/")
+        self.url = endpoint if endpoint.endswith("/v1/traces") else f"{endpoint}/v1/traces"
+        self.timeout = timeout
+
+    def export(self, payload: Dict[str, Any]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class _BatchProcessor:
+    """Buffers finished spans and exports them from a background thread"""
+
+    def __init__(self, exporter: SpanExporter, service_name: str,
+                 max_batch: int = 256, interval: float = 2.0):
+        self.exporter = exporter
+        self.resource = {"attributes": _otlp_attributes({
+            "service.name": service_name,
+            "process.pid": os.getpid(),
+        })}
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=10000)
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="waf-trace-export", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # Drop rather than block the request path
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                payload = {"resourceSpans": [{
+                    "resource": self.resource,
+                    "scopeSpans": [{"scope": {"name": "waf"}, "spans": [s.to_otlp() for s in batch]}],
+                }]}
+                try:
+                    self.exporter.export(payload)
+                except Exception as e:
+                    logger.warning(f"Dropped {len(batch)} span(s), export failed: {e}")
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self.flush()
+        self.exporter.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Tracer
+# ---------------------------------------------------------------------------
+
+_processor: Optional[_BatchProcessor] = None
+_otel_tracer = None
+_configured = False
+_config_lock = threading.Lock()
+
+
+def configure(service_name: str = "waf", exporter: Optional[SpanExporter] = None) -> bool:
+    """
+    Set up tracing for this process from WAF_TRACING (call once at startup)
+
+    Args:
+        service_name: service.name resource attribute (OTEL_SERVICE_NAME wins)
+        exporter: Explicit exporter, overriding WAF_TRACING
+
+    Returns:
+        True if spans will be recorded
+    """
+    global _processor, _otel_tracer, _configured
+    with _config_lock:
+        if _configured:
+            return enabled()
+        _configured = True
+        service_name = os.getenv("OTEL_SERVICE_NAME") or service_name
+        mode = os.getenv("WAF_TRACING", "").strip().lower()
+        if exporter is None:
+            if mode in ("", "0", "off", "false", "none"):
+                return False
+            if mode == "otel":
+                try:
+                    from opentelemetry import trace as otel_trace
+                except ImportError:
+                    logger.warning("WAF_TRACING=otel needs opentelemetry-api; tracing disabled")
+                    return False
+                _otel_tracer = otel_trace.get_tracer("waf")
+                logger.info("Tracing through the OpenTelemetry API")
+                return True
+            if mode == "file":
+                exporter = FileSpanExporter(os.getenv("WAF_TRACE_FILE", "waf_traces.jsonl"))
+            elif mode == "otlp":
+                exporter = OTLPHttpSpanExporter(
+                    os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")
+                    or os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+                )
+            else:
+                logger.warning(f"Unknown WAF_TRACING: {mode} (expected file, otlp or otel); tracing disabled")
+                return False
+        _processor = _BatchProcessor(exporter, service_name)
+        atexit.register(_processor.shutdown)
+        logger.info(f"Tracing enabled ({type(exporter).__name__}) as {service_name}")
+        return True
+
+
+def enabled() -> bool:
+    return _processor is not None or _otel_tracer is not None
+
+
+def current_span():
+    """The active span, or a no-op span"""
+    if _otel_tracer is not None:
+        from opentelemetry import trace as otel_trace
+        return otel_trace.get_current_span()
+    return _current_span.get() or NOOP_SPAN
+
+
+def _parse_traceparent(traceparent: Optional[str]):
+    parts = (traceparent or "").strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None, None
+
+
+@contextmanager
+def span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    kind: int = SPAN_KIND_INTERNAL,
+    traceparent: Optional[str] = None
+) -> Iterator[Any]:
+    """
+    Time the enclosed block as a span, child of the active span
+
+    Exceptions are recorded on the span and re-raised.
+
+    Args:
+        name: Span name
+        attributes: Initial attributes
+        kind: SPAN_KIND_INTERNAL / SERVER / CLIENT
+        traceparent: W3C traceparent to continue (root spans of incoming requests)
+    """
+    captured = _capture.get()
+    if _processor is None and _otel_tracer is None and captured is None:
+        yield NOOP_SPAN
+        return
+    hook = _capture_hook.get()
+    if hook is not None:
+        hook()
+
+    if _otel_tracer is not None and captured is None:
+        from opentelemetry.trace import SpanKind
+        otel_kind = {SPAN_KIND_SERVER: SpanKind.SERVER, SPAN_KIND_CLIENT: SpanKind.CLIENT}.get(kind, SpanKind.INTERNAL)
+        context = None
+        if traceparent:
+            from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+            context = TraceContextTextMapPropagator().extract({"traceparent": traceparent})
+        with _otel_tracer.start_as_current_span(name, context=context, kind=otel_kind,
+                                                attributes=attributes) as otel_span:
+            yield otel_span
+        return
+
+    parent = _current_span.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = _parse_traceparent(traceparent)
+        trace_id = trace_id or f"{random.getrandbits(128):032x}"
+    current = Span(name, trace_id, parent_id, kind, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        processor = _processor
+        if processor is not None:
+            processor.on_end(current)
+        if captured is not None:
+            captured.append(current)
+
+
+def traced(name: str, kind: int = SPAN_KIND_INTERNAL) -> Callable:
+    """Decorator form of span()"""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, kind=kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind(fn: Callable) -> Callable:
+    """
+    fn bound to the caller's context, for thread pools
+
+    Each call runs in its own copy of the context captured here, so spans
+    opened on worker threads nest under the span active at bind() time.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+@contextmanager
+def capture(on_thread: Optional[Callable[[], None]] = None) -> Iterator[List[Span]]:
+    """
+    Collect the spans finished in this context, and in contexts copied from it
+
+    Works with tracing off (spans are then only collected, not exported);
+    used by profiling.py for per-request statement timings.
+
+    Args:
+        on_thread: Called on the starting thread whenever a span starts in the
+            capture (profiling.py samples the worker threads doing the work)
+    """
+    spans: List[Span] = []
+    token = _capture.set(spans)
+    hook_token = _capture_hook.set(on_thread)
+    try:
+        yield spans
+    finally:
+        _capture_hook.reset(hook_token)
+        _capture.reset(token)
+
+
+def flush() -> None:
+    """Export buffered spans now (tests, short-lived scripts)"""
+    if _processor is not None:
+        _processor.flush()
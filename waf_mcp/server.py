@@ -1,56 +1,225 @@
 """
 MCP Server for WAF Assessment Tool
 
-Exposes WAF scores and metrics as MCP tools for AI assistants.
+Exposes WAF scores and metrics as MCP tools and resources for AI assistants.
 """
+import argparse
+import asyncio
+import contextvars
+import hashlib
 import json
 import logging
-from typing import Any, Dict, List, Optional
-from mcp.server import Server
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Set
+from mcp.server import NotificationOptions, Server
 from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent
+from mcp.types import Resource, ResourceTemplate, Tool, TextContent
+from pydantic import AnyUrl
 
+from waf_core import metrics, profiling, tracing
 from waf_core.databricks_client import DatabricksClient
-from waf_core.queries import (
-    get_all_scores,
-    get_reliability_scores,
-    get_governance_scores,
-    get_cost_scores,
-    get_performance_scores,
-    get_metric_by_id
-)
+from waf_core.scheduler import CONTEXT, HISTORY, WarehouseSaturated, statement_priority
+from waf_core.models import WAFScores
+from waf_core.queries import check_waf_access, get_pillar_for_waf_id
+from waf_core.snapshot import ScoreSnapshotCache
 
 logger = logging.getLogger(__name__)
 
 # Initialize MCP server
 app = Server("waf-assessment-tool")
 
+PILLARS = ["reliability", "governance", "cost", "performance"]
+
 # Global client (will be initialized on first use)
 _client: Optional[DatabricksClient] = None
+_client_lock = threading.Lock()
+
+# One score snapshot per reload run, shared by every tool call
+_snapshot = ScoreSnapshotCache(
+    run_check_interval=float(os.getenv("WAF_MCP_RUN_CHECK_INTERVAL", "30"))
+)
+
+# Worker threads for blocking warehouse calls (bounds concurrent in-flight tools)
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("WAF_MCP_MAX_WORKERS", "8")),
+    thread_name_prefix="waf-mcp"
+)
+
+
+# Client for the current HTTP session (set per connection by the SSE transport)
+_session_client: contextvars.ContextVar[Optional[DatabricksClient]] = contextvars.ContextVar(
+    "waf_mcp_session_client", default=None
+)
+
+
+class WAFAccessDenied(PermissionError):
+    """The token is valid but its identity cannot read the WAF results"""
+
+
+# Per-token clients for HTTP sessions: sha256(token) -> (client, validated_at)
+_token_clients: "OrderedDict[str, tuple]" = OrderedDict()
+_token_clients_lock = threading.Lock()
+_MAX_TOKEN_CLIENTS = int(os.getenv("WAF_MCP_MAX_CLIENTS", "64"))
+_TOKEN_REVALIDATE_SECONDS = float(os.getenv("WAF_MCP_AUTH_TTL", "300"))
+
+# Upper bound on query_controls' limit argument
+_MAX_CONTROLS_LIMIT = 500
 
 
 def get_client() -> DatabricksClient:
-    """Get or create Databricks client"""
+    """Get the calling session's client, or create the process-wide default client"""
+    session_client = _session_client.get()
+    if session_client is not None:
+        return session_client
+    
     global _client
-    if _client is None:
-        import os
-        from databricks.sdk import WorkspaceClient
-        
-        # Use Service Principal or user credentials
-        workspace_client = WorkspaceClient()
-        warehouse_id = os.getenv("DATABRICKS_WAREHOUSE_ID", "")
-        
-        if not warehouse_id:
-            raise ValueError("DATABRICKS_WAREHOUSE_ID environment variable not set")
-        
-        _client = DatabricksClient(
-            workspace_client=workspace_client,
-            warehouse_id=warehouse_id
-        )
+    with _client_lock:
+        if _client is None:
+            from databricks.sdk import WorkspaceClient
+            
+            # Use Service Principal or user credentials
+            workspace_client = WorkspaceClient()
+            warehouse_id = os.getenv("DATABRICKS_WAREHOUSE_ID", "")
+            
+            if not warehouse_id:
+                raise ValueError("DATABRICKS_WAREHOUSE_ID environment variable not set")
+            
+            _client = DatabricksClient(
+                workspace_client=workspace_client,
+                warehouse_id=warehouse_id
+            )
     
     return _client
 
 
+def get_client_for_token(token: str) -> DatabricksClient:
+    """
+    Get a Databricks client that runs as the owner of token
+    
+    Tools serve the shared snapshot, which was loaded under whichever identity
+    loaded it first, so authenticating is not enough: the token must also
+    read the WAF results itself (check_waf_access). Both checks are repeated
+    every WAF_MCP_AUTH_TTL seconds. Clients are reused across sessions
+    presenting the same token, so each identity keeps one HTTP connection
+    pool (pools are per identity, not shared: the SDK binds credentials to
+    its client).
+    
+    Raises:
+        PermissionError: If the token is rejected by the workspace
+        WAFAccessDenied: If the token's identity cannot read the WAF results
+        WarehouseSaturated: If admission control refused the access check
+    """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    now = time.monotonic()
+    with _token_clients_lock:
+        cached = _token_clients.get(key)
+        if cached is not None and now - cached[1] < _TOKEN_REVALIDATE_SECONDS:
+            _token_clients.move_to_end(key)
+            return cached[0]
+    
+    from databricks.sdk import WorkspaceClient
+    from databricks.sdk.core import Config
+    
+    warehouse_id = os.getenv("DATABRICKS_WAREHOUSE_ID", "")
+    if not warehouse_id:
+        raise ValueError("DATABRICKS_WAREHOUSE_ID environment variable not set")
+    
+    if cached is not None:
+        client = cached[0]
+    else:
+        workspace_client = WorkspaceClient(
+            config=Config(token=token, auth_type="pat", host=os.getenv("DATABRICKS_HOST"))
+        )
+        client = DatabricksClient(workspace_client=workspace_client, warehouse_id=warehouse_id)
+    
+    try:
+        with tracing.span("waf.auth.validate_token", kind=tracing.SPAN_KIND_CLIENT), \
+                metrics.TOKEN_VALIDATION.time(service="mcp"):
+            user = client.w.current_user.me()
+    except Exception as e:
+        with _token_clients_lock:
+            _token_clients.pop(key, None)
+        raise PermissionError(f"Token validation failed: {e}")
+    
+    try:
+        check_waf_access(client)
+    except WarehouseSaturated:
+        raise
+    except Exception as e:
+        with _token_clients_lock:
+            _token_clients.pop(key, None)
+        raise WAFAccessDenied(f"{user.user_name} cannot read the WAF results: {e}")
+    logger.info(f"Authenticated MCP session for {user.user_name}")
+    
+    with _token_clients_lock:
+        _token_clients[key] = (client, now)
+        _token_clients.move_to_end(key)
+        while len(_token_clients) > _MAX_TOKEN_CLIENTS:
+            _token_clients.popitem(last=False)
+    return client
+
+
+OUTPUT_FORMATS = ["json", "compact", "table"]
+DEFAULT_OUTPUT_FORMAT = os.getenv("WAF_MCP_OUTPUT_FORMAT", "json").lower()
+
+FORMAT_PROPERTY = {
+    "type": "string",
+    "enum": OUTPUT_FORMATS,
+    "description": "Output format: 'json' (indented), 'compact' (minified JSON) or 'table' (tab-separated rows, fewest tokens)",
+    "default": DEFAULT_OUTPUT_FORMAT
+}
+
+
+def _table_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def _render(result: Any, fmt: str) -> str:
+    """
+    Render a tool result in the requested output format
+
+    'table' prints scalar fields as key=value on the first line, then every
+    list of objects as a tab-separated table with a header row.
+    """
+    if isinstance(result, str):
+        return result
+    if fmt == "compact":
+        return json.dumps(result, separators=(",", ":"), default=str)
+    if fmt != "table":
+        return json.dumps(result, indent=2, default=str)
+
+    if isinstance(result, list):
+        result = {"rows": result}
+    if not isinstance(result, dict):
+        return json.dumps(result, separators=(",", ":"), default=str)
+
+    scalars = [f"{k}={_table_cell(v)}" for k, v in result.items() if not isinstance(v, (list, dict))]
+    lines = [" ".join(scalars)] if scalars else []
+    for key, value in result.items():
+        if isinstance(value, dict):
+            lines.append(f"{key}: " + json.dumps(value, separators=(",", ":"), default=str))
+        elif isinstance(value, list) and value and all(isinstance(row, dict) for row in value):
+            columns: List[str] = []
+            for row in value:
+                columns.extend(c for c in row if c not in columns)
+            lines.append(f"[{key}]")
+            lines.append("\t".join(columns))
+            lines.extend("\t".join(_table_cell(row.get(c)) for c in columns) for row in value)
+        elif isinstance(value, list):
+            lines.append(f"{key}: " + ",".join(_table_cell(v) for v in value))
+    return "\n".join(lines)
+
+
 @app.list_tools()
 async def list_tools() -> List[Tool]:
     """List available MCP tools"""
@@ -60,7 +229,9 @@ async def list_tools() -> List[Tool]:
             description="Get overall WAF assessment scores for all pillars (Reliability, Governance, Cost, Performance)",
             inputSchema={
                 "type": "object",
-                "properties": {},
+                "properties": {
+                    "format": FORMAT_PROPERTY
+                },
                 "required": []
             }
         ),
@@ -74,7 +245,8 @@ async def list_tools() -> List[Tool]:
                         "type": "string",
                         "enum": ["reliability", "governance", "cost", "performance"],
                         "description": "The WAF pillar to get scores for"
-                    }
+                    },
+                    "format": FORMAT_PROPERTY
                 },
                 "required": ["pillar"]
             }
@@ -90,7 +262,8 @@ async def list_tools() -> List[Tool]:
                         "enum": ["reliability", "governance", "cost", "performance", "all"],
                         "description": "Filter by pillar, or 'all' for all pillars",
                         "default": "all"
-                    }
+                    },
+                    "format": FORMAT_PROPERTY
                 },
                 "required": []
             }
@@ -104,11 +277,66 @@ async def list_tools() -> List[Tool]:
                     "waf_id": {
                         "type": "string",
                         "description": "The WAF control ID (e.g., 'R-01-01', 'G-02-03')"
-                    }
+                    },
+                    "format": FORMAT_PROPERTY
                 },
                 "required": ["waf_id"]
             }
         ),
+        Tool(
+            name="get_metrics",
+            description="Get several WAF control metrics in one call (prefer this over repeated get_metric_details calls)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "waf_ids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "WAF control IDs (e.g., ['R-01-01', 'CO-01-09'])"
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": ["waf_ids"]
+            }
+        ),
+        Tool(
+            name="query_controls",
+            description="Filter WAF control metrics by pillar, principle, status and gap to threshold; sorted by largest gap first",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "pillar": {
+                        "type": "string",
+                        "enum": ["reliability", "governance", "cost", "performance", "all"],
+                        "description": "Filter by pillar, or 'all' for all pillars",
+                        "default": "all"
+                    },
+                    "principle": {
+                        "type": "string",
+                        "description": "Case-insensitive substring match on the principle name"
+                    },
+                    "status": {
+                        "type": "string",
+                        "enum": ["failing", "passing", "all"],
+                        "description": "Filter by threshold status",
+                        "default": "all"
+                    },
+                    "min_gap": {
+                        "type": "number",
+                        "description": "Only controls whose threshold minus score is at least this many points"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of controls to return",
+                        "default": 50,
+                        "minimum": 1,
+                        "maximum": _MAX_CONTROLS_LIMIT
+                    },
+                    "format": FORMAT_PROPERTY
+                },
+                "required": []
+            }
+        ),
         Tool(
             name="get_recommendations",
             description="Get actionable recommendations to improve WAF scores",
@@ -126,7 +354,8 @@ async def list_tools() -> List[Tool]:
                         "enum": ["high", "medium", "low", "all"],
                         "description": "Filter by priority level",
                         "default": "all"
-                    }
+                    },
+                    "format": FORMAT_PROPERTY
                 },
                 "required": []
             }
@@ -134,135 +363,206 @@ async def list_tools() -> List[Tool]:
     ]
 
 
+def _failing_metrics(scores: WAFScores, pillar_filter: str) -> List[Dict[str, Any]]:
+    """Flatten failing metrics from a snapshot, optionally filtered by pillar"""
+    failing = []
+    for pillar_score in [scores.reliability, scores.governance, scores.cost, scores.performance]:
+        if pillar_filter != "all" and pillar_score.pillar != pillar_filter:
+            continue
+        for metric in pillar_score.metrics:
+            if not metric.threshold_met or metric.implemented == "Fail":
+                failing.append((pillar_score.pillar, metric))
+    return failing
+
+
+def _tool_get_waf_scores(client: DatabricksClient, arguments: Dict[str, Any]) -> Any:
+    scores = _snapshot.get_scores(client)
+    return {
+        "reliability": scores.reliability.completion_percent,
+        "governance": scores.governance.completion_percent,
+        "cost": scores.cost.completion_percent,
+        "performance": scores.performance.completion_percent,
+        "run_id": _snapshot.run_id,
+        "timestamp": scores.timestamp.isoformat()
+    }
+
+
+def _tool_get_pillar_score(client: DatabricksClient, arguments: Dict[str, Any]) -> Any:
+    pillar = arguments.get("pillar", "").lower()
+    if pillar not in PILLARS:
+        return f"Error: Invalid pillar '{pillar}'. Must be one of: reliability, governance, cost, performance"
+    
+    pillar_score = _snapshot.get_pillar(client, pillar)
+    return {
+        "pillar": pillar_score.pillar,
+        "completion_percent": pillar_score.completion_percent,
+        "metrics": [m.dict() for m in pillar_score.metrics],
+        "principles": [p.dict() for p in pillar_score.principles]
+    }
+
+
+def _tool_get_failing_metrics(client: DatabricksClient, arguments: Dict[str, Any]) -> Any:
+    pillar_filter = arguments.get("pillar", "all").lower()
+    scores = _snapshot.get_scores(client)
+    
+    failing_metrics = [
+        {
+            "waf_id": metric.waf_id,
+            "pillar": pillar,
+            "principle": metric.principle,
+            "score_percentage": metric.score_percentage,
+            "threshold_percentage": metric.threshold_percentage,
+            "gap": metric.threshold_percentage - metric.score_percentage
+        }
+        for pillar, metric in _failing_metrics(scores, pillar_filter)
+    ]
+    return {"failing_metrics": failing_metrics, "count": len(failing_metrics)}
+
+
+def _tool_get_metric_details(client: DatabricksClient, arguments: Dict[str, Any]) -> Any:
+    waf_id = arguments.get("waf_id", "")
+    pillar = get_pillar_for_waf_id(waf_id)
+    if pillar:
+        for metric in _snapshot.get_pillar(client, pillar).metrics:
+            if metric.waf_id == waf_id:
+                return metric.dict()
+    return f"Error: Metric '{waf_id}' not found"
+
+
+def _tool_get_metrics(client: DatabricksClient, arguments: Dict[str, Any]) -> Any:
+    waf_ids = arguments.get("waf_ids") or []
+    if isinstance(waf_ids, str):
+        waf_ids = [w.strip() for w in waf_ids.split(",") if w.strip()]
+    
+    # One snapshot serves every requested ID, whatever the pillar
+    scores = _snapshot.get_scores(client)
+    by_id = {
+        metric.waf_id: {"pillar": pillar_score.pillar, **metric.dict()}
+        for pillar_score in [scores.reliability, scores.governance, scores.cost, scores.performance]
+        for metric in pillar_score.metrics
+    }
+    metrics = [by_id[w] for w in waf_ids if w in by_id]
+    not_found = [w for w in waf_ids if w not in by_id]
+    return {"metrics": metrics, "count": len(metrics), "not_found": not_found}
+
+
+def _tool_query_controls(client: DatabricksClient, arguments: Dict[str, Any]) -> Any:
+    pillar_filter = str(arguments.get("pillar") or "all").lower()
+    principle_filter = str(arguments.get("principle") or "").lower()
+    status_filter = str(arguments.get("status") or "all").lower()
+    min_gap = arguments.get("min_gap")
+    limit = int(arguments["limit"]) if arguments.get("limit") is not None else 50
+    if limit < 1:
+        return f"Error: Invalid limit {limit}. Must be between 1 and {_MAX_CONTROLS_LIMIT}"
+    limit = min(limit, _MAX_CONTROLS_LIMIT)
+    
+    scores = _snapshot.get_scores(client)
+    
+    controls = []
+    for pillar_score in [scores.reliability, scores.governance, scores.cost, scores.performance]:
+        if pillar_filter != "all" and pillar_score.pillar != pillar_filter:
+            continue
+        for metric in pillar_score.metrics:
+            failing = not metric.threshold_met or metric.implemented == "Fail"
+            gap = metric.threshold_percentage - metric.score_percentage
+            if status_filter == "failing" and not failing:
+                continue
+            if status_filter == "passing" and failing:
+                continue
+            if principle_filter and principle_filter not in (metric.principle or "").lower():
+                continue
+            if min_gap is not None and gap < float(min_gap):
+                continue
+            controls.append({
+                "waf_id": metric.waf_id,
+                "pillar": pillar_score.pillar,
+                "principle": metric.principle,
+                "score_percentage": metric.score_percentage,
+                "threshold_percentage": metric.threshold_percentage,
+                "gap": gap,
+                "status": "failing" if failing else "passing"
+            })
+    
+    controls.sort(key=lambda x: -x["gap"])
+    return {"controls": controls[:limit], "count": min(len(controls), limit), "total_matched": len(controls)}
+
+
+def _tool_get_recommendations(client: DatabricksClient, arguments: Dict[str, Any]) -> Any:
+    pillar_filter = arguments.get("pillar", "all").lower()
+    priority_filter = arguments.get("priority", "all").lower()
+    
+    scores = _snapshot.get_scores(client)
+    
+    recommendations = []
+    for pillar, metric in _failing_metrics(scores, pillar_filter):
+        priority = 1 if metric.score_percentage < 50 else 2
+        priority_str = "high" if priority == 1 else "medium"
+        
+        if priority_filter != "all" and priority_str != priority_filter:
+            continue
+        
+        recommendations.append({
+            "waf_id": metric.waf_id,
+            "pillar": pillar,
+            "principle": metric.principle,
+            "issue": f"Current score {metric.score_percentage}% is below threshold {metric.threshold_percentage}%",
+            "recommendation": f"Improve {metric.waf_id}: {metric.principle} - {metric.best_practice or metric.description or 'N/A'}",
+            "priority": priority_str,
+            "gap": metric.threshold_percentage - metric.score_percentage
+        })
+    
+    # Sort by priority and gap
+    recommendations.sort(key=lambda x: (x["priority"] == "high", -x["gap"]))
+    return {"recommendations": recommendations, "count": len(recommendations)}
+
+
+_TOOL_HANDLERS: Dict[str, Callable[[DatabricksClient, Dict[str, Any]], Any]] = {
+    "get_waf_scores": _tool_get_waf_scores,
+    "get_pillar_score": _tool_get_pillar_score,
+    "get_failing_metrics": _tool_get_failing_metrics,
+    "get_metric_details": _tool_get_metric_details,
+    "get_metrics": _tool_get_metrics,
+    "query_controls": _tool_query_controls,
+    "get_recommendations": _tool_get_recommendations,
+}
+
+
+# Tools profiled on every call (comma-separated); WAF_PROFILE_SAMPLE_RATE samples the rest
+_PROFILE_TOOLS = {t.strip() for t in os.getenv("WAF_PROFILE_TOOLS", "").split(",") if t.strip()}
+
+
+def _run_tool(name: str, arguments: Dict[str, Any]) -> Any:
+    """Run a tool handler synchronously (called on a worker thread)"""
+    handler = _TOOL_HANDLERS.get(name)
+    if handler is None:
+        return f"Error: Unknown tool '{name}'"
+    profile_context = (
+        # Argument names only: values can carry user-supplied text
+        profiling.profiled(f"mcp {name}", meta={"tool": name, "argument_names": sorted(arguments or {})})
+        if name in _PROFILE_TOOLS or profiling.sampled() else nullcontext()
+    )
+    # Tool results feed an assistant's context, so they queue behind interactive lookups
+    with statement_priority(CONTEXT), profile_context as profile, \
+            tracing.span("waf.mcp.tool", {"waf.tool.name": name}, kind=tracing.SPAN_KIND_SERVER):
+        if profile is not None:
+            logger.info(f"Profiling tool '{name}' as {profile.id}")
+        return handler(get_client(), arguments)
+
+
 @app.call_tool()
 async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
     """Handle tool calls"""
     try:
-        client = get_client()
-        
-        if name == "get_waf_scores":
-            scores = get_all_scores(client, include_metrics=False, include_principles=False)
-            result = {
-                "reliability": scores.reliability.completion_percent,
-                "governance": scores.governance.completion_percent,
-                "cost": scores.cost.completion_percent,
-                "performance": scores.performance.completion_percent,
-                "timestamp": scores.timestamp.isoformat()
-            }
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, indent=2)
-            )]
-        
-        elif name == "get_pillar_score":
-            pillar = arguments.get("pillar", "").lower()
-            if pillar == "reliability":
-                pillar_score = get_reliability_scores(client)
-            elif pillar == "governance":
-                pillar_score = get_governance_scores(client)
-            elif pillar == "cost":
-                pillar_score = get_cost_scores(client)
-            elif pillar == "performance":
-                pillar_score = get_performance_scores(client)
-            else:
-                return [TextContent(
-                    type="text",
-                    text=f"Error: Invalid pillar '{pillar}'. Must be one of: reliability, governance, cost, performance"
-                )]
-            
-            result = {
-                "pillar": pillar_score.pillar,
-                "completion_percent": pillar_score.completion_percent,
-                "metrics": [m.dict() for m in pillar_score.metrics],
-                "principles": [p.dict() for p in pillar_score.principles]
-            }
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, indent=2)
-            )]
-        
-        elif name == "get_failing_metrics":
-            pillar_filter = arguments.get("pillar", "all").lower()
-            scores = get_all_scores(client, include_metrics=True, include_principles=False)
-            
-            failing_metrics = []
-            for pillar_score in [scores.reliability, scores.governance, scores.cost, scores.performance]:
-                if pillar_filter != "all" and pillar_score.pillar != pillar_filter:
-                    continue
-                
-                for metric in pillar_score.metrics:
-                    if not metric.threshold_met or metric.implemented == "Fail":
-                        failing_metrics.append({
-                            "waf_id": metric.waf_id,
-                            "pillar": pillar_score.pillar,
-                            "principle": metric.principle,
-                            "score_percentage": metric.score_percentage,
-                            "threshold_percentage": metric.threshold_percentage,
-                            "gap": metric.threshold_percentage - metric.score_percentage
-                        })
-            
-            return [TextContent(
-                type="text",
-                text=json.dumps({"failing_metrics": failing_metrics, "count": len(failing_metrics)}, indent=2)
-            )]
-        
-        elif name == "get_metric_details":
-            waf_id = arguments.get("waf_id", "")
-            metric = get_metric_by_id(client, waf_id)
-            
-            if not metric:
-                return [TextContent(
-                    type="text",
-                    text=f"Error: Metric '{waf_id}' not found"
-                )]
-            
-            return [TextContent(
-                type="text",
-                text=json.dumps(metric.dict(), indent=2)
-            )]
-        
-        elif name == "get_recommendations":
-            pillar_filter = arguments.get("pillar", "all").lower()
-            priority_filter = arguments.get("priority", "all").lower()
-            
-            scores = get_all_scores(client, include_metrics=True, include_principles=False)
-            
-            recommendations = []
-            for pillar_score in [scores.reliability, scores.governance, scores.cost, scores.performance]:
-                if pillar_filter != "all" and pillar_score.pillar != pillar_filter:
-                    continue
-                
-                for metric in pillar_score.metrics:
-                    if not metric.threshold_met or metric.implemented == "Fail":
-                        priority = 1 if metric.score_percentage < 50 else 2
-                        priority_str = "high" if priority == 1 else "medium"
-                        
-                        if priority_filter != "all" and priority_str != priority_filter:
-                            continue
-                        
-                        recommendations.append({
-                            "waf_id": metric.waf_id,
-                            "pillar": pillar_score.pillar,
-                            "principle": metric.principle,
-                            "issue": f"Current score {metric.score_percentage}% is below threshold {metric.threshold_percentage}%",
-                            "recommendation": f"Improve {metric.waf_id}: {metric.principle} - {metric.best_practice or metric.description or 'N/A'}",
-                            "priority": priority_str,
-                            "gap": metric.threshold_percentage - metric.score_percentage
-                        })
-            
-            # Sort by priority and gap
-            recommendations.sort(key=lambda x: (x["priority"] == "high", -x["gap"]))
-            
-            return [TextContent(
-                type="text",
-                text=json.dumps({"recommendations": recommendations, "count": len(recommendations)}, indent=2)
-            )]
+        # Warehouse queries block - run them off the event loop so the loop
+        # keeps serving other in-flight requests. The copied context carries
+        # the session's client onto the worker thread.
+        loop = asyncio.get_running_loop()
+        arguments = arguments or {}
+        ctx = contextvars.copy_context()
+        result = await loop.run_in_executor(_executor, ctx.run, _run_tool, name, arguments)
         
-        else:
-            return [TextContent(
-                type="text",
-                text=f"Error: Unknown tool '{name}'"
-            )]
+        fmt = str(arguments.get("format") or DEFAULT_OUTPUT_FORMAT).lower()
+        return [TextContent(type="text", text=_render(result, fmt))]
     
     except Exception as e:
         logger.error(f"Error in tool '{name}': {str(e)}", exc_info=True)
@@ -272,18 +572,306 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
         )]
 
 
-async def main():
-    """Run MCP server"""
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.list_resources(),
-            app.list_tools(),
-            app.call_tool()
+# ---------------------------------------------------------------------------
+# Resources: waf://scores, waf://pillar/{name}, waf://control/{id}
+# ---------------------------------------------------------------------------
+
+# uri -> sessions subscribed to it
+_subscriptions: Dict[str, Set[Any]] = {}
+# Sessions that listed resources; told when a new run changes the list (listChanged)
+_listing_sessions: "weakref.WeakSet[Any]" = weakref.WeakSet()
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+# Subscribed session -> the client it subscribed with (HTTP mode), newest last;
+# run checks poll with these credentials
+_subscriber_clients: "weakref.WeakKeyDictionary[Any, DatabricksClient]" = weakref.WeakKeyDictionary()
+
+
+def _read_resource_sync(uri: str) -> Any:
+    """Render a waf:// resource from the snapshot (called on a worker thread)"""
+    client = get_client()
+    with statement_priority(CONTEXT):
+        if uri == "waf://scores":
+            result = _tool_get_waf_scores(client, {})
+        elif uri.startswith("waf://pillar/"):
+            result = _tool_get_pillar_score(client, {"pillar": uri[len("waf://pillar/"):]})
+        elif uri.startswith("waf://control/"):
+            result = _tool_get_metric_details(client, {"waf_id": uri[len("waf://control/"):]})
+        else:
+            raise ValueError(f"Unknown resource: {uri}")
+    
+    if isinstance(result, str):
+        # Handlers report bad arguments as "Error: ..." strings
+        raise ValueError(result)
+    return result
+
+
+@app.list_resources()
+async def list_resources() -> List[Resource]:
+    """List available MCP resources"""
+    _listing_sessions.add(app.request_context.session)
+    resources = [
+        Resource(
+            uri=AnyUrl("waf://scores"),
+            name="WAF scores",
+            description="Completion percentage for every WAF pillar in the latest reload run",
+            mimeType="application/json"
         )
+    ]
+    for pillar in PILLARS:
+        resources.append(Resource(
+            uri=AnyUrl(f"waf://pillar/{pillar}"),
+            name=f"WAF {pillar} pillar",
+            description=f"{pillar.capitalize()} score, control metrics and principle scores",
+            mimeType="application/json"
+        ))
+    return resources
+
+
+@app.list_resource_templates()
+async def list_resource_templates() -> List[ResourceTemplate]:
+    """List parameterised MCP resources"""
+    return [
+        ResourceTemplate(
+            uriTemplate="waf://pillar/{name}",
+            name="WAF pillar",
+            description="Pillar score, control metrics and principle scores (reliability, governance, cost, performance)",
+            mimeType="application/json"
+        ),
+        ResourceTemplate(
+            uriTemplate="waf://control/{id}",
+            name="WAF control",
+            description="A single WAF control metric by ID (e.g. R-01-01)",
+            mimeType="application/json"
+        )
+    ]
+
+
+@app.read_resource()
+async def read_resource(uri: AnyUrl) -> str:
+    """Read a resource from the cached score snapshot"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    result = await loop.run_in_executor(_executor, ctx.run, _read_resource_sync, str(uri))
+    return json.dumps(result, indent=2)
+
+
+@app.subscribe_resource()
+async def subscribe_resource(uri: AnyUrl) -> None:
+    """Notify the calling session when this resource changes (new reload run)"""
+    session = app.request_context.session
+    _subscriptions.setdefault(str(uri), set()).add(session)
+    client = _session_client.get()
+    if client is not None:
+        _subscriber_clients.pop(session, None)
+        _subscriber_clients[session] = client
+    logger.info(f"Subscribed to {uri}")
+
+
+@app.unsubscribe_resource()
+async def unsubscribe_resource(uri: AnyUrl) -> None:
+    """Stop notifications for this resource"""
+    session = app.request_context.session
+    _subscriptions.get(str(uri), set()).discard(session)
+    if not any(session in sessions for sessions in _subscriptions.values()):
+        _subscriber_clients.pop(session, None)
+
+
+async def _notify_subscribers() -> None:
+    """Send resources/list_changed to listing sessions and resources/updated to subscribers"""
+    # A new run can add or drop waf://control/{id} resources
+    for session in list(_listing_sessions):
+        try:
+            await session.send_resource_list_changed()
+        except Exception as e:
+            logger.debug(f"Dropping resource list listener: {e}")
+            _listing_sessions.discard(session)
+    for uri, sessions in list(_subscriptions.items()):
+        for session in list(sessions):
+            try:
+                await session.send_resource_updated(AnyUrl(uri))
+            except Exception as e:
+                # Session closed - forget it
+                logger.debug(f"Dropping subscription to {uri}: {e}")
+                sessions.discard(session)
+                _subscriber_clients.pop(session, None)
+
+
+def _on_new_run(old_run_id: Optional[int], new_run_id: Optional[int]) -> None:
+    """Snapshot listener - may fire on a worker thread, so hop onto the event loop"""
+    if _event_loop is not None and (_subscriptions or _listing_sessions):
+        asyncio.run_coroutine_threadsafe(_notify_subscribers(), _event_loop)
+
+
+_snapshot.add_listener(_on_new_run)
+
+
+def _check_run_background(clients: List[DatabricksClient]) -> None:
+    """
+    Subscription-driven run check (worker thread); lowest statement priority
+
+    Tries the subscribers' clients newest first, since an older session's token
+    may have expired, then the server's own client.
+    """
+    with statement_priority(HISTORY):
+        for client in clients:
+            if _snapshot.check_run(client, force=True) is not None:
+                return
+        _snapshot.check_run(get_client(), force=True)
+
+
+async def _watch_runs() -> None:
+    """Poll _run_log for new runs while anyone is subscribed or has listed resources"""
+    interval = float(os.getenv("WAF_MCP_RUN_CHECK_INTERVAL", "30"))
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        if not any(_subscriptions.values()) and not _listing_sessions:
+            continue
+        clients = list(_subscriber_clients.values())[::-1]
+        try:
+            await loop.run_in_executor(_executor, _check_run_background, clients)
+        except Exception as e:
+            logger.warning(f"Run check failed: {e}")
+
+
+def _initialization_options():
+    """Initialization options advertising resource subscriptions and list changes"""
+    options = app.create_initialization_options(
+        notification_options=NotificationOptions(resources_changed=True)
+    )
+    if options.capabilities.resources is not None:
+        options.capabilities.resources.subscribe = True
+    return options
+
+
+async def run_stdio():
+    """Serve one MCP client over stdin/stdout"""
+    global _event_loop
+    _event_loop = asyncio.get_running_loop()
+    
+    async with stdio_server() as (read_stream, write_stream):
+        watcher = asyncio.create_task(_watch_runs())
+        try:
+            await app.run(read_stream, write_stream, _initialization_options())
+        finally:
+            watcher.cancel()
+
+
+def _extract_token(headers: Any) -> Optional[str]:
+    """Get the caller's Databricks token from forwarded-token or Authorization headers"""
+    for header_name in ("x-forwarded-access-token", "x-databricks-access-token"):
+        value = headers.get(header_name)
+        if value:
+            return value
+    authorization = headers.get("authorization", "")
+    parts = authorization.split()
+    if len(parts) == 2 and parts[0].lower() == "bearer":
+        return parts[1]
+    return None
+
+
+def create_sse_app(require_auth: bool = True):
+    """
+    Build a Starlette app serving MCP over HTTP/SSE
+    
+    Every connection shares this process's score snapshot, worker pool and
+    per-token client pool. Queries run as the caller: the bearer token (or
+    Databricks Apps forwarded token) on the /sse request is validated once
+    and used for that session's warehouse calls.
+    
+    Args:
+        require_auth: Reject connections without a valid token (otherwise they
+            fall back to the server's own credentials)
+    """
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, PlainTextResponse, Response
+    from starlette.routing import Mount, Route
+    
+    sse = SseServerTransport("/messages/")
+    watcher: Dict[str, asyncio.Task] = {}
+    
+    async def handle_sse(request):
+        token = _extract_token(request.headers)
+        client = None
+        if token:
+            loop = asyncio.get_running_loop()
+            try:
+                client = await loop.run_in_executor(_executor, get_client_for_token, token)
+            except WAFAccessDenied as e:
+                logger.warning(f"Rejected MCP connection: {e}")
+                return JSONResponse({"error": "No access to the WAF results"}, status_code=403)
+            except WarehouseSaturated as e:
+                return JSONResponse({"error": str(e)}, status_code=503,
+                                    headers={"Retry-After": str(e.retry_after)})
+            except PermissionError as e:
+                logger.warning(f"Rejected MCP connection: {e}")
+                return JSONResponse({"error": "Invalid Databricks token"}, status_code=401)
+        elif require_auth:
+            return JSONResponse({"error": "Missing Databricks token"}, status_code=401)
+        
+        reset_token = _session_client.set(client)
+        try:
+            async with sse.connect_sse(request.scope, request.receive, request._send) as streams:
+                await app.run(streams[0], streams[1], _initialization_options())
+        finally:
+            _session_client.reset(reset_token)
+        return Response()
+    
+    async def handle_health(request):
+        return JSONResponse({
+            "status": "healthy",
+            "run_id": _snapshot.run_id,
+            "authenticated_clients": len(_token_clients)
+        })
+    
+    async def handle_metrics(request):
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+    
+    async def on_startup():
+        global _event_loop
+        _event_loop = asyncio.get_running_loop()
+        watcher["task"] = asyncio.create_task(_watch_runs())
+    
+    async def on_shutdown():
+        task = watcher.pop("task", None)
+        if task is not None:
+            task.cancel()
+    
+    return Starlette(
+        routes=[
+            Route("/health", endpoint=handle_health),
+            Route("/metrics", endpoint=handle_metrics),
+            Route("/sse", endpoint=handle_sse),
+            Mount("/messages/", app=sse.handle_post_message),
+        ],
+        on_startup=[on_startup],
+        on_shutdown=[on_shutdown],
+    )
+
+
+def main():
+    """Run MCP server over stdio (default) or HTTP/SSE"""
+    parser = argparse.ArgumentParser(description="WAF Assessment Tool MCP server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "sse"],
+        default=os.getenv("WAF_MCP_TRANSPORT", "stdio"),
+        help="stdio for a single local client, sse for a shared HTTP server"
+    )
+    parser.add_argument("--host", default=os.getenv("WAF_MCP_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WAF_MCP_PORT", "8001")))
+    args = parser.parse_args()
+    tracing.configure(service_name="waf-mcp")
+    
+    if args.transport == "sse":
+        import uvicorn
+        
+        require_auth = os.getenv("WAF_MCP_REQUIRE_AUTH", "true").lower() != "false"
+        uvicorn.run(create_sse_app(require_auth=require_auth), host=args.host, port=args.port)
+    else:
+        asyncio.run(run_stdio())
 
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
+    main()